@@ -1,11 +1,19 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session
-import pandas as pd
+import numpy as np
 from functools import wraps
-from data_store import load_data, save_data, clear_cache
-import traceback
+from data_store import load_data, get_snapshot, update_row, delete_row
+from query_cache import result_cache
+from sort_index import SortIndex, parse_order
+from schema import display_frame, display_values
+from lazy_scan import lazy_requested, lazy_rows
+from json_response import json_response, columnar_requested, page_values, table_data
+from conditional import conditional
+import metrics
+import logging
 import json
 
 admin_data_bp = Blueprint("admin_data", __name__, url_prefix="/admin")
+logger = logging.getLogger(__name__)
 
 def admin_required(f):
     @wraps(f)
@@ -17,6 +25,113 @@ def admin_required(f):
     return wrapper
 
 
+def build_page(df, rows):
+    """Baris halaman admin sebagai teks (dengan kolom no); hanya baris ini yang diformat"""
+    page = display_frame(df.iloc[rows])
+    # Pastikan ada kolom no
+    if "no" not in page.columns:
+        page.insert(0, "no", [str(row + 1) for row in rows])
+    return page
+
+
+ACTION_HTML = """
+                        <a href="{edit}"
+                           class="btn btn-warning btn-sm mr-1"
+                           title="Edit">
+                           ✏️
+                        </a>
+                        <a href="{hapus}"
+                           class="btn btn-danger btn-sm delete-btn"
+                           title="Hapus"
+                           onclick="return confirm('Yakin hapus data ini?')">
+                           🗑️
+                        </a>
+                    """
+
+
+def page_data(page_df, params):
+    """`data` halaman admin: dict per baris + HTML aksi, atau per kolom (layout=columns).
+
+    Layout kolom tidak membawa HTML aksi; tombol dibuat di browser dari kolom no.
+    """
+    columns = list(page_df.columns)
+    values = page_values(page_df, columns)
+    if columnar_requested(params):
+        return table_data(values, columns, True)
+
+    # URL edit/hapus dibuat sekali, bukan url_for per baris
+    edit = url_for("admin_data.edit_data", no=0)[:-1]
+    hapus = url_for("admin_data.hapus_data", no=0)[:-1]
+    data = []
+    for row in zip(*values):
+        row_data = dict(zip(columns, row))
+        no_value = row_data.get("no", "")
+        if no_value.isdigit():
+            no_int = int(no_value)
+            row_data["aksi"] = ACTION_HTML.format(edit=f"{edit}{no_int}", hapus=f"{hapus}{no_int}")
+        else:
+            row_data["aksi"] = "<span class='text-muted'>-</span>"
+        data.append(row_data)
+    return data
+
+
+def table_columns(df):
+    """Nama kolom per index kolom DataTables admin: aksi, no, lalu kolom lain"""
+    return [None, "no"] + [col for col in df.columns if col != "no"]
+
+
+def search_rows(snapshot, df, search, order=None):
+    """Row-id baris admin yang memuat `search` (terurut jika `order`), di-cache per versi"""
+    if order is not None:
+        rows = search_rows(snapshot, df, search) if search else None
+        return result_cache.get_or_compute(
+            (snapshot.version, "admin", search.lower(), order),
+            lambda: snapshot.derived("sort_index", SortIndex).order_rows(rows, *order)
+        )
+
+    if not search:
+        return np.arange(len(df))
+
+    def compute():
+        logger.debug("Applying search filter: '%s'", search)
+        rows = match_block(df, search, 0, len(df))
+        logger.debug("Search result: %s rows found", len(rows))
+        return rows
+
+    return result_cache.get_or_compute((snapshot.version, "admin", search.lower(), None), compute)
+
+
+def match_block(df, search, start, end):
+    """Row-id di blok baris [start, end) yang teks tampilannya memuat `search`"""
+    # Convert search ke lowercase
+    search_lower = search.lower()
+    block = df.iloc[start:end]
+
+    # Cocokkan teks tampilan per kolom (kolom kategori cukup per kategori)
+    mask = np.zeros(len(block), dtype=bool)
+
+    for col in block.columns:
+        col_data = display_values(block[col])
+        mask |= col_data.str.lower().str.contains(search_lower, na=False).to_numpy(dtype=bool)
+
+    return start + np.flatnonzero(mask)
+
+
+def page_rows(snapshot, df, search, order, params, needed):
+    """Row-id untuk halaman admin + (jumlah hasil, jumlah persis?).
+
+    Mode lazy (lazy=1, urutan asli/kolom no naik): scan per blok sampai
+    halaman terisi; jumlah persis menyusul lewat request tanpa lazy.
+    """
+    if search and order in (None, ("no", False)) and lazy_requested(params):
+        return lazy_rows(
+            (snapshot.version, "admin", search.lower(), None), len(df),
+            lambda start, end: match_block(df, search, start, end), needed
+        )
+    rows = search_rows(snapshot, df, search, order)
+    return rows, len(rows), True
+
+
 # =====================
 # HALAMAN DATA ADMIN
 # =====================
@@ -24,21 +139,20 @@ def admin_required(f):
 @admin_required
 def data_table():
     try:
-        df = load_data().copy()
-        print(f"Admin page - Loaded {len(df)} rows")
-        
-        # Pastikan ada kolom no
-        if "no" not in df.columns and len(df) > 0:
-            df.insert(0, "no", range(1, len(df) + 1))
+        df = load_data()
+        logger.debug("Admin page - Loaded %s rows", len(df))
         
         columns = df.columns.tolist()
-        print(f"Admin columns: {columns}")
+        
+        # Pastikan ada kolom no
+        if "no" not in columns and len(df) > 0:
+            columns.insert(0, "no")
+        logger.debug("Admin columns: %s", columns)
         
         return render_template("data_admin.html", columns=columns)
         
     except Exception as e:
-        print(f"Error in admin page: {e}")
-        traceback.print_exc()
+        logger.exception("Error in admin page: %s", e)
         return render_template("data_admin.html", columns=["no", "Aksi"])
 
 
@@ -47,14 +161,16 @@ def data_table():
 # =====================
 @admin_data_bp.route("/data/json", methods=["GET", "POST"])  # TAMBAHKAN POST METHOD
 @admin_required
+@conditional
 def api():
     try:
-        # Load data
-        df = load_data().copy()
-        print(f"Admin API - Loaded {len(df)} rows")
+        # Load data (frame snapshot apa adanya; teks dibuat per halaman)
+        snapshot = get_snapshot()
+        df = snapshot.df
+        logger.debug("Admin API - Loaded %s rows", len(df))
         
         if df.empty:
-            print("Admin API - DataFrame is empty")
+            logger.debug("Admin API - DataFrame is empty")
             return jsonify({
                 "draw": 1,
                 "recordsTotal": 0,
@@ -62,13 +178,6 @@ def api():
                 "data": []
             })
         
-        # Pastikan ada kolom no
-        if "no" not in df.columns and len(df) > 0:
-            df.insert(0, "no", range(1, len(df) + 1))
-        
-        # PERBAIKAN: Pastikan SEMUA kolom adalah string sebelum pencarian
-        df = df.astype(str)
-        
         # Get Datatable parameters dari POST atau GET
         if request.method == "POST":
             if request.is_json:
@@ -86,78 +195,39 @@ def api():
         start = int(data.get("start", 0))
         length = int(data.get("length", 25))
         search = data.get("search[value]", "").strip()
-        print(f"Admin API params - method:{request.method}, draw:{draw}, start:{start}, length:{length}, search:'{search}'")
+        logger.debug("Admin API params - method:%s, draw:%s, start:%s, length:%s, search:'%s'", request.method, draw, start, length, search)
         
-        # Apply filter jika ada search
-        if search:
-            print(f"Applying search filter: '{search}'")
-            # Convert search ke lowercase
-            search_lower = search.lower()
-            
-            # PERBAIKAN: Buat mask dengan cara yang aman untuk string
-            mask = pd.Series([False] * len(df), index=df.index)
-            
-            for col in df.columns:
-                # Gunakan metode yang aman untuk pencarian string
-                col_data = df[col].astype(str)
-                mask = mask | col_data.str.lower().str.contains(search_lower, na=False)
-            
-            filtered = df[mask]
-            print(f"Search result: {len(filtered)} rows found")
-        else:
-            filtered = df
+        # Urutan server-side (kolom 0 = aksi, tidak bisa diurutkan)
+        order = parse_order(data, table_columns(df))
+        
+        # Apply filter jika ada search (row-id hasil filter di-cache, paging cukup slice)
+        with metrics.FILTER_SECONDS.time(endpoint=request.endpoint):
+            rows, total_filtered, count_exact = page_rows(snapshot, df, search, order, data, start + length)
         
         # Pagination
         total_records = len(df)
-        total_filtered = len(filtered)
-        page_df = filtered.iloc[start:start + length] if total_filtered > 0 else pd.DataFrame()
+        page_df = build_page(df, rows[start:start + length])
         
-        # Prepare response data
-        data = []
-        for _, row in page_df.iterrows():
-            row_data = row.to_dict()
-            
-            # Tambahkan tombol aksi (gunakan nomor dari kolom 'no')
-            try:
-                no_value = str(row_data.get('no', ''))
-                if no_value and no_value.isdigit():
-                    no_int = int(no_value)
-                    row_data["aksi"] = f"""
-                        <a href="{url_for('admin_data.edit_data', no=no_int)}"
-                           class="btn btn-warning btn-sm mr-1"
-                           title="Edit">
-                           ✏️
-                        </a>
-                        <a href="{url_for('admin_data.hapus_data', no=no_int)}"
-                           class="btn btn-danger btn-sm delete-btn"
-                           title="Hapus"
-                           onclick="return confirm('Yakin hapus data ini?')">
-                           🗑️
-                        </a>
-                    """
-                else:
-                    row_data["aksi"] = "<span class='text-muted'>-</span>"
-            except:
-                row_data["aksi"] = "<span class='text-muted'>-</span>"
-            
-            # Convert semua values ke string
-            row_data = {k: str(v) if v is not None else "" for k, v in row_data.items()}
-            data.append(row_data)
+        # Prepare response data (per kolom, tanpa iterrows)
+        params = data
+        data = page_data(page_df, params)
         
-        print(f"Admin API - Returning {len(data)} rows")
+        logger.debug("Admin API - Returning %s rows", len(page_df))
         
         response = {
             "draw": draw,
             "recordsTotal": total_records,
             "recordsFiltered": total_filtered,
+            "countExact": count_exact,
             "data": data
         }
+        if columnar_requested(params):
+            response["layout"] = "columns"
         
-        return jsonify(response)
+        return json_response(response)
         
     except Exception as e:
-        print(f"Error in admin API: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error in admin API: %s", e)
         return jsonify({
             "draw": 1,
             "recordsTotal": 0,
@@ -182,27 +252,23 @@ def edit_data(no):
             return redirect(url_for("admin_data.data_table"))
         
         if request.method == "POST":
-            # Update data
-            for col in df.columns:
-                if col != "no":  # Skip kolom no
-                    new_value = request.form.get(col, "").strip()
-                    df.at[no - 1, col] = new_value
+            # Update data (kolom no tidak diubah); dicatat ke journal, bukan tulis ulang file
+            values = {col: request.form.get(col, "").strip() for col in df.columns if col != "no"}
             
             # Simpan perubahan
-            if save_data(df):
-                clear_cache()
+            if update_row(no - 1, values):
                 flash("Data berhasil diperbarui", "success")
             else:
                 flash("Gagal menyimpan data", "danger")
             
             return redirect(url_for("admin_data.data_table"))
         
-        # GET: Tampilkan form edit
-        data = df.iloc[no - 1].to_dict()
+        # GET: Tampilkan form edit (nilai seperti di tabel, sel kosong = "")
+        data = display_frame(df.iloc[[no - 1]]).iloc[0].to_dict()
         return render_template("data_edit.html", data=data, no=no)
         
     except Exception as e:
-        print(f"Error in edit_data: {e}")
+        logger.error("Error in edit_data: %s", e)
         flash(f"Error: {str(e)}", "danger")
         return redirect(url_for("admin_data.data_table"))
 
@@ -217,16 +283,8 @@ def hapus_data(no):
             flash("Data tidak ditemukan", "danger")
             return redirect(url_for("admin_data.data_table"))
         
-        # Hapus baris
-        df = df.drop(df.index[no - 1]).reset_index(drop=True)
-        
-        # Reset nomor urut
-        if "no" in df.columns:
-            df["no"] = range(1, len(df) + 1)
-        
-        # Simpan
-        if save_data(df):
-            clear_cache()
+        # Hapus baris (nomor urut di-reset saat entri journal diterapkan)
+        if delete_row(no - 1):
             flash("Data berhasil dihapus", "success")
         else:
             flash("Gagal menghapus data", "danger")
@@ -234,7 +292,7 @@ def hapus_data(no):
         return redirect(url_for("admin_data.data_table"))
         
     except Exception as e:
-        print(f"Error in hapus_data: {e}")
+        logger.error("Error in hapus_data: %s", e)
         flash(f"Error: {str(e)}", "danger")
         return redirect(url_for("admin_data.data_table"))
 
@@ -250,17 +308,39 @@ def debug():
     return jsonify(info)
 
 
+# =====================
+# STATISTIK CACHE QUERY
+# =====================
+@admin_data_bp.route("/cache/stats")
+@admin_required
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+
+# =====================
+# LAPORAN MEMORI
+# =====================
+@admin_data_bp.route("/memory")
+@admin_required
+def memory():
+    """Byte per kolom frame aktif, struktur turunan per snapshot, dan RSS worker ini"""
+    from data_store import memory_report
+    return jsonify(memory_report())
+
+
 # =====================
 # FALLBACK API GET (UNTUK KOMPATIBILITAS)
 # =====================
 @admin_data_bp.route("/data/json-get", methods=["GET"])  # API GET alternatif
 @admin_required
+@conditional
 def api_get():
     """Alternatif API dengan GET untuk kompatibilitas"""
     try:
-        # Load data
-        df = load_data().copy()
-        print(f"Admin API GET - Loaded {len(df)} rows")
+        # Load data (frame snapshot apa adanya; teks dibuat per halaman)
+        snapshot = get_snapshot()
+        df = snapshot.df
+        logger.debug("Admin API GET - Loaded %s rows", len(df))
         
         if df.empty:
             return jsonify({
@@ -270,13 +350,6 @@ def api_get():
                 "data": []
             })
         
-        # Pastikan ada kolom no
-        if "no" not in df.columns and len(df) > 0:
-            df.insert(0, "no", range(1, len(df) + 1))
-        
-        # Pastikan semua string
-        df = df.astype(str)
-        
         # Get parameters
         draw = int(request.args.get("draw", 1))
         start = int(request.args.get("start", 0))
@@ -286,72 +359,40 @@ def api_get():
         # Batasi panjang search untuk menghindari 414 error
         if len(search) > 1000:
             search = search[:1000]
-            print(f"Search truncated to 1000 characters")
+            logger.warning("Search truncated to 1000 characters")
         
-        print(f"Admin API GET params - draw:{draw}, start:{start}, length:{length}, search:'{search}'")
+        logger.debug("Admin API GET params - draw:%s, start:%s, length:%s, search:'%s'", draw, start, length, search)
         
-        # Apply filter jika ada search
-        if search:
-            search_lower = search.lower()
-            mask = pd.Series([False] * len(df), index=df.index)
-            
-            for col in df.columns:
-                col_data = df[col].astype(str)
-                mask = mask | col_data.str.lower().str.contains(search_lower, na=False)
-            
-            filtered = df[mask]
-        else:
-            filtered = df
+        # Urutan server-side (kolom 0 = aksi, tidak bisa diurutkan)
+        order = parse_order(request.args, table_columns(df))
+        
+        # Apply filter jika ada search (row-id hasil filter di-cache, paging cukup slice)
+        with metrics.FILTER_SECONDS.time(endpoint=request.endpoint):
+            rows, total_filtered, count_exact = page_rows(snapshot, df, search, order, request.args, start + length)
         
         # Pagination
         total_records = len(df)
-        total_filtered = len(filtered)
-        page_df = filtered.iloc[start:start + length] if total_filtered > 0 else pd.DataFrame()
+        page_df = build_page(df, rows[start:start + length])
         
-        # Prepare response data
-        data = []
-        for _, row in page_df.iterrows():
-            row_data = row.to_dict()
-            
-            try:
-                no_value = str(row_data.get('no', ''))
-                if no_value and no_value.isdigit():
-                    no_int = int(no_value)
-                    row_data["aksi"] = f"""
-                        <a href="{url_for('admin_data.edit_data', no=no_int)}"
-                           class="btn btn-warning btn-sm mr-1"
-                           title="Edit">
-                           ✏️
-                        </a>
-                        <a href="{url_for('admin_data.hapus_data', no=no_int)}"
-                           class="btn btn-danger btn-sm delete-btn"
-                           title="Hapus"
-                           onclick="return confirm('Yakin hapus data ini?')">
-                           🗑️
-                        </a>
-                    """
-                else:
-                    row_data["aksi"] = "<span class='text-muted'>-</span>"
-            except:
-                row_data["aksi"] = "<span class='text-muted'>-</span>"
-            
-            row_data = {k: str(v) if v is not None else "" for k, v in row_data.items()}
-            data.append(row_data)
+        # Prepare response data (per kolom, tanpa iterrows)
+        data = page_data(page_df, request.args)
         
-        print(f"Admin API GET - Returning {len(data)} rows")
+        logger.debug("Admin API GET - Returning %s rows", len(page_df))
         
         response = {
             "draw": draw,
             "recordsTotal": total_records,
             "recordsFiltered": total_filtered,
+            "countExact": count_exact,
             "data": data
         }
+        if columnar_requested(request.args):
+            response["layout"] = "columns"
         
-        return jsonify(response)
+        return json_response(response)
         
     except Exception as e:
-        print(f"Error in admin API GET: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error in admin API GET: %s", e)
         return jsonify({
             "draw": 1,
             "recordsTotal": 0,
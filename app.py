@@ -1,8 +1,22 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+import logging
+import time
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, g
 from werkzeug.security import check_password_hash
 from functools import wraps
 
+# =====================
+# LOGGING (LOG_LEVEL=DEBUG untuk log per request)
+# =====================
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+if not isinstance(getattr(logging, LOG_LEVEL, None), int):
+    LOG_LEVEL = "INFO"
+logging.basicConfig(
+    level=LOG_LEVEL,
+    format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s",
+)
+
+import metrics
 from admin_data import admin_data_bp
 from data_sims import data_sims_bp
 from data_pemeriksaan import pemeriksaan_bp
@@ -15,6 +29,9 @@ app = Flask(__name__)
 # =====================
 app.secret_key = os.getenv("SECRET_KEY", "DEV_SECRET_KEY_LOCALHOST_2026")
 
+# Token opsional untuk /metrics (Authorization: Bearer <token>); kosong = terbuka
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # =====================
 # USER DATA (HASH SUDAH FIX)
 # =====================
@@ -78,6 +95,29 @@ def logout():
 def home():
     return render_template("index.html")
 
+# =====================
+# METRICS (FORMAT PROMETHEUS, PER PROSES WORKER)
+# =====================
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            endpoint=request.endpoint or "unknown", method=request.method, status=response.status_code
+        )
+    return response
+
+@app.route("/metrics")
+def metrics_text():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 # =====================
 # REGISTER BLUEPRINT
 # =====================
@@ -0,0 +1,56 @@
+# conditional.py
+import hashlib
+from functools import wraps
+
+from flask import request, make_response
+
+from data_store import current_version
+
+# Parameter yang tidak mengubah isi response (cache-buster jQuery)
+IGNORED_PARAMS = {"_"}
+
+
+def request_etag(version):
+    """ETag untuk request aktif: versi snapshot + path + parameter query/form/body"""
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f"{request.path}\0".encode())
+    for source in (request.args, request.form):
+        for key, value in sorted(source.items(multi=True)):
+            if key not in IGNORED_PARAMS:
+                digest.update(f"{key}\0{value}\0".encode())
+    # Body JSON (form sudah dibaca di atas sehingga di sini kosong); di-cache untuk get_json
+    digest.update(request.get_data(cache=True))
+    return f"{version}-{digest.hexdigest()}"
+
+
+def _revalidate(response):
+    # Boleh disimpan browser, tapi selalu ditanyakan ulang (If-None-Match)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(view):
+    """Conditional GET berbasis versi snapshot.
+
+    If-None-Match yang cocok dijawab 304 sebelum view dijalankan (tanpa load_data
+    dan filter); response 200 diberi ETag jika versi tidak berubah selama request.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_version()
+        if version is None:
+            return view(*args, **kwargs)
+
+        etag = request_etag(version)
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+            response.set_etag(etag)
+            return _revalidate(response)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and current_version() == version:
+            response.set_etag(etag)
+            _revalidate(response)
+        return response
+    return wrapper
@@ -1,17 +1,29 @@
-from flask import Blueprint, render_template, request, jsonify, send_file, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for
 import pandas as pd
-import os, re
-from io import BytesIO
-from openpyxl import load_workbook
-from openpyxl.worksheet.datavalidation import DataValidation
-from data_store import load_data  # cache global
+import re
+from data_store import get_snapshot  # cache global
+from sort_index import SortIndex, parse_order
+from geo_index import GeoIndex, POINTS
+from query_cache import result_cache
+from excel_export import export_response
+from saved_store import SavedStore
+from schema import prepare_display, display_values
+from search_index import SearchIndex
+from numeric_index import NumericIndex
+from facets import FacetIndex, FACET_COLUMNS
+from lazy_scan import lazy_requested, lazy_rows
+from json_response import json_response, page_values
+from conditional import conditional
+import metrics
 import numpy as np
-import traceback
+import logging
 
 pemeriksaan_bp = Blueprint("pemeriksaan", __name__)
+logger = logging.getLogger(__name__)
 
-TEMPLATE_FILE = "Template Format Pemeriksaan UPLOAD.xlsx"
+# File Excel lama; sekarang hanya diimpor sekali ke SAVED_DB
 SAVED_FILE = "data_pemeriksaan_tersimpan.xlsx"
+SAVED_DB = "data_pemeriksaan.db"
 
 DISPLAY_COLUMNS = [
     "CLNT_ID", "CLNT_NAME", "CURR_LIC_NUM",
@@ -30,77 +42,114 @@ FIELD_MAP = {
     "city": "CITY"
 }
 
-# =======================
-def apply_filter(args):
-    df = load_data()
-    for field, col in FIELD_MAP.items():
-        val = args.get(field, "").strip()
-        if val:
-            parts = [v.strip() for v in val.split(";")]
-            pattern = "|".join(map(re.escape, parts))
-            df = df[df[col].str.contains(pattern, case=False, na=False)]
-    return df
+# Filter rentang numeric: <prefix>_min / <prefix>_max (inklusif, boleh salah satu)
+RANGE_MAP = {
+    "freq": "FREQ",
+    "bwidth": "BWIDTH",
+    "lat": "SID_LAT",
+    "lon": "SID_LONG"
+}
 
 # =======================
-def div_1000(val):
-    try:
-        return float(val) / 1000
-    except:
-        return ""
+def filter_values(args):
+    """Nilai filter per kolom dari parameter: ((kolom, (bagian, ...)), ...)
+
+    Bagian kosong dari ';' (mis. "a;;b;") diabaikan; field tanpa bagian tidak difilter.
+    """
+    filters = []
+    for field, col in FIELD_MAP.items():
+        parts = tuple(v.strip().lower() for v in args.get(field, "").split(";") if v.strip())
+        if parts:
+            filters.append((col, parts))
+    return tuple(filters)
+
+def filter_ranges(args):
+    """Rentang numeric dari parameter: ((kolom, min, max), ...); ValueError jika tidak valid"""
+    ranges = []
+    for prefix, col in RANGE_MAP.items():
+        low, high = (args.get(f"{prefix}_{bound}", "").strip() for bound in ("min", "max"))
+        low = _number(low) if low else None
+        high = _number(high) if high else None
+        if low is not None and high is not None and low > high:
+            raise ValueError(f"{prefix}_min harus <= {prefix}_max")
+        if low is not None or high is not None:
+            ranges.append((col, low, high))
+    return tuple(ranges)
+
+def get_field_index(snapshot, col):
+    """Index nilai unik (lowercase) -> baris untuk satu kolom filter, dibangun sekali per snapshot"""
+    return snapshot.derived(f"field_index:{col}", lambda df: SearchIndex(df[[col]]))
+
+def field_rows(snapshot, col, parts):
+    """Row-id yang sel kolomnya memuat salah satu bagian (dicari di nilai unik, bukan per baris)"""
+    index = get_field_index(snapshot, col)
+    return index.rows_for_values(index.values_containing_any(parts))
+
+def get_numeric_index(snapshot, col):
+    """Nilai numeric terurut + row-id untuk filter rentang, dibangun sekali per snapshot"""
+    return snapshot.derived(f"numeric_index:{col}", lambda df: NumericIndex(df, col))
+
+def filter_rows(args, snapshot):
+    """Row-id (terurut naik) yang lolos semua filter field & rentang, di-cache per versi.
+
+    None jika tidak ada filter; ValueError jika parameter rentang tidak valid.
+    """
+    filters, ranges = filter_values(args), filter_ranges(args)
+    if not filters and not ranges:
+        return None
+
+    def compute():
+        # Gabungkan field dan rentang dengan irisan bitmap baris
+        mask = np.ones(len(snapshot.df), dtype=bool)
+        matches = [field_rows(snapshot, col, parts) for col, parts in filters]
+        matches += [get_numeric_index(snapshot, col).between(low, high) for col, low, high in ranges]
+        for rows in matches:
+            hit = np.zeros(len(snapshot.df), dtype=bool)
+            hit[rows] = True
+            mask &= hit
+        return np.flatnonzero(mask)
+
+    return result_cache.get_or_compute((snapshot.version, "filter", filters, ranges), compute)
+
+def filter_block(df, filters, ranges, start, end):
+    """Row-id di blok baris [start, end) yang lolos filter field & rentang (tanpa index, mode lazy)"""
+    block = df.iloc[start:end]
+    mask = np.ones(len(block), dtype=bool)
+    for col, parts in filters:
+        pattern = "|".join(map(re.escape, parts))
+        values = display_values(block[col]).astype(str).str.lower()
+        mask &= values.str.contains(pattern, na=False).to_numpy(dtype=bool)
+    for col, low, high in ranges:
+        if col not in block.columns:
+            mask[:] = False
+            continue
+        values = pd.to_numeric(block[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        with np.errstate(invalid="ignore"):
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+    return start + np.flatnonzero(mask)
+
+def filter_mask(args, snapshot):
+    """Mask baris untuk filter per field (None jika tidak ada filter)"""
+    rows = filter_rows(args, snapshot)
+    if rows is None:
+        return None
+    mask = np.zeros(len(snapshot.df), dtype=bool)
+    mask[rows] = True
+    return mask
+
+def apply_filter(args, snapshot=None):
+    if snapshot is None:
+        snapshot = get_snapshot()
+    rows = filter_rows(args, snapshot)
+    return snapshot.df if rows is None else snapshot.df.iloc[rows]
 
 # =======================
-def generate_excel(data, filename):
-    wb = load_workbook(TEMPLATE_FILE)
-    ws = wb.active
-    START_ROW = 7
-
-    dv_metode = DataValidation(type="list",
-        formula1='"Inspeksi melalui Open Shelter,Pemeriksaan melalui Remote Site"')
-    dv_sertifikat = DataValidation(type="list", formula1='"Ada,Tidak"')
-    dv_status = DataValidation(type="list",
-        formula1='"Sesuai ISR,Tidak Sesuai Parameter Teknis,Tidak Berizin,Tidak Aktif"')
-
-    ws.add_data_validation(dv_metode)
-    ws.add_data_validation(dv_sertifikat)
-    ws.add_data_validation(dv_status)
-
-    for i, r in enumerate(data):
-        row = START_ROW + i
-        ws.cell(row=row, column=1).value = i + 1
-        dv_metode.add(ws.cell(row=row, column=3))
-
-        ws.cell(row=row, column=4).value = r.get("CLNT_ID", "") or ""
-        ws.cell(row=row, column=5).value = r.get("CLNT_NAME", "") or ""
-        ws.cell(row=row, column=7).value = r.get("CURR_LIC_NUM", "") or ""
-        ws.cell(row=row, column=8).value = r.get("LINK_ID", "") or ""
-        ws.cell(row=row, column=9).value = r.get("STN_NAME", "") or ""
-        ws.cell(row=row, column=10).value = r.get("STASIUN_LAWAN", "") or ""
-        ws.cell(row=row, column=11).value = r.get("SID_LONG", "") or ""
-        ws.cell(row=row, column=12).value = r.get("SID_LAT", "") or ""
-        ws.cell(row=row, column=13).value = r.get("FREQ", "") or ""
-        ws.cell(row=row, column=14).value = r.get("FREQ_PAIR", "") or ""
-        bwidth = r.get("BWIDTH", "") or ""
-        ws.cell(row=row, column=15).value = div_1000(bwidth)
-        ws.cell(row=row, column=16).value = r.get("EQ_MDL", "") or ""
-        ws.cell(row=row, column=17).value = r.get("STN_NAME", "") or ""
-        ws.cell(row=row, column=18).value = r.get("STASIUN_LAWAN", "") or ""
-        ws.cell(row=row, column=19).value = r.get("LONG", "") or ""
-        ws.cell(row=row, column=20).value = r.get("LAT", "") or ""
-        ws.cell(row=row, column=21).value = r.get("FREQ", "") or ""
-        ws.cell(row=row, column=22).value = r.get("FREQ_PAIR", "") or ""
-        ws.cell(row=row, column=23).value = div_1000(bwidth)
-        ws.cell(row=row, column=24).value = r.get("EQ_MDL", "") or ""
-
-        dv_sertifikat.add(ws.cell(row=row, column=25))
-        dv_status.add(ws.cell(row=row, column=26))
-        ws.cell(row=row, column=27).value = r.get("MULAI BEROPERASI", "") or ""
-        ws.cell(row=row, column=28).value = r.get("KETERANGAN", "") or ""
-        ws.cell(row=row, column=29).value = r.get("CITY", "") or ""
-
-    out = BytesIO()
-    wb.save(out)
-    out.seek(0)
-    return send_file(out, download_name=filename, as_attachment=True)
+def generate_excel(df, filename):
+    """Export template Pemeriksaan (di-stream) untuk DataFrame hasil prepare"""
+    return export_response(df, filename)
 
 # =======================
 def clean_value(value):
@@ -120,39 +169,20 @@ def clean_value(value):
     except:
         return ""
 
-def is_row_duplicate(row1, row2):
-    """Perbandingan semua kolom termasuk yang kosong"""
-    # Daftar semua kolom yang relevan untuk perbandingan
-    columns_to_compare = DISPLAY_COLUMNS
-
-    for col in columns_to_compare:
-        val1 = clean_value(row1.get(col, ''))
-        val2 = clean_value(row2.get(col, ''))
-
-        # Bandingkan nilai yang sudah dibersihkan
-        if val1 != val2:
-            return False
-
-    return True
-
 # =======================
 def prepare_dataframe(df):
-    """Prepare DataFrame: clean NaN values and ensure proper columns"""
-    # Pastikan semua kolom ada
-    for col in DISPLAY_COLUMNS:
-        if col not in df.columns:
-            df[col] = ""
-
-    # Replace NaN dengan string kosong
-    df = df.fillna("")
+    """Prepare DataFrame: kolom tampilan sebagai teks bersih (frame baru, snapshot tidak ikut berubah)"""
+    return prepare_display(df, DISPLAY_COLUMNS)
 
-    # Convert semua kolom ke string untuk konsistensi
-    for col in DISPLAY_COLUMNS:
-        df[col] = df[col].astype(str)
-        # Hapus whitespace berlebih dan clean nilai
-        df[col] = df[col].apply(lambda x: clean_value(x))
+saved_store = SavedStore(SAVED_DB, DISPLAY_COLUMNS, legacy_file=SAVED_FILE, clean=clean_value)
 
-    return df
+def saved_row_id(data):
+    """Id baris tersimpan dari request (id tetap; index posisi untuk klien lama)"""
+    if data.get("id") is not None:
+        return int(data["id"])
+    if data.get("index") is not None:
+        return saved_store.id_at(int(data["index"]))
+    return None
 
 # =======================
 # ENDPOINT UNTUK EDIT DAN DELETE SATU DATA
@@ -161,67 +191,25 @@ def prepare_dataframe(df):
 def delete_single():
     try:
         data = request.json
-        row_index = data.get("index")
+        row_id = saved_row_id(data)
 
-        print(f"DELETE SINGLE - Index: {row_index}")
+        logger.debug("DELETE SINGLE - Id: %s", row_id)
 
-        if not os.path.exists(SAVED_FILE):
+        if row_id is None or not saved_store.delete(row_id):
             return jsonify({
                 "success": False,
-                "message": "File data tidak ditemukan"
+                "message": f"Data tidak ditemukan: {row_id}"
             }), 404
 
-        # Baca data
-        df = pd.read_excel(SAVED_FILE, dtype=str)
-        df = prepare_dataframe(df)
-
-        # Validasi index
-        if row_index is None or row_index < 0 or row_index >= len(df):
-            return jsonify({
-                "success": False,
-                "message": f"Index tidak valid: {row_index}. Data hanya {len(df)} baris"
-            }), 400
-
-        print(f"Data sebelum hapus: {len(df)} baris")
-        print(f"Menghapus baris ke-{row_index}")
-
-        # Simpan data yang akan dihapus untuk debug
-        deleted_row = df.iloc[row_index].to_dict()
-        print(f"Data yang dihapus: {deleted_row}")
-
-        # Hapus baris berdasarkan index
-        df = df.drop(index=row_index).reset_index(drop=True)
-
-        print(f"Data setelah hapus: {len(df)} baris")
-
-        # Simpan kembali
-        df = prepare_dataframe(df)
-
-        # Simpan ke file dengan engine yang jelas
-        try:
-            df.to_excel(SAVED_FILE, index=False, engine='openpyxl')
-            print("File berhasil disimpan ulang")
-        except Exception as save_error:
-            print(f"Error saat menyimpan: {save_error}")
-            # Coba dengan engine lain
-            df.to_excel(SAVED_FILE, index=False)
-
-        # Verifikasi file tersimpan
-        if os.path.exists(SAVED_FILE):
-            df_check = pd.read_excel(SAVED_FILE, dtype=str)
-            print(f"Verifikasi: file sekarang berisi {len(df_check)} baris")
-
         return jsonify({
             "success": True,
             "message": "Data berhasil dihapus",
-            "remaining_count": len(df),
-            "deleted_index": row_index
+            "remaining_count": saved_store.count(),
+            "deleted_id": row_id
         }), 200
 
     except Exception as e:
-        print(f"Error deleting single row: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error deleting single row: %s", e)
         return jsonify({
             "success": False,
             "message": f"Terjadi kesalahan: {str(e)}"
@@ -232,44 +220,20 @@ def delete_single():
 def update_single():
     try:
         data = request.json
-        row_index = data.get("index")
+        row_id = saved_row_id(data)
         updated_data = data.get("data", {})
 
-        print(f"Updating row index: {row_index}")
-        print(f"Updated data: {updated_data}")
+        logger.debug("Updating row id: %s", row_id)
+        logger.debug("Updated data: %s", updated_data)
 
-        if not os.path.exists(SAVED_FILE):
+        # Update semua kolom (yang tidak dikirim menjadi string kosong)
+        updated_row = saved_store.update(row_id, updated_data) if row_id is not None else None
+        if updated_row is None:
             return jsonify({
                 "success": False,
-                "message": "File data tidak ditemukan"
+                "message": f"Data tidak ditemukan: {row_id}"
             }), 404
 
-        # Baca data
-        df = pd.read_excel(SAVED_FILE, dtype=str)
-        df = prepare_dataframe(df)
-
-        # Validasi index
-        if row_index is None or row_index < 0 or row_index >= len(df):
-            return jsonify({
-                "success": False,
-                "message": f"Index tidak valid: {row_index}. Data hanya {len(df)} baris"
-            }), 400
-
-        # Update semua kolom (termasuk yang kosong)
-        for col in DISPLAY_COLUMNS:
-            if col in updated_data:
-                df.at[row_index, col] = clean_value(updated_data[col])
-            else:
-                # Jika kolom tidak ada di updated_data, set ke string kosong
-                df.at[row_index, col] = ""
-
-        # Simpan kembali
-        df = prepare_dataframe(df)
-        df.to_excel(SAVED_FILE, index=False)
-
-        # Ambil data yang sudah diupdate untuk response
-        updated_row = df.iloc[row_index].to_dict()
-
         return jsonify({
             "success": True,
             "message": "Data berhasil diperbarui",
@@ -277,9 +241,7 @@ def update_single():
         }), 200
 
     except Exception as e:
-        print(f"Error updating single row: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error updating single row: %s", e)
         return jsonify({
             "success": False,
             "message": f"Terjadi kesalahan: {str(e)}"
@@ -293,20 +255,177 @@ def index():
     return render_template("pemeriksaan.html")
 
 @pemeriksaan_bp.route("/pemeriksaan/api", strict_slashes=False)
+@conditional
 def api():
-    df = apply_filter(request.args)
+    snapshot = get_snapshot()
     draw = int(request.args.get("draw", 1))
+    try:
+        filters, ranges = filter_values(request.args), filter_ranges(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     start = int(request.args.get("start", 0))
     length = int(request.args.get("length", 10))
 
-    page = df.iloc[start:start+length]
-    data = [["", *r[DISPLAY_COLUMNS].tolist()] for _, r in page.iterrows()]
+    # Urutan server-side (kolom 0 = checkbox, tidak bisa diurutkan)
+    columns = [None] + [col if col in snapshot.df.columns else None for col in DISPLAY_COLUMNS]
+    order = parse_order(request.args, columns)
+    count_exact = True
+    with metrics.FILTER_SECONDS.time(endpoint=request.endpoint):
+        if (filters or ranges) and order is None and lazy_requested(request.args):
+            # Mode lazy: scan per blok sampai halaman terisi, jumlah persis menyusul
+            rows, total_filtered, count_exact = lazy_rows(
+                (snapshot.version, "filter", filters, ranges), len(snapshot.df),
+                lambda s, e: filter_block(snapshot.df, filters, ranges, s, e), start + length
+            )
+        else:
+            rows = filter_rows(request.args, snapshot)
+            if order is not None:
+                rows = snapshot.derived("sort_index", SortIndex).order_rows(rows, *order)
+            elif rows is None:
+                rows = np.arange(len(snapshot.df))
+            total_filtered = len(rows)
+
+    return json_response({
+        "draw": draw,
+        "recordsTotal": len(snapshot.df),
+        "recordsFiltered": total_filtered,
+        "countExact": count_exact,
+        "data": table_rows(snapshot.df.iloc[rows[start:start+length]])
+    })
 
-    return jsonify({
+def table_rows(page):
+    """Baris tabel pemeriksaan: checkbox + DISPLAY_COLUMNS"""
+    # Sel numeric kosong (NaN) dikirim sebagai "", angka tetap angka
+    page = page[DISPLAY_COLUMNS].astype(object)
+    page = page.where(page.notna(), "")
+    return [["", *row] for row in zip(*page_values(page, DISPLAY_COLUMNS))]
+
+# =======================
+# PENCARIAN AREA (RADIUS / BOUNDING BOX)
+# =======================
+def parse_area(args):
+    """Ambil area dari parameter: lat+lon+radius (km) atau bbox=min_lon,min_lat,max_lon,max_lat.
+
+    Kembalikan ("radius", lon, lat, km) atau ("bbox", min_lon, min_lat, max_lon, max_lat);
+    ValueError jika parameter tidak lengkap/tidak valid.
+    """
+    bbox = args.get("bbox", "").strip()
+    if bbox:
+        parts = [_number(v) for v in bbox.split(",")]
+        if len(parts) != 4:
+            raise ValueError("bbox harus berisi 4 angka: min_lon,min_lat,max_lon,max_lat")
+        min_lon, min_lat, max_lon, max_lat = parts
+        if min_lon > max_lon or min_lat > max_lat:
+            raise ValueError("bbox tidak valid: min harus <= max")
+        return ("bbox", min_lon, min_lat, max_lon, max_lat)
+
+    if not all(args.get(key, "").strip() for key in ("lon", "lat", "radius")):
+        raise ValueError("Isi lat, lon, dan radius (km), atau bbox")
+    lon, lat, radius = (_number(args[key]) for key in ("lon", "lat", "radius"))
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError("Koordinat di luar rentang")
+    if not radius > 0:
+        raise ValueError("radius harus lebih dari 0 km")
+    return ("radius", lon, lat, radius)
+
+def _number(value):
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Bukan angka: {value.strip()!r}")
+    if not np.isfinite(number):
+        raise ValueError(f"Bukan angka: {value.strip()!r}")
+    return number
+
+def get_geo_index(snapshot, point):
+    """Index grid koordinat, dibangun sekali per snapshot per pasangan kolom"""
+    return snapshot.derived(f"geo_index:{point}", lambda df: GeoIndex(df, point))
+
+def area_rows(snapshot, args, area, point):
+    """Row-id dalam area + filter field, di-cache per versi (radius: terdekat dulu)"""
+    filters = (filter_values(args), filter_ranges(args))
+
+    def compute():
+        index = get_geo_index(snapshot, point)
+        if area[0] == "radius":
+            rows = index.within_radius(*area[1:])
+        else:
+            rows = index.within_bbox(*area[1:])
+        mask = filter_mask(args, snapshot)
+        return rows if mask is None else rows[mask[rows]]
+
+    return result_cache.get_or_compute((snapshot.version, "geo", point, area, filters), compute)
+
+@pemeriksaan_bp.route("/pemeriksaan/api/area", strict_slashes=False)
+@conditional
+def api_area():
+    """Data dalam radius/bounding box koordinat stasiun (format JSON DataTables).
+
+    Parameter: lat, lon, radius (km) atau bbox; point=station (SID_LONG/SID_LAT,
+    default) atau lawan (LONG/LAT); filter field seperti /pemeriksaan/api.
+    Tanpa order, hasil radius diurutkan dari yang terdekat.
+    """
+    draw = int(request.args.get("draw", 1))
+    point = request.args.get("point", "station")
+    if point not in POINTS:
+        return jsonify({"error": f"point tidak dikenal: {point}"}), 400
+    try:
+        area = parse_area(request.args)
+        filter_ranges(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    snapshot = get_snapshot()
+    start = int(request.args.get("start", 0))
+    length = int(request.args.get("length", 10))
+    with metrics.FILTER_SECONDS.time(endpoint=request.endpoint):
+        rows = area_rows(snapshot, request.args, area, point)
+
+    # Urutan server-side (kolom 0 = checkbox, tidak bisa diurutkan)
+    columns = [None] + [col if col in snapshot.df.columns else None for col in DISPLAY_COLUMNS]
+    order = parse_order(request.args, columns)
+    if order is not None:
+        rows = snapshot.derived("sort_index", SortIndex).order_rows(np.sort(rows), *order)
+    page_rows = rows[start:start+length]
+
+    response = {
         "draw": draw,
-        "recordsTotal": len(load_data()),
-        "recordsFiltered": len(df),
-        "data": data
+        "recordsTotal": len(snapshot.df),
+        "recordsFiltered": len(rows),
+        "data": table_rows(snapshot.df.iloc[page_rows])
+    }
+    if area[0] == "radius":
+        # Jarak (km) per baris halaman, urutan sama dengan data
+        distances = get_geo_index(snapshot, point).distances(page_rows, *area[1:3])
+        response["distance_km"] = [round(float(d), 3) for d in distances]
+    return json_response(response)
+
+# =======================
+# FACET (JUMLAH PER NILAI)
+# =======================
+@pemeriksaan_bp.route("/pemeriksaan/api/facets", strict_slashes=False)
+@conditional
+def api_facets():
+    """Jumlah link per CITY / CLNT_NAME / EQ_MDL untuk filter yang sedang aktif.
+
+    Parameter: filter field & rentang seperti /pemeriksaan/api, top (default 10).
+    """
+    try:
+        top = min(max(int(request.args.get("top", 10)), 1), 1000)
+    except ValueError:
+        return jsonify({"error": "top harus berupa angka"}), 400
+
+    snapshot = get_snapshot()
+    try:
+        rows = filter_rows(request.args, snapshot)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    index = snapshot.derived("facets", FacetIndex)
+    return jsonify({
+        "recordsTotal": len(snapshot.df),
+        "recordsFiltered": len(snapshot.df) if rows is None else len(rows),
+        "facets": {col: index.top(col, rows, top) for col in FACET_COLUMNS if col in index.facets}
     })
 
 @pemeriksaan_bp.route("/pemeriksaan/save", methods=["POST"], strict_slashes=False)
@@ -320,76 +439,8 @@ def save_selected():
                 "status": "warning"
             }), 200
 
-        # Clean rows data: replace None dengan string kosong
-        cleaned_rows = []
-        for row in rows:
-            cleaned_row = {}
-            for col in DISPLAY_COLUMNS:
-                value = row.get(col, '')
-                cleaned_row[col] = clean_value(value)
-            cleaned_rows.append(cleaned_row)
-
-        # Convert to DataFrame dengan data yang sudah dibersihkan
-        df_new = pd.DataFrame(cleaned_rows)
-
-        # Jika tidak ada file tersimpan, buat baru
-        if not os.path.exists(SAVED_FILE):
-            df_new = prepare_dataframe(df_new)
-            df_new.to_excel(SAVED_FILE, index=False)
-            return jsonify({
-                "message": f"{len(rows)} data disimpan",
-                "status": "success",
-                "new_count": len(rows),
-                "duplicate_count": 0,
-                "redirect": url_for('pemeriksaan.saved_page', saved=1, count=len(rows))
-            }), 200
-
-        # Load data yang sudah tersimpan
-        try:
-            df_old = pd.read_excel(SAVED_FILE, dtype=str)  # Baca semua sebagai string
-            df_old = prepare_dataframe(df_old)  # Clean NaN values
-        except Exception as e:
-            # Jika file corrupt, buat baru
-            df_new = prepare_dataframe(df_new)
-            df_new.to_excel(SAVED_FILE, index=False)
-            return jsonify({
-                "message": f"{len(rows)} data disimpan (file baru dibuat)",
-                "status": "success",
-                "new_count": len(rows),
-                "duplicate_count": 0,
-                "redirect": url_for('pemeriksaan.saved_page', saved=1, count=len(rows))
-            }), 200
-
-        # Cek duplikat
-        new_data_rows = []
-        duplicate_rows_count = 0
-
-        for _, new_row in df_new.iterrows():
-            is_duplicate = False
-            new_row_dict = new_row.to_dict()
-
-            # Cek duplikat dengan data yang sudah ada
-            for _, old_row in df_old.iterrows():
-                if is_row_duplicate(new_row_dict, old_row.to_dict()):
-                    is_duplicate = True
-                    duplicate_rows_count += 1
-                    break
-
-            # Jika bukan duplikat, tambahkan ke list baru
-            if not is_duplicate:
-                new_data_rows.append(new_row_dict)
-
-        # Gabungkan data lama dengan data baru (non-duplikat)
-        if new_data_rows:
-            df_new_filtered = pd.DataFrame(new_data_rows)
-            df_combined = pd.concat([df_old, df_new_filtered], ignore_index=True)
-
-            # Simpan dengan format yang benar (tanpa NaN)
-            df_combined = prepare_dataframe(df_combined)
-            df_combined.to_excel(SAVED_FILE, index=False)
-
-        # Hitung berapa data baru yang tersimpan
-        new_rows_count = len(new_data_rows)
+        # Simpan baris yang belum ada dalam satu transaksi (nilai dibersihkan di store)
+        new_rows_count, duplicate_rows_count = saved_store.add_unique(rows)
 
         # Prepare response berdasarkan skenario
         if duplicate_rows_count > 0 and new_rows_count == 0:
@@ -420,8 +471,7 @@ def save_selected():
 
     except Exception as e:
         # Log error untuk debugging
-        print(f"Error in save_selected: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in save_selected: %s", e)
 
         return jsonify({
             "message": f"Terjadi kesalahan server: {str(e)}",
@@ -434,13 +484,10 @@ def save_selected():
 @pemeriksaan_bp.route("/pemeriksaan/saved", strict_slashes=False)
 def saved_page():
     data = []
-    if os.path.exists(SAVED_FILE):
-        try:
-            df = pd.read_excel(SAVED_FILE, dtype=str)
-            df = prepare_dataframe(df)
-            data = df[DISPLAY_COLUMNS].values.tolist()
-        except Exception as e:
-            print(f"Error loading saved data: {e}")
+    try:
+        data = saved_store.rows()
+    except Exception as e:
+        logger.error("Error loading saved data: %s", e)
 
     # Kirim DISPLAY_COLUMNS ke template
     return render_template(
@@ -454,42 +501,33 @@ def saved_page():
 # =======================
 @pemeriksaan_bp.route("/pemeriksaan/download_saved", strict_slashes=False)
 def download_saved():
-    if not os.path.exists(SAVED_FILE):
-        return redirect(url_for("pemeriksaan.saved_page"))
-
     try:
-        df = pd.read_excel(SAVED_FILE, dtype=str)
-        df = prepare_dataframe(df)
-        records = df.to_dict('records')
-        return generate_excel(records, "data_pemeriksaan_tersimpan.xlsx")
+        if saved_store.count() == 0:
+            return redirect(url_for("pemeriksaan.saved_page"))
+
+        # Excel hanya dibuat saat download
+        return generate_excel(saved_store.to_dataframe(), "data_pemeriksaan_tersimpan.xlsx")
     except Exception as e:
-        print(f"Error downloading saved data: {e}")
+        logger.error("Error downloading saved data: %s", e)
         return redirect(url_for("pemeriksaan.saved_page"))
 
 # PERBAIKAN: Tambahkan parameter untuk alert
 @pemeriksaan_bp.route("/pemeriksaan/clear", strict_slashes=False)
 def clear_saved():
-    deleted_count = 0
-
-    if os.path.exists(SAVED_FILE):
-        try:
-            # Hitung berapa data yang dihapus
-            df = pd.read_excel(SAVED_FILE)
-            deleted_count = len(df)
-        except:
-            pass
-
-        # Hapus file
-        os.remove(SAVED_FILE)
+    deleted_count = saved_store.clear()
 
+    if deleted_count:
         # Redirect dengan parameter untuk alert
         return redirect(url_for('pemeriksaan.saved_page', deleted=1, count=deleted_count))
 
     return redirect(url_for("pemeriksaan.saved_page"))
 
 @pemeriksaan_bp.route("/pemeriksaan/download-filtered", strict_slashes=False)
+@conditional
 def download_filtered():
-    df = apply_filter(request.args)
+    try:
+        df = apply_filter(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     df = prepare_dataframe(df)
-    records = df.to_dict('records')
-    return generate_excel(records, "hasil_filter.xlsx")
\ No newline at end of file
+    return generate_excel(df, "hasil_filter.xlsx")
\ No newline at end of file
@@ -1,20 +1,29 @@
 # data_sims.py
 from flask import (
     Blueprint, render_template, request, jsonify,
-    send_file, session, redirect, url_for, flash
+    session, redirect, url_for, flash
 )
 import pandas as pd
+import numpy as np
 from functools import wraps
-from io import BytesIO
-from openpyxl import load_workbook
-from openpyxl.worksheet.datavalidation import DataValidation
-from data_store import load_data  # cache global
-import traceback
+from data_store import load_data, get_snapshot  # cache global
+from search_index import SearchIndex, match_frame
+from lazy_scan import lazy_requested, lazy_rows
+from json_response import json_response, columnar_requested, page_values, table_data
+from conditional import conditional
+import metrics
+from query_cache import result_cache
+from sort_index import SortIndex, parse_order
+from excel_export import export_response
+import text_export
+from data_pemeriksaan import filter_mask
+from schema import display_frame
+from freq_overlap import BANDS, get_report, parse_max_km
+import logging
 import uuid
 
 data_sims_bp = Blueprint("data_sims", __name__)
-
-TEMPLATE_FILE = "Template Format Pemeriksaan UPLOAD.xlsx"
+logger = logging.getLogger(__name__)
 
 # =====================
 # CSRF TOKEN HELPER
@@ -52,56 +61,78 @@ def login_required(f):
     return wrapper
 
 # =====================
-# FILTER DATA - IMPROVED (PERBAIKAN STRING ACCESSOR)
+# FRAME TAMPILAN
+# =====================
+def display_columns(df):
+    """Kolom yang ditampilkan (tanpa kolom no), urutannya = index kolom DataTables"""
+    return [col for col in df.columns if col not in ['no', 'No', 'NO']]
+
+def build_page(df, rows):
+    """Baris halaman sebagai teks; hanya baris ini yang diformat, bukan seluruh snapshot"""
+    return display_frame(df.iloc[rows], display_columns(df))
+
+def get_search_index(snapshot):
+    """Inverted index pencarian global, dibangun sekali per snapshot"""
+    return snapshot.derived(
+        "search_index",
+        lambda df: SearchIndex(df[display_columns(df)])
+    )
+
+def search_rows(snapshot, search_value, order=None):
+    """Row-id hasil pencarian global (terurut jika `order`), di-cache per versi"""
+    if not search_value:
+        if order is None:
+            return np.arange(len(snapshot.df))
+        return snapshot.derived("sort_index", SortIndex).permutation(*order)
+
+    search_key = " ".join(search_value.lower().split())
+    rows = result_cache.get_or_compute(
+        (snapshot.version, "data_sims", search_key, None),
+        lambda: np.flatnonzero(get_search_index(snapshot).match(search_value))
+    )
+    if order is None:
+        return rows
+    return result_cache.get_or_compute(
+        (snapshot.version, "data_sims", search_key, order),
+        lambda: snapshot.derived("sort_index", SortIndex).order_rows(rows, *order)
+    )
+
+def lazy_search_rows(snapshot, search_value, needed):
+    """Row-id pencarian untuk satu halaman (mode lazy): scan per blok, tanpa menunggu index"""
+    df = snapshot.df
+    frame = df[display_columns(df)]
+    search_key = " ".join(search_value.lower().split())
+    return lazy_rows(
+        (snapshot.version, "data_sims", search_key, None), len(df),
+        lambda start, end: start + np.flatnonzero(match_frame(frame.iloc[start:end], search_value)),
+        needed
+    )
+
 # =====================
-def apply_filter(df, search_value):
+# FILTER DATA - INVERTED INDEX
+# =====================
+def apply_filter(df, search_value, index=None):
+    """Filter pencarian global.
+
+    Keyword angka harus sama persis dengan isi sel, keyword teks cukup
+    termuat di sel (OR antar keyword dalam kelompok, AND antar kelompok).
+    `index` adalah SearchIndex milik `df`; jika tidak ada, dibangun sementara.
+    """
     if not search_value or df.empty:
         return df
 
-    print(f"Applying filter for: '{search_value}'")
+    logger.debug("Applying filter for: '%s'", search_value)
 
     try:
-        # PERBAIKAN: Pastikan semua kolom adalah string
-        df = df.astype(str)
-        
-        # Convert ke lowercase untuk pencarian
-        df_search = df.applymap(lambda x: x.lower() if isinstance(x, str) else x)
-        search_lower = search_value.lower()
-
-        # Split keywords
-        keywords = search_lower.split()
-        angka = [k for k in keywords if k.isdigit()]
-        teks = [k for k in keywords if not k.isdigit()]
-
-        # Buat mask untuk filter
-        mask = pd.Series([True] * len(df), index=df.index)
-
-        # Filter angka (exact match di cell manapun)
-        if angka:
-            angka_mask = pd.Series([False] * len(df), index=df.index)
-            for a in angka:
-                # Cari di semua kolom
-                for col in df_search.columns:
-                    angka_mask = angka_mask | (df_search[col] == a)
-            mask = mask & angka_mask
-
-        # Filter teks (partial match OR di kolom manapun)
-        if teks:
-            teks_mask = pd.Series([False] * len(df), index=df.index)
-            for t in teks:
-                for col in df_search.columns:
-                    # PERBAIKAN: Gunakan .str.contains() dengan handling yang benar
-                    col_data = df_search[col].astype(str)
-                    teks_mask = teks_mask | col_data.str.contains(t, na=False)
-            mask = mask & teks_mask
-
-        result = df[mask].copy()
-        print(f"Filter result: {len(result)} rows from {len(df)}")
+        if index is None:
+            index = SearchIndex(df)
+
+        result = df[index.match(search_value)]
+        logger.debug("Filter result: %s rows from %s", len(result), len(df))
         return result
 
     except Exception as e:
-        print(f"Error in apply_filter: {e}")
-        traceback.print_exc()
+        logger.exception("Error in apply_filter: %s", e)
         return df
 
 # =====================
@@ -112,7 +143,7 @@ def apply_filter(df, search_value):
 def page():
     try:
         df = load_data()
-        print(f"Data SIMS page - Loaded {len(df)} rows")
+        logger.debug("Data SIMS page - Loaded %s rows", len(df))
 
         # Hapus kolom 'no' untuk tampilan
         cols_to_remove = ['no', 'No', 'NO']
@@ -121,7 +152,7 @@ def page():
             if col not in cols_to_remove:
                 columns.append(col)
 
-        print(f"Display columns: {columns}")
+        logger.debug("Display columns: %s", columns)
         
         # Generate CSRF token untuk template
         csrf_token = get_csrf_token()
@@ -129,7 +160,7 @@ def page():
         return render_template("data_sims.html", columns=columns, csrf_token=csrf_token)
         
     except Exception as e:
-        print(f"Error in data_sims page: {e}")
+        logger.error("Error in data_sims page: %s", e)
         flash(f"Error loading data: {str(e)}", "danger")
         return render_template("data_sims.html", columns=[], csrf_token=get_csrf_token())
 
@@ -138,6 +169,7 @@ def page():
 # =====================
 @data_sims_bp.route("/data", methods=["POST"], strict_slashes=False)
 @login_required
+@conditional
 def api():
     """API for DataTables - menggunakan POST untuk menghindari 414 error"""
     try:
@@ -148,11 +180,12 @@ def api():
                 return jsonify({"error": "Invalid CSRF token"}), 403
         
         # Load data
-        df = load_data()
-        print(f"API called - Total rows: {len(df)}")
+        snapshot = get_snapshot()
+        df = snapshot.df
+        logger.debug("API called - Total rows: %s", len(df))
 
         if df.empty:
-            print("DataFrame is empty")
+            logger.debug("DataFrame is empty")
             return jsonify({
                 "draw": 1,
                 "recordsTotal": 0,
@@ -160,15 +193,8 @@ def api():
                 "data": []
             })
 
-        # Hapus kolom no untuk display
-        display_df = df.copy()
-        cols_to_drop = ['no', 'No', 'NO']
-        for col in cols_to_drop:
-            if col in display_df.columns:
-                display_df = display_df.drop(columns=[col])
-
-        # Pastikan semua string
-        display_df = display_df.astype(str)
+        # Kolom tampilan (tanpa kolom no); teks dibuat per halaman
+        columns = display_columns(df)
 
         # Get Datatable parameters from POST data
         data = request.get_json() if request.is_json else request.form
@@ -189,37 +215,45 @@ def api():
         elif "search" in data:
             search_value = data.get("search", "").strip()
             
-        print(f"API params - draw:{draw}, start:{start}, length:{length}, search:'{search_value[:50]}...'")
+        logger.debug("API params - draw:%s, start:%s, length:%s, search:'%s...'", draw, start, length, search_value[:50])
 
-        # Apply filter
-        filtered_df = apply_filter(display_df, search_value)
+        # Urutan server-side (index kolom DataTables = kolom tampilan)
+        order = parse_order(data, columns)
+
+        # Apply filter (row-id hasil filter di-cache, paging cukup slice);
+        # mode lazy: halaman dulu, jumlah persis lewat request berikutnya
+        with metrics.FILTER_SECONDS.time(endpoint=request.endpoint):
+            if (search_value and order is None and lazy_requested(data)
+                    and not snapshot.built("search_index")):
+                rows, total_filtered, count_exact = lazy_search_rows(snapshot, search_value, start + length)
+            else:
+                rows = search_rows(snapshot, search_value, order)
+                total_filtered, count_exact = len(rows), True
 
         # Paginate
-        total_records = len(display_df)
-        total_filtered = len(filtered_df)
-        page_df = filtered_df.iloc[start:start + length] if total_filtered > 0 else pd.DataFrame()
+        total_records = len(df)
+        page_df = build_page(df, rows[start:start + length])
 
-        # Prepare data for Datatables
-        data_list = []
-        for _, row in page_df.iterrows():
-            # Convert row ke list dalam urutan kolom
-            row_data = [str(row[col]) if pd.notna(row[col]) else "" for col in display_df.columns]
-            data_list.append(row_data)
+        # Prepare data for Datatables (teks halaman sudah bersih, diambil per kolom)
+        columnar = columnar_requested(data)
+        values = page_values(page_df, columns)
 
-        print(f"Returning {len(data_list)} rows, total:{total_records}, filtered:{total_filtered}")
+        logger.debug("Returning %s rows, total:%s, filtered:%s", len(page_df), total_records, total_filtered)
 
         response = {
             "draw": draw,
             "recordsTotal": total_records,
             "recordsFiltered": total_filtered,
-            "data": data_list
+            "countExact": count_exact,
+            "data": table_data(values, columns, columnar)
         }
+        if columnar:
+            response["layout"] = "columns"
 
-        return jsonify(response)
+        return json_response(response)
 
     except Exception as e:
-        print(f"Error in data_sims API: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error in data_sims API: %s", e)
         return jsonify({
             "draw": 1,
             "recordsTotal": 0,
@@ -233,11 +267,13 @@ def api():
 # =====================
 @data_sims_bp.route("/data-get", methods=["GET"], strict_slashes=False)
 @login_required
+@conditional
 def api_get():
     """Alternatif API dengan GET untuk kompatibilitas"""
     try:
         # Load data
-        df = load_data()
+        snapshot = get_snapshot()
+        df = snapshot.df
         
         if df.empty:
             return jsonify({
@@ -247,15 +283,8 @@ def api_get():
                 "data": []
             })
 
-        # Hapus kolom no untuk display
-        display_df = df.copy()
-        cols_to_drop = ['no', 'No', 'NO']
-        for col in cols_to_drop:
-            if col in display_df.columns:
-                display_df = display_df.drop(columns=[col])
-
-        # Pastikan semua string
-        display_df = display_df.astype(str)
+        # Kolom tampilan (tanpa kolom no); teks dibuat per halaman
+        columns = display_columns(df)
 
         # Get parameters
         draw = int(request.args.get("draw", 1))
@@ -266,33 +295,43 @@ def api_get():
         # Batasi panjang search untuk menghindari 414 error
         if len(search_value) > 1000:
             search_value = search_value[:1000]
-            print(f"Search truncated to 1000 characters")
+            logger.warning("Search truncated to 1000 characters")
 
-        # Apply filter
-        filtered_df = apply_filter(display_df, search_value)
+        # Urutan server-side (index kolom DataTables = kolom tampilan)
+        order = parse_order(request.args, columns)
+
+        # Apply filter (row-id hasil filter di-cache, paging cukup slice);
+        # mode lazy: halaman dulu, jumlah persis lewat request berikutnya
+        with metrics.FILTER_SECONDS.time(endpoint=request.endpoint):
+            if (search_value and order is None and lazy_requested(request.args)
+                    and not snapshot.built("search_index")):
+                rows, total_filtered, count_exact = lazy_search_rows(snapshot, search_value, start + length)
+            else:
+                rows = search_rows(snapshot, search_value, order)
+                total_filtered, count_exact = len(rows), True
 
         # Paginate
-        total_records = len(display_df)
-        total_filtered = len(filtered_df)
-        page_df = filtered_df.iloc[start:start + length] if total_filtered > 0 else pd.DataFrame()
+        total_records = len(df)
+        page_df = build_page(df, rows[start:start + length])
 
-        # Prepare data
-        data_list = []
-        for _, row in page_df.iterrows():
-            row_data = [str(row[col]) if pd.notna(row[col]) else "" for col in display_df.columns]
-            data_list.append(row_data)
+        # Prepare data (teks halaman sudah bersih, diambil per kolom)
+        columnar = columnar_requested(request.args)
+        values = page_values(page_df, columns)
 
         response = {
             "draw": draw,
             "recordsTotal": total_records,
             "recordsFiltered": total_filtered,
-            "data": data_list
+            "countExact": count_exact,
+            "data": table_data(values, columns, columnar)
         }
+        if columnar:
+            response["layout"] = "columns"
 
-        return jsonify(response)
+        return json_response(response)
 
     except Exception as e:
-        print(f"Error in data_sims API GET: {str(e)}")
+        logger.error("Error in data_sims API GET: %s", e)
         return jsonify({
             "draw": 1,
             "recordsTotal": 0,
@@ -301,20 +340,12 @@ def api_get():
             "error": str(e)
         }), 500
 
-# =====================
-# HELPER
-# =====================
-def div_1000(val):
-    try:
-        return float(val) / 1000
-    except:
-        return ""
-
 # =====================
 # DOWNLOAD EXCEL VIA POST (FIX 414 ERROR)
 # =====================
 @data_sims_bp.route("/data-sims/download", methods=["POST"], strict_slashes=False)
 @login_required
+@conditional
 def download_post():
     try:
         # Validasi CSRF
@@ -324,99 +355,22 @@ def download_post():
             return redirect(url_for('data_sims.page'))
         
         search_value = request.form.get("search", "")
-        print(f"Download POST - Search: '{search_value}'")
-
-        df = load_data()
+        logger.debug("Download POST - Search: '%s'", search_value)
 
-        # Hapus kolom no
-        cols_to_drop = ['no', 'No', 'NO']
-        for col in cols_to_drop:
-            if col in df.columns:
-                df = df.drop(columns=[col])
+        snapshot = get_snapshot()
 
-        # Apply filter jika ada search
-        if search_value:
-            df = apply_filter(df, search_value)
-        
-        print(f"Downloading {len(df)} rows")
+        # Baris hasil pencarian (row-id dari cache/index), tanpa salin DataFrame
+        rows = search_rows(snapshot, search_value) if search_value else None
 
-        wb = load_workbook(TEMPLATE_FILE)
-        ws = wb.active
-        START_ROW = 7
-
-        # Data validations
-        dv_metode = DataValidation(
-            type="list",
-            formula1='"Inspeksi melalui Open Shelter,Pemeriksaan melalui Remote Site"',
-            allow_blank=True
-        )
-        dv_sertifikat = DataValidation(
-            type="list",
-            formula1='"Ada,Tidak"',
-            allow_blank=True
-        )
-        dv_status = DataValidation(
-            type="list",
-            formula1='"Sesuai ISR,Tidak Sesuai Parameter Teknis,Tidak Berizin,Tidak Aktif"',
-            allow_blank=True
-        )
-
-        ws.add_data_validation(dv_metode)
-        ws.add_data_validation(dv_sertifikat)
-        ws.add_data_validation(dv_status)
-
-        for i, (_, r) in enumerate(df.iterrows()):
-            row = START_ROW + i
-
-            ws.cell(row=row, column=1).value = i + 1
-            dv_metode.add(ws.cell(row=row, column=3))
-
-            # Fill data dengan handle None/NaN
-            ws.cell(row=row, column=4).value = str(r.get("CLNT_ID", "")) if pd.notna(r.get("CLNT_ID")) else ""
-            ws.cell(row=row, column=5).value = str(r.get("CLNT_NAME", "")) if pd.notna(r.get("CLNT_NAME")) else ""
-            ws.cell(row=row, column=7).value = str(r.get("CURR_LIC_NUM", "")) if pd.notna(r.get("CURR_LIC_NUM")) else ""
-            ws.cell(row=row, column=8).value = str(r.get("LINK_ID", "")) if pd.notna(r.get("LINK_ID")) else ""
-            ws.cell(row=row, column=9).value = str(r.get("STN_NAME", "")) if pd.notna(r.get("STN_NAME")) else ""
-            ws.cell(row=row, column=10).value = str(r.get("STASIUN_LAWAN", "")) if pd.notna(r.get("STASIUN_LAWAN")) else ""
-            ws.cell(row=row, column=11).value = str(r.get("SID_LONG", "")) if pd.notna(r.get("SID_LONG")) else ""
-            ws.cell(row=row, column=12).value = str(r.get("SID_LAT", "")) if pd.notna(r.get("SID_LAT")) else ""
-            ws.cell(row=row, column=13).value = str(r.get("FREQ", "")) if pd.notna(r.get("FREQ")) else ""
-            ws.cell(row=row, column=14).value = str(r.get("FREQ_PAIR", "")) if pd.notna(r.get("FREQ_PAIR")) else ""
-            bwidth = str(r.get("BWIDTH", "")) if pd.notna(r.get("BWIDTH")) else ""
-            ws.cell(row=row, column=15).value = div_1000(bwidth)
-            ws.cell(row=row, column=16).value = str(r.get("EQ_MDL", "")) if pd.notna(r.get("EQ_MDL")) else ""
-            ws.cell(row=row, column=17).value = str(r.get("STN_NAME", "")) if pd.notna(r.get("STN_NAME")) else ""
-            ws.cell(row=row, column=18).value = str(r.get("STASIUN_LAWAN", "")) if pd.notna(r.get("STASIUN_LAWAN")) else ""
-            ws.cell(row=row, column=19).value = str(r.get("LONG", "")) if pd.notna(r.get("LONG")) else ""
-            ws.cell(row=row, column=20).value = str(r.get("LAT", "")) if pd.notna(r.get("LAT")) else ""
-            ws.cell(row=row, column=21).value = str(r.get("FREQ", "")) if pd.notna(r.get("FREQ")) else ""
-            ws.cell(row=row, column=22).value = str(r.get("FREQ_PAIR", "")) if pd.notna(r.get("FREQ_PAIR")) else ""
-            ws.cell(row=row, column=23).value = div_1000(bwidth)
-            ws.cell(row=row, column=24).value = str(r.get("EQ_MDL", "")) if pd.notna(r.get("EQ_MDL")) else ""
-
-            dv_sertifikat.add(ws.cell(row=row, column=25))
-            dv_status.add(ws.cell(row=row, column=26))
-            ws.cell(row=row, column=27).value = str(r.get("MULAI BEROPERASI", "")) if pd.notna(r.get("MULAI BEROPERASI")) else ""
-            ws.cell(row=row, column=28).value = str(r.get("KETERANGAN", "")) if pd.notna(r.get("KETERANGAN")) else ""
-            ws.cell(row=row, column=29).value = str(r.get("CITY", "")) if pd.notna(r.get("CITY")) else ""
-
-        out = BytesIO()
-        wb.save(out)
-        out.seek(0)
+        logger.debug("Downloading %s rows", len(snapshot.df) if rows is None else len(rows))
 
         timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
         filename = f"laporan_data_sims_{timestamp}.xlsx"
 
-        return send_file(
-            out,
-            download_name=filename,
-            as_attachment=True,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        return export_response(snapshot.df, filename, rows)
 
     except Exception as e:
-        print(f"Error downloading file via POST: {e}")
-        traceback.print_exc()
+        logger.exception("Error downloading file via POST: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # =====================
@@ -424,95 +378,154 @@ def download_post():
 # =====================
 @data_sims_bp.route("/data-sims/download-all", strict_slashes=False)
 @login_required
+@conditional
 def download_all():
     """Download semua data tanpa filter"""
     try:
         df = load_data()
 
-        # Hapus kolom no
-        cols_to_drop = ['no', 'No', 'NO']
-        for col in cols_to_drop:
-            if col in df.columns:
-                df = df.drop(columns=[col])
-        
-        print(f"Downloading ALL {len(df)} rows")
+        logger.debug("Downloading ALL %s rows", len(df))
 
-        wb = load_workbook(TEMPLATE_FILE)
-        ws = wb.active
-        START_ROW = 7
+        timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"laporan_data_sims_all_{timestamp}.xlsx"
 
-        # Data validations
-        dv_metode = DataValidation(
-            type="list",
-            formula1='"Inspeksi melalui Open Shelter,Pemeriksaan melalui Remote Site"',
-            allow_blank=True
-        )
-        dv_sertifikat = DataValidation(
-            type="list",
-            formula1='"Ada,Tidak"',
-            allow_blank=True
-        )
-        dv_status = DataValidation(
-            type="list",
-            formula1='"Sesuai ISR,Tidak Sesuai Parameter Teknis,Tidak Berizin,Tidak Aktif"',
-            allow_blank=True
+        return export_response(df, filename)
+
+    except Exception as e:
+        logger.exception("Error downloading all data: %s", e)
+        flash(f"Error downloading file: {str(e)}", "danger")
+        return redirect(url_for('data_sims.page'))
+
+# =====================
+# EXPORT CSV / NDJSON (STREAMING)
+# =====================
+@data_sims_bp.route("/data-sims/export", strict_slashes=False)
+@login_required
+@conditional
+def export_rows():
+    """Export baris mentah hasil filter sebagai CSV/NDJSON, opsional gzip.
+
+    Parameter: search (pencarian global), field filter pemeriksaan
+    (client_id, client_name, link_id, ...), rentang (freq_min, freq_max, ...),
+    format=csv|ndjson, gzip=1.
+    """
+    try:
+        fmt = request.args.get("format", "csv").lower()
+        if fmt not in text_export.FORMATS:
+            return jsonify({"error": f"Format tidak didukung: {fmt}"}), 400
+        compress = request.args.get("gzip", "") in ("1", "true", "yes")
+        search_value = request.args.get("search", "")
+
+        snapshot = get_snapshot()
+        df = snapshot.df
+
+        rows = search_rows(snapshot, search_value) if search_value else None
+        try:
+            mask = filter_mask(request.args, snapshot)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if mask is not None:
+            rows = np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+
+        cols = [col for col in df.columns if col not in ['no', 'No', 'NO']]
+        logger.debug("Export %s: %s rows", fmt, len(df) if rows is None else len(rows))
+
+        timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
+        return text_export.export_response(
+            df[cols], f"data_sims_{timestamp}", fmt, rows, compress
         )
 
-        ws.add_data_validation(dv_metode)
-        ws.add_data_validation(dv_sertifikat)
-        ws.add_data_validation(dv_status)
-
-        for i, (_, r) in enumerate(df.iterrows()):
-            row = START_ROW + i
-
-            ws.cell(row=row, column=1).value = i + 1
-            dv_metode.add(ws.cell(row=row, column=3))
-
-            # Fill data
-            ws.cell(row=row, column=4).value = str(r.get("CLNT_ID", "")) if pd.notna(r.get("CLNT_ID")) else ""
-            ws.cell(row=row, column=5).value = str(r.get("CLNT_NAME", "")) if pd.notna(r.get("CLNT_NAME")) else ""
-            ws.cell(row=row, column=7).value = str(r.get("CURR_LIC_NUM", "")) if pd.notna(r.get("CURR_LIC_NUM")) else ""
-            ws.cell(row=row, column=8).value = str(r.get("LINK_ID", "")) if pd.notna(r.get("LINK_ID")) else ""
-            ws.cell(row=row, column=9).value = str(r.get("STN_NAME", "")) if pd.notna(r.get("STN_NAME")) else ""
-            ws.cell(row=row, column=10).value = str(r.get("STASIUN_LAWAN", "")) if pd.notna(r.get("STASIUN_LAWAN")) else ""
-            ws.cell(row=row, column=11).value = str(r.get("SID_LONG", "")) if pd.notna(r.get("SID_LONG")) else ""
-            ws.cell(row=row, column=12).value = str(r.get("SID_LAT", "")) if pd.notna(r.get("SID_LAT")) else ""
-            ws.cell(row=row, column=13).value = str(r.get("FREQ", "")) if pd.notna(r.get("FREQ")) else ""
-            ws.cell(row=row, column=14).value = str(r.get("FREQ_PAIR", "")) if pd.notna(r.get("FREQ_PAIR")) else ""
-            bwidth = str(r.get("BWIDTH", "")) if pd.notna(r.get("BWIDTH")) else ""
-            ws.cell(row=row, column=15).value = div_1000(bwidth)
-            ws.cell(row=row, column=16).value = str(r.get("EQ_MDL", "")) if pd.notna(r.get("EQ_MDL")) else ""
-            ws.cell(row=row, column=17).value = str(r.get("STN_NAME", "")) if pd.notna(r.get("STN_NAME")) else ""
-            ws.cell(row=row, column=18).value = str(r.get("STASIUN_LAWAN", "")) if pd.notna(r.get("STASIUN_LAWAN")) else ""
-            ws.cell(row=row, column=19).value = str(r.get("LONG", "")) if pd.notna(r.get("LONG")) else ""
-            ws.cell(row=row, column=20).value = str(r.get("LAT", "")) if pd.notna(r.get("LAT")) else ""
-            ws.cell(row=row, column=21).value = str(r.get("FREQ", "")) if pd.notna(r.get("FREQ")) else ""
-            ws.cell(row=row, column=22).value = str(r.get("FREQ_PAIR", "")) if pd.notna(r.get("FREQ_PAIR")) else ""
-            ws.cell(row=row, column=23).value = div_1000(bwidth)
-            ws.cell(row=row, column=24).value = str(r.get("EQ_MDL", "")) if pd.notna(r.get("EQ_MDL")) else ""
-
-            dv_sertifikat.add(ws.cell(row=row, column=25))
-            dv_status.add(ws.cell(row=row, column=26))
-            ws.cell(row=row, column=27).value = str(r.get("MULAI BEROPERASI", "")) if pd.notna(r.get("MULAI BEROPERASI")) else ""
-            ws.cell(row=row, column=28).value = str(r.get("KETERANGAN", "")) if pd.notna(r.get("KETERANGAN")) else ""
-            ws.cell(row=row, column=29).value = str(r.get("CITY", "")) if pd.notna(r.get("CITY")) else ""
-
-        out = BytesIO()
-        wb.save(out)
-        out.seek(0)
+    except Exception as e:
+        logger.exception("Error exporting data: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+# =====================
+# LAPORAN IRISAN FREKUENSI (KANDIDAT INTERFERENSI)
+# =====================
+OVERLAP_COLUMNS = ["LINK_ID", "CLNT_NAME", "STN_NAME"]
+
+def overlap_page(df, report, start, length):
+    """Baris halaman laporan: satu dict per pasangan link (kolom _a / _b)"""
+    end = min(start + length, len(report))
+    a, b = report.a[start:end], report.b[start:end]
+    columns = [col for col in OVERLAP_COLUMNS if col in df.columns]
+    side_a = display_frame(df.iloc[a], columns)
+    side_b = display_frame(df.iloc[b], columns)
+    data = []
+    for k in range(end - start):
+        row = {"no_a": str(a[k] + 1), "no_b": str(b[k] + 1)}
+        for j, col in enumerate(columns):
+            row[f"{col}_a"] = side_a.iat[k, j]
+            row[f"{col}_b"] = side_b.iat[k, j]
+        row["band_a"] = BANDS[report.band_a[start + k]]
+        row["band_b"] = BANDS[report.band_b[start + k]]
+        row["overlap_mhz"] = round(float(report.overlap_mhz[start + k]), 4)
+        distance = report.distance_km[start + k]
+        row["distance_km"] = "" if np.isnan(distance) else round(float(distance), 3)
+        data.append(row)
+    return data
+
+@data_sims_bp.route("/data-sims/overlap", methods=["GET", "POST"], strict_slashes=False)
+@login_required
+@conditional
+def overlap():
+    """Pasangan link dengan pita FREQ/FREQ_PAIR (center +- BWIDTH/2) beririsan.
+
+    Parameter: max_km (opsional, batas jarak antar stasiun), draw/start/length.
+    Hasil di-cache per snapshot per max_km; urut dari irisan terbesar.
+    """
+    try:
+        data = request.form if request.method == "POST" else request.args
+        draw = int(data.get("draw", 1))
+        start = max(int(data.get("start", 0)), 0)
+        length = int(data.get("length", 25))
+        try:
+            max_km = parse_max_km(data.get("max_km", ""))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        snapshot = get_snapshot()
+        report = get_report(snapshot, max_km)
+        logger.debug("Overlap report - max_km:%s, pairs:%s, strategy:%s, %ss", max_km, len(report), report.strategy, report.seconds)
+
+        return jsonify({
+            "draw": draw,
+            "recordsTotal": len(report),
+            "recordsFiltered": len(report),
+            "data": overlap_page(snapshot.df, report, start, length),
+            **report.summary(),
+        })
+
+    except Exception as e:
+        logger.exception("Error in overlap report: %s", e)
+        return jsonify({
+            "draw": 1,
+            "recordsTotal": 0,
+            "recordsFiltered": 0,
+            "data": [],
+            "error": str(e)
+        }), 500
+
+@data_sims_bp.route("/data-sims/overlap/download", strict_slashes=False)
+@login_required
+@conditional
+def overlap_download():
+    """Export template Excel untuk link yang terlibat di laporan irisan frekuensi"""
+    try:
+        try:
+            max_km = parse_max_km(request.args.get("max_km", ""))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        snapshot = get_snapshot()
+        rows = get_report(snapshot, max_km).rows()
+        logger.debug("Downloading overlap report: %s rows", len(rows))
 
         timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"laporan_data_sims_all_{timestamp}.xlsx"
+        filename = f"laporan_irisan_frekuensi_{timestamp}.xlsx"
 
-        return send_file(
-            out,
-            download_name=filename,
-            as_attachment=True,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        return export_response(snapshot.df, filename, rows)
 
     except Exception as e:
-        print(f"Error downloading all data: {e}")
-        traceback.print_exc()
-        flash(f"Error downloading file: {str(e)}", "danger")
-        return redirect(url_for('data_sims.page'))
\ No newline at end of file
+        logger.exception("Error downloading overlap report: %s", e)
+        return jsonify({"error": str(e)}), 500
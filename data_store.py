@@ -1,137 +1,1059 @@
 # data_store.py
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import ctypes
+import json
+import logging
+import mmap
 import os
+import sys
 import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
+from ingest import ExcelReader
+from schema import clean_frame, clean_stats, is_number
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: lock antar proses tidak tersedia
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    _libc = ctypes.CDLL("libc.so.6")
+except OSError:  # bukan Linux/glibc
+    _libc = None
+
+logger = logging.getLogger(__name__)
+
 DATA_FILE = "data.xlsx"
 
-_df_cache = None
+# Snapshot biner kolumnar (Arrow IPC / Feather v2) hasil clean_dataframe.
+# data.xlsx hanya dipakai sebagai format impor; pembacaan rutin lewat file ini.
+SNAPSHOT_FILE = "data_snapshot.arrow"
+SNAPSHOT_FORMAT = "1"
+
+# Kolom teks dengan nilai unik <= rasio ini dari jumlah baris dimuat sebagai category
+CATEGORY_MAX_RATIO = float(os.getenv("CATEGORY_MAX_RATIO", "0.5"))
+
+# Versi snapshot aktif yang dibagi antar worker gunicorn (file kecil di-mmap)
+VERSION_FILE = "data_snapshot.version"
+LOCK_FILE = "data_snapshot.lock"
+_VERSION_SIZE = 64
+
+# Interval cek perubahan data.xlsx (detik); cek versi snapshot tiap request
+SOURCE_CHECK_SECONDS = 2.0
+
+# Journal edit/hapus satu baris (JSON per baris) di atas snapshot dasar;
+# dipadatkan ke snapshot baru setelah JOURNAL_COMPACT_ENTRIES entri
+JOURNAL_FILE = "data_journal.jsonl"
+JOURNAL_COMPACT_ENTRIES = int(os.getenv("JOURNAL_COMPACT_ENTRIES", "200"))
+
+_snapshot = None
 _file_mtime = None
+_snapshot_stat = None
+_source_checked = 0.0
+_journal_base = None      # versi snapshot dasar yang di-replay journal-nya
+_journal_offset = 0       # byte journal yang sudah diterapkan
+_journal_seq = 0          # jumlah entri journal yang sudah diterapkan
+_compacting = False
 _lock = threading.Lock()
+_publish_hooks = []
+_eager_derived = {}      # key -> builder, dibangun langsung saat snapshot dipublikasikan
 
+# Durasi muat snapshot per jenis: rebuild (dari Excel), read (file snapshot),
+# journal (replay), upload (job upload sampai commit)
+LOAD_SECONDS = metrics.histogram(
+    "dasimm_snapshot_load_seconds", "Durasi memuat snapshot per jenis", ("kind",),
+    buckets=metrics.DEFAULT_BUCKETS + (60.0, 120.0, 300.0))
+RELOADS = metrics.counter("dasimm_snapshot_reloads_total", "Snapshot dimuat ulang per jenis", ("kind",))
+PARSE_SECONDS = metrics.histogram(
+    "dasimm_excel_parse_seconds", "Durasi parse + clean data.xlsx",
+    buckets=metrics.DEFAULT_BUCKETS + (60.0, 120.0, 300.0))
 
-def clean_dataframe(df):
-    """Membersihkan dataframe: handle NaN, format string, reset index"""
-    if df.empty:
-        return df
-    
-    # Fill NaN dengan string kosong
-    df = df.fillna("")
-    
-    # Convert semua kolom ke string (kecuali yang numeric penting)
-    for col in df.columns:
-        # Skip kolom yang seharusnya numeric
-        col_lower = col.lower()
-        if any(numeric in col_lower for numeric in ['freq', 'bwidth', 'long', 'lat']):
+
+def clean_dataframe(df, stage="load"):
+    """Membersihkan dataframe menurut schema SIMS (lihat schema.clean_frame)"""
+    return clean_frame(df, stage)
+
+
+# =====================
+# SINKRONISASI ANTAR WORKER
+# =====================
+class SharedVersion:
+    """Versi snapshot aktif dalam file kecil yang di-mmap oleh semua worker.
+
+    Membaca versi hanya membaca memori (tanpa syscall). Penulisan dilakukan
+    di bawah `process_lock`; pembacaan yang terpotong hanya membuat reader
+    jatuh ke jalur lambat (cek stat file snapshot), bukan data yang salah.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mm = None
+        self.available = True
+
+    def _map(self):
+        if self._mm is None:
             try:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                df[col] = df[col].fillna("")
-            except:
-                df[col] = df[col].astype(str)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    if os.fstat(fd).st_size < _VERSION_SIZE:
+                        os.ftruncate(fd, _VERSION_SIZE)
+                    self._mm = mmap.mmap(fd, _VERSION_SIZE)
+                finally:
+                    os.close(fd)
+            except OSError:
+                # Tidak bisa dibuat (mis. direktori read-only): cek stat tiap request
+                self.available = False
+                raise
+        return self._mm
+
+    def read(self):
+        if not self.available:
+            return None
+        try:
+            return self._map()[:_VERSION_SIZE].rstrip(b"\0").decode() or None
+        except (OSError, ValueError, UnicodeDecodeError):
+            return None
+
+    def write(self, version):
+        if not self.available:
+            return
+        try:
+            data = (version or "").encode()[:_VERSION_SIZE]
+            mm = self._map()
+            mm[:_VERSION_SIZE] = data.ljust(_VERSION_SIZE, b"\0")
+            mm.flush()
+        except (OSError, ValueError) as e:
+            logger.error("Error writing shared version: %s", e)
+
+
+_shared_version = SharedVersion(VERSION_FILE)
+
+
+@contextmanager
+def process_lock():
+    """Lock antar proses (fcntl) untuk rebuild/tulis snapshot; no-op tanpa fcntl"""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+# =====================
+# SNAPSHOT KOLUMNAR
+# =====================
+def _source_stamp():
+    """Cap versi data.xlsx (mtime + ukuran), None jika file tidak ada"""
+    try:
+        st = os.stat(DATA_FILE)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _snapshot_file_stat():
+    try:
+        st = os.stat(SNAPSHOT_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _read_snapshot_meta():
+    """Baca metadata snapshot tanpa memuat datanya"""
+    try:
+        with pa.memory_map(SNAPSHOT_FILE, "r") as source:
+            meta = pa.ipc.open_file(source).schema.metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid, OSError):
+        return None
+    return {k.decode(): v.decode() for k, v in meta.items() if k.startswith(b"dasimm.")}
+
+
+def _write_snapshot(df, source):
+    """Tulis dataframe bersih ke snapshot Arrow secara atomik, kembalikan versinya"""
+    df = df.copy()
+    empty_as_null = []
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Category hanya bentuk di memori; di file tetap string biasa
+            df[col] = df[col].astype(str)
+            continue
+        if pd.api.types.is_float_dtype(df[col].dtype) or isinstance(df[col].dtype, pd.Int64Dtype):
+            # Disimpan float dengan null; dibaca ulang sebagai int jika tidak ada sel kosong
+            df[col] = df[col].astype("float64")
+            empty_as_null.append(col)
+            continue
+        if df[col].dtype != object:
+            continue
+        # Kolom numeric campuran (float + "") disimpan sebagai float dengan null
+        if all(isinstance(v, str) for v in df[col]):
+            continue
+        numeric = pd.to_numeric(df[col].replace("", None), errors="coerce")
+        if numeric.notna().sum() == (df[col].notna() & (df[col] != "")).sum():
+            df[col] = numeric
+            empty_as_null.append(col)
         else:
             df[col] = df[col].astype(str)
-    
-    # Reset whitespace - PERBAIKAN: gunakan .map() bukan .applymap()
-    df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
-    
-    # Reset index dan tambahkan kolom no jika tidak ada
-    df = df.reset_index(drop=True)
-    if "no" not in df.columns and "No" not in df.columns:
-        df.insert(0, "no", range(1, len(df) + 1))
-    
+
+    version = f"{time.time_ns():x}"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"dasimm.format": SNAPSHOT_FORMAT.encode(),
+        b"dasimm.version": version.encode(),
+        b"dasimm.source": (source or "").encode(),
+        b"dasimm.empty_as_null": "\t".join(empty_as_null).encode(),
+    })
+
+    tmp_path = f"{SNAPSHOT_FILE}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, SNAPSHOT_FILE)
+    return version
+
+
+try:
+    # Sama dengan dtype "str" bawaan pandas 3, tetapi eksplisit berbasis Arrow
+    _ARROW_STRING = pd.StringDtype("pyarrow", na_value=float("nan"))
+except TypeError:  # pandas < 2.3
+    _ARROW_STRING = None
+
+
+def _arrow_types(arrow_type):
+    """Kolom string tetap berbasis Arrow (zero-copy dari halaman mmap bersama)"""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return _ARROW_STRING
+    return None
+
+
+def _is_string(arrow_type):
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+def _encode_categories(table):
+    """Kolom teks dengan sedikit nilai unik (CITY, CLNT_NAME, EQ_MDL, ...) di-dictionary-encode.
+
+    Hasilnya kolom category di pandas: kode int8/int16 per baris plus satu
+    salinan tiap nilai unik. Kolom yang hampir unik (LINK_ID, dll) tetap string.
+    """
+    rows = table.num_rows
+    for i, field in enumerate(table.schema):
+        if not rows or not _is_string(field.type):
+            continue
+        column = table.column(i)
+        if pc.count_distinct(column, mode="all").as_py() <= rows * CATEGORY_MAX_RATIO:
+            table = table.set_column(i, field.name, column.dictionary_encode())
+    return table
+
+
+def _read_snapshot():
+    """Buka snapshot Arrow (memory-mapped) dan kembalikan (df, metadata).
+
+    Buffer kolom string menunjuk langsung ke page cache file snapshot, sehingga
+    semua worker memakai halaman memori yang sama tanpa salinan privat. Kolom
+    numeric bertipe float64/int64 dengan NaN untuk sel kosong.
+    """
+    with pa.memory_map(SNAPSHOT_FILE, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    meta = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()
+            if k.startswith(b"dasimm.")}
+    df = _encode_categories(table).to_pandas(split_blocks=True, types_mapper=_arrow_types)
+    for col in filter(None, meta.get("dasimm.empty_as_null", "").split("\t")):
+        if col in df.columns and not df[col].hasnans and len(df) and (df[col] % 1 == 0).all():
+            # Tanpa sel kosong dan semua bulat -> int, sama seperti clean_dataframe
+            df[col] = df[col].astype("int64")
+    return df, meta
+
+
+class SnapshotWriter:
+    """Tulis snapshot baru per potongan tanpa memuat seluruh data sekaligus.
+
+    Setiap potongan dibersihkan dengan clean_dataframe lalu ditulis sebagai
+    batch Arrow; kolom numeric disimpan float dengan null untuk sel kosong
+    dan nomor urut "no" dilanjutkan antar potongan. `commit` mengganti
+    snapshot aktif secara atomik, `abort` membuang file sementara.
+
+    `base`: versi snapshot yang barisnya ditulis lebih dulu (mode tambah); edit
+    journal setelah versi itu diterapkan ulang saat commit. `replace_source`:
+    data.xlsx lama dihapus saat commit (upload ulang), snapshot tidak terikat ke file itu.
+    """
+
+    def __init__(self, columns, base=None, replace_source=False):
+        self.columns = [col for col in columns if col not in ("no", "No", "NO")]
+        self.numeric = [col for col in self.columns if is_number(col)]
+        self.base = base
+        self.replace_source = replace_source
+        source = self.source = None if replace_source else _source_stamp()
+        self.version = f"{time.time_ns():x}"
+        self.rows = 0
+
+        fields = [pa.field("no", pa.int64())] + [
+            pa.field(col, pa.float64() if col in self.numeric else pa.string())
+            for col in self.columns
+        ]
+        self.schema = pa.schema(fields, metadata={
+            b"dasimm.format": SNAPSHOT_FORMAT.encode(),
+            b"dasimm.version": self.version.encode(),
+            b"dasimm.source": (source or "").encode(),
+            b"dasimm.empty_as_null": "\t".join(self.numeric).encode(),
+        })
+        self.tmp_path = f"{SNAPSHOT_FILE}.{os.getpid()}.{self.version}.tmp"
+        self._sink = pa.OSFile(self.tmp_path, "wb")
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, chunk, cleaned=False):
+        """Bersihkan dan tulis satu potongan (kolom yang tidak ada diisi "").
+
+        `cleaned=True` jika potongan sudah melewati clean_dataframe (mis. parse paralel).
+        """
+        chunk = chunk.drop(columns=[c for c in ("no", "No", "NO") if c in chunk.columns])
+        chunk = chunk.reindex(columns=self.columns, fill_value="")
+        if chunk.empty:
+            return
+        if not cleaned:
+            chunk = clean_dataframe(chunk, "upload")
+        chunk["no"] = np.arange(self.rows + 1, self.rows + len(chunk) + 1)
+
+        arrays = []
+        for field in self.schema:
+            values = chunk[field.name]
+            if field.name in self.numeric:
+                values = pd.to_numeric(values.where(values != "", None), errors="coerce")
+                arrays.append(pa.array(values.astype("float64"), type=pa.float64(), from_pandas=True))
+            elif field.name == "no":
+                arrays.append(pa.array(values.to_numpy(dtype=np.int64)))
+            else:
+                arrays.append(pa.array(values.astype(str), type=pa.string(), from_pandas=True))
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows += len(chunk)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+
+    def abort(self):
+        self._close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def _pending_entries(self):
+        """Entri journal milik `base` yang dicatat setelah versi `base` (dipanggil di bawah process_lock).
+
+        RuntimeError jika snapshot dasar sudah diganti (save_data / pemadatan
+        journal): baris lama yang ditulis tidak lagi sama dengan data aktif.
+        """
+        if self.base is None:
+            return []
+        base, _, seq = self.base.partition(".")
+        meta = _read_snapshot_meta()
+        if meta is None or meta.get("dasimm.version") != base:
+            raise RuntimeError("Data diubah/disimpan ulang selama upload berjalan, silakan upload ulang")
+        entries, _ = _read_journal(0)
+        return [entry for entry in entries
+                if entry.get("base") == base and entry["seq"] > int(seq or 0)]
+
+    def commit(self):
+        """Ganti snapshot aktif dengan hasil tulisan ini dan publikasikan.
+
+        Edit/hapus yang masuk journal selama penulisan ditulis ulang di atas
+        snapshot baru (baris lama tetap di posisi yang sama), bukan dibuang.
+        """
+        self._close()
+        with _lock:
+            with process_lock():
+                pending = self._pending_entries()
+                if self.replace_source and os.path.exists(DATA_FILE):
+                    os.remove(DATA_FILE)
+                os.replace(self.tmp_path, SNAPSHOT_FILE)
+                _truncate_journal()
+                for seq, entry in enumerate(pending, 1):
+                    _append_journal({**entry, "seq": seq, "base": self.version})
+                version = f"{self.version}.{len(pending)}" if pending else self.version
+                _shared_version.write(version)
+            df, _ = _read_snapshot()
+            df = _catch_up(df, self.version, self.source, 0, 0).df
+        RELOADS.inc(kind="upload")
+        logger.info("Snapshot written in chunks. Version: %s, shape: %s, replayed edits: %s",
+                    version, df.shape, len(pending))
+        return df
+
+
+def _merge_cleaned(chunks, columns):
+    """Gabungkan potongan hasil clean_dataframe menjadi hasil yang sama dengan
+    clean_dataframe atas seluruh data (nomor urut dan tipe kolom numeric)"""
+    df = pd.concat(chunks, ignore_index=True)
+    if "no" not in columns and "No" not in columns:
+        df["no"] = np.arange(1, len(df) + 1)
+    for col in df.columns:
+        # Potongan tanpa sel kosong bisa bertipe int; hitung ulang per kolom utuh
+        if is_number(col) and df[col].dtype == object:
+            df[col] = pd.to_numeric(df[col].where(df[col] != ""), errors="coerce").fillna("")
     return df
 
 
-def load_data():
-    """Load data dari Excel dengan caching"""
-    global _df_cache, _file_mtime
-    
-    print(f"Loading data from {DATA_FILE}...")
-    
-    if not os.path.exists(DATA_FILE):
-        print("Data file not found, returning empty DataFrame")
-        return pd.DataFrame()
-    
+def _parse_excel_parallel():
+    """Parse + clean data.xlsx per rentang baris di process pool (sheet besar).
+
+    Kembalikan None jika file tidak cocok untuk jalur paralel.
+    """
+    with ExcelReader(DATA_FILE) as reader:
+        # read_excel juga membaca kolom tanpa header; jalur itu tetap dipakai
+        # jika sheet lebih lebar dari baris header
+        if not reader.parallel() or (reader.sheet_columns or 0) != len(reader.columns):
+            return None
+        chunks = list(reader.chunks(clean=clean_dataframe))
+        if not chunks:
+            return None
+        df = _merge_cleaned(chunks, reader.columns)
+    logger.info("Successfully read Excel in parallel. Shape: %s", df.shape)
+    return df
+
+
+def _parse_excel():
+    """Parse data.xlsx lalu bersihkan (jalur lambat, hanya saat impor/rebuild)"""
+    try:
+        df = _parse_excel_parallel()
+        if df is not None:
+            return df
+    except Exception as e:
+        logger.warning("Error with parallel parse: %s. Falling back to pandas.read_excel", e)
+
     try:
-        mtime = os.path.getmtime(DATA_FILE)
-        
-        # Jika cache kosong atau file berubah
-        if _df_cache is None or _file_mtime != mtime:
-            with _lock:
-                print(f"Reading Excel file (modified: {datetime.fromtimestamp(mtime)})")
-                
+        # Coba baca dengan openpyxl
+        df = pd.read_excel(DATA_FILE, dtype=str, engine="openpyxl")
+        logger.info("Successfully read Excel with openpyxl. Shape: %s", df.shape)
+    except Exception as e1:
+        logger.warning("Error with openpyxl: %s. Trying with default engine...", e1)
+        df = pd.read_excel(DATA_FILE, dtype=str)
+        logger.info("Successfully read Excel with default engine. Shape: %s", df.shape)
+
+    return clean_dataframe(df)
+
+
+def rebuild_snapshot():
+    """Bangun ulang snapshot dari data.xlsx"""
+    source = _source_stamp()
+    logger.info("Rebuilding snapshot from %s (modified: %s)",
+                DATA_FILE, datetime.fromtimestamp(os.path.getmtime(DATA_FILE)))
+    with LOAD_SECONDS.time(kind="rebuild"):
+        with PARSE_SECONDS.time():
+            df = _parse_excel()
+        version = _write_snapshot(df, source)
+    RELOADS.inc(kind="rebuild")
+    logger.info("Snapshot %s written. Version: %s, shape: %s", SNAPSHOT_FILE, version, df.shape)
+    return df, version, source
+
+
+def data_available():
+    """True jika ada data (snapshot atau data.xlsx)"""
+    return os.path.exists(SNAPSHOT_FILE) or os.path.exists(DATA_FILE)
+
+
+# =====================
+# JOURNAL EDIT
+# =====================
+def _journal_size():
+    try:
+        return os.path.getsize(JOURNAL_FILE)
+    except OSError:
+        return 0
+
+
+def _read_journal(offset):
+    """Entri journal lengkap mulai `offset`; kembalikan (entri, offset baru)"""
+    try:
+        with open(JOURNAL_FILE, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    # Baris terakhir yang belum lengkap (sedang ditulis) dibaca lain kali
+    end = data.rfind(b"\n") + 1
+    entries = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return entries, offset + end
+
+
+def _append_journal(entry):
+    """Tambahkan satu entri (dipanggil di bawah process_lock)"""
+    with open(JOURNAL_FILE, "ab") as f:
+        f.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _truncate_journal():
+    """Kosongkan journal (dipanggil di bawah process_lock)"""
+    if os.path.exists(JOURNAL_FILE):
+        with open(JOURNAL_FILE, "wb"):
+            pass
+
+
+def clean_cell(col, value):
+    """Bersihkan satu nilai sel dengan aturan yang sama seperti clean_dataframe"""
+    if is_number(col):
+        number = pd.to_numeric(pd.Series([value], dtype=object), errors="coerce").iloc[0]
+        return "" if pd.isna(number) else float(number)
+    return str(value).strip()
+
+
+def _renumber(df):
+    """Reset nomor urut kolom no (tipe kolom dipertahankan)"""
+    if "no" in df.columns:
+        numbers = pd.Series(np.arange(1, len(df) + 1))
+        if pd.api.types.is_numeric_dtype(df["no"]):
+            df["no"] = numbers
+        else:
+            df["no"] = numbers.astype(str)
+    return df
+
+
+def _apply_entry(df, entry):
+    """Terapkan satu entri journal ke df; df lama tidak berubah (copy-on-write)"""
+    row = entry["row"]
+    if entry["op"] == "delete":
+        df = df.drop(df.index[row]).reset_index(drop=True)
+        return _renumber(df)
+
+    # Salinan dangkal: hanya kolom yang diubah yang benar-benar disalin
+    df = df.copy(deep=False)
+    for col, value in entry["values"].items():
+        if col not in df.columns:
+            continue
+        column = original = df[col]
+        dtype = column.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            if not isinstance(value, str):
+                column = column.astype(object)
+            elif value not in dtype.categories:
+                column = column.cat.add_categories([value])
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            # Sel numeric kosong disimpan sebagai NaN
+            if value == "":
+                value = np.nan
+            if isinstance(value, str):
+                column = column.astype(object)
+            elif pd.api.types.is_integer_dtype(dtype):
+                if pd.isna(value):
+                    # Nilai lain tetap bulat (tampil "7000", bukan "7000.0")
+                    column = column.astype("Int64")
+                elif not float(value).is_integer():
+                    column = column.astype(object)
+                    column = column.where(column.notna(), np.nan)
+        elif isinstance(value, str):
+            if not pd.api.types.is_string_dtype(dtype):
+                column = column.astype(object)
+        elif dtype != object:
+            column = column.astype(object)
+        if column is not original:
+            df[col] = column
+        df.iat[row, df.columns.get_loc(col)] = value
+    return df
+
+
+# =====================
+# SNAPSHOT READ-ONLY
+# =====================
+class Snapshot:
+    """Versi data yang sudah dipublikasikan, dibagi semua reader tanpa copy.
+
+    `df` TIDAK boleh diubah in-place. Writer memakai `mutable_copy()` lalu
+    mempublikasikan versi baru lewat `save_data`.
+    """
+
+    def __init__(self, df, version):
+        self.df = df
+        self.version = version
+        self._derived = {}
+        self._derived_lock = threading.RLock()
+
+    def derived(self, key, builder):
+        """Struktur turunan (index, frame tampilan, dll) yang dibangun sekali per versi"""
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = builder(self.df)
+                    self._derived[key] = value
+                    release_memory()
+        return value
+
+    def built(self, key):
+        """True jika struktur turunan `key` sudah dibangun untuk versi ini"""
+        return key in self._derived
+
+    def mutable_copy(self):
+        return self.df.copy()
+
+
+_EMPTY = Snapshot(pd.DataFrame(), None)
+
+
+def add_publish_hook(callback):
+    """Daftarkan callback(version) yang dipanggil setiap snapshot baru dipublikasikan"""
+    _publish_hooks.append(callback)
+
+
+def register_derived(key, builder):
+    """Daftarkan struktur turunan yang dibangun langsung saat snapshot dipublikasikan.
+
+    Jika struktur punya `apply_entry(old_df, new_df, entry)`, edit/hapus satu
+    baris lewat journal memperbaruinya dari versi sebelumnya (tanpa build ulang).
+    """
+    _eager_derived[key] = builder
+
+
+def _advance_derived(derived, old_df, new_df, entry):
+    """Struktur turunan yang bisa diperbarui per entri journal; sisanya dibuang"""
+    advanced = {}
+    for key, value in (derived or {}).items():
+        apply = getattr(value, "apply_entry", None)
+        if apply is None:
+            continue
+        try:
+            value = apply(old_df, new_df, entry)
+        except Exception as e:
+            logger.error("Error updating derived %s: %s", key, e)
+            value = None
+        if value is not None:
+            advanced[key] = value
+    return advanced
+
+
+def _publish(df, version, source, base=None, offset=0, seq=0, derived=None):
+    """Ganti snapshot aktif secara atomik (dipanggil di bawah _lock)"""
+    global _snapshot, _file_mtime, _snapshot_stat, _source_checked
+    global _journal_base, _journal_offset, _journal_seq
+    _snapshot = Snapshot(df, version)
+    if derived:
+        _snapshot._derived.update(derived)
+    for key, builder in _eager_derived.items():
+        try:
+            _snapshot.derived(key, builder)
+        except Exception as e:
+            logger.error("Error building derived %s: %s", key, e)
+    _file_mtime = source
+    _snapshot_stat = _snapshot_file_stat()
+    _source_checked = time.monotonic()
+    _journal_base = base or version
+    _journal_offset = offset
+    _journal_seq = seq
+    for callback in _publish_hooks:
+        try:
+            callback(version)
+        except Exception as e:
+            logger.error("Error in publish hook: %s", e)
+    release_memory()
+    return _snapshot
+
+
+def release_memory():
+    """Kembalikan memori bebas sisa build besar (parse, index) ke OS.
+
+    Pool Arrow (mimalloc/jemalloc) dan heap glibc menahan halaman yang sudah
+    dibebaskan; tanpa ini RSS tiap worker tetap setinggi puncak build.
+    """
+    pa.default_memory_pool().release_unused()
+    if _libc is not None and hasattr(_libc, "malloc_trim"):
+        _libc.malloc_trim(0)
+
+
+def _source_changed():
+    """Cek (berkala) apakah data.xlsx diganti sejak snapshot dimuat"""
+    global _source_checked
+    now = time.monotonic()
+    if now - _source_checked < SOURCE_CHECK_SECONDS:
+        return False
+    _source_checked = now
+    return _source_stamp() != _file_mtime
+
+
+def _snapshot_fresh(meta, source):
+    return (
+        meta is not None
+        and meta.get("dasimm.format") == SNAPSHOT_FORMAT
+        and (source is None or meta.get("dasimm.source") == source)
+    )
+
+
+def _base_current(source):
+    """True jika snapshot dasar yang dimuat masih sama dengan file di disk"""
+    return (_snapshot is not None and _snapshot.version is not None
+            and _file_mtime == source and _snapshot_stat == _snapshot_file_stat())
+
+
+def _load_base(source):
+    """Muat snapshot dasar dari file (atau bangun ulang dari data.xlsx) lalu replay journal"""
+    if not _snapshot_fresh(_read_snapshot_meta(), source):
+        if source is None:
+            logger.warning("Snapshot unreadable and no Excel source, returning empty DataFrame")
+            return _EMPTY
+        # Snapshot hilang atau basi -> satu worker membangun ulang,
+        # worker lain menunggu lalu memakai hasilnya
+        with process_lock():
+            if not _snapshot_fresh(_read_snapshot_meta(), source):
                 try:
-                    # Coba baca dengan openpyxl
-                    df = pd.read_excel(DATA_FILE, dtype=str, engine="openpyxl")
-                    print(f"Successfully read Excel with openpyxl. Shape: {df.shape}")
-                except Exception as e1:
-                    print(f"Error with openpyxl: {e1}. Trying with default engine...")
-                    try:
-                        df = pd.read_excel(DATA_FILE, dtype=str)
-                        print(f"Successfully read Excel with default engine. Shape: {df.shape}")
-                    except Exception as e2:
-                        print(f"Error reading Excel: {e2}")
-                        return pd.DataFrame()
-                
-                # Bersihkan data
-                df = clean_dataframe(df)
-                
-                # Simpan ke cache
-                _df_cache = df
-                _file_mtime = mtime
-                
-                print(f"Cache updated. Columns: {df.columns.tolist()}")
-                if len(df) > 0:
-                    print(f"First few rows: {df.head(3).to_dict('records')}")
-        
-        return _df_cache.copy() if _df_cache is not None else pd.DataFrame()
-        
+                    df, version, source = rebuild_snapshot()
+                except Exception as e:
+                    logger.error("Error reading Excel: %s", e)
+                    return _EMPTY
+                # Edit di journal milik data lama tidak berlaku lagi
+                _truncate_journal()
+                _shared_version.write(version)
+                return _publish(df, version, source)
+
+    with LOAD_SECONDS.time(kind="read"):
+        df, meta = _read_snapshot()
+    RELOADS.inc(kind="read")
+    version = meta.get("dasimm.version")
+    logger.info("Snapshot loaded. Version: %s, shape: %s", version, df.shape)
+    return _catch_up(df, version, source, 0, 0)
+
+
+def _catch_up(df, base, source, offset, seq, derived=None):
+    """Terapkan entri journal baru (mulai `offset`) lalu publikasikan hasilnya.
+
+    `derived` (struktur turunan milik `df`) yang mendukung apply_entry ikut dibawa.
+    """
+    start = time.perf_counter()
+    entries, offset = _read_journal(offset)
+    for entry in entries:
+        if entry.get("base") != base:
+            continue
+        new_df = _apply_entry(df, entry)
+        derived = _advance_derived(derived, df, new_df, entry)
+        df = new_df
+        seq = entry["seq"]
+    if entries:
+        LOAD_SECONDS.observe(time.perf_counter() - start, kind="journal")
+        RELOADS.inc(kind="journal")
+    version = f"{base}.{seq}" if seq else base
+    if entries or _snapshot is None or _snapshot.version != version:
+        return _publish(df, version, source, base, offset, seq, derived)
+    global _journal_offset
+    _journal_offset = offset
+    return _snapshot
+
+
+def _refresh(source):
+    """Bawa snapshot lokal ke versi terbaru (dipanggil di bawah _lock)"""
+    if _base_current(source):
+        if _journal_size() == _journal_offset:
+            return _snapshot
+        # Snapshot dasar sama, hanya journal yang bertambah
+        return _catch_up(_snapshot.df, _journal_base, source, _journal_offset, _journal_seq,
+                         _snapshot._derived)
+    return _load_base(source)
+
+
+def get_snapshot():
+    """Snapshot aktif; dimuat ulang jika worker lain mempublikasikan versi baru
+    atau data.xlsx berubah"""
+    snapshot = _snapshot
+    # Jalur cepat: versi bersama (mmap) sama dengan versi yang sudah dimuat
+    if (snapshot is not None and snapshot.version is not None
+            and snapshot.version == _shared_version.read() and not _source_changed()):
+        return snapshot
+
+    if not data_available():
+        logger.warning("Data file not found, returning empty DataFrame")
+        return _EMPTY
+
+    try:
+        source = _source_stamp()
+        with _lock:
+            snapshot = _refresh(source)
+        _sync_shared_version(snapshot.version)
+        return snapshot
+
     except Exception as e:
-        print(f"Critical error in load_data: {e}")
-        import traceback
-        traceback.print_exc()
-        return pd.DataFrame()
+        logger.exception("Critical error in load_data: %s", e)
+        return _EMPTY
+
+
+def _sync_shared_version(version):
+    """Perbaiki versi bersama jika tertinggal dari disk (mis. setelah restart)"""
+    if version is None or not _shared_version.available or _shared_version.read() == version:
+        return
+    with process_lock():
+        if _snapshot is None or _snapshot.version != version:
+            return
+        meta = _read_snapshot_meta()
+        if meta is None or meta.get("dasimm.version") != _journal_base:
+            return
+        if _journal_size() == _journal_offset:
+            _shared_version.write(version)
+
+
+def get_version():
+    """Versi snapshot aktif (None jika belum ada data)"""
+    return get_snapshot().version
+
+
+def current_version():
+    """Versi data terbaru untuk validasi cache (ETag) tanpa menyentuh snapshot.
+
+    Di antara cek data.xlsx berkala cukup membaca versi bersama (mmap);
+    selain itu sama dengan get_version().
+    """
+    if _snapshot is not None and time.monotonic() - _source_checked < SOURCE_CHECK_SECONDS:
+        version = _shared_version.read()
+        if version is not None:
+            return version
+    return get_version()
+
+
+def load_data():
+    """DataFrame snapshot aktif (read-only, dibagi antar request)"""
+    return get_snapshot().df
+
+
+def load_data_for_update():
+    """Salinan mutable dari snapshot aktif untuk writer"""
+    return get_snapshot().mutable_copy()
 
 
 def save_data(df):
-    """Simpan dataframe ke Excel"""
-    global _df_cache, _file_mtime
+    """Simpan dataframe ke snapshot kolumnar dan publikasikan versi baru"""
     with _lock:
         try:
             # Bersihkan data sebelum simpan
-            df = clean_dataframe(df)
-            
-            # Simpan ke file
-            df.to_excel(DATA_FILE, index=False, engine="openpyxl")
-            
-            # Update cache
-            _df_cache = df.copy()
-            _file_mtime = os.path.getmtime(DATA_FILE)
-            
-            print(f"Data saved successfully. Shape: {df.shape}")
+            df = clean_dataframe(df, "save")
+
+            # Simpan ke snapshot (data.xlsx tidak ditulis ulang); versi bersama
+            # diganti setelah file siap sehingga worker lain langsung memuatnya
+            source = _source_stamp()
+            with process_lock():
+                version = _write_snapshot(df, source)
+                _truncate_journal()
+                _shared_version.write(version)
+            _publish(df, version, source)
+
+            logger.info("Data saved successfully. Shape: %s, version: %s", df.shape, version)
             return True
         except Exception as e:
-            print(f"Error saving data: {e}")
+            logger.error("Error saving data: %s", e)
             return False
 
 
+def _journal_change(op, row, values=None):
+    """Catat satu perubahan ke journal dan publikasikan hasilnya (O(1) I/O)"""
+    with _lock:
+        try:
+            source = _source_stamp()
+            with process_lock():
+                # Pastikan semua entri worker lain sudah diterapkan dulu
+                snapshot = _refresh(source)
+                if snapshot.version is None or not 0 <= row < len(snapshot.df):
+                    logger.warning("Journal %s: row %s out of range", op, row)
+                    return False
+
+                entry = {"seq": _journal_seq + 1, "base": _journal_base, "op": op, "row": row}
+                if op == "edit":
+                    current = snapshot.df.iloc[row]
+                    changed = {}
+                    for col, value in values.items():
+                        if col == "no" or col not in snapshot.df.columns:
+                            continue
+                        value = clean_cell(col, value)
+                        # Kolom angka bulat tetap bulat (tampil "7000", bukan "7000.0")
+                        if (isinstance(value, float) and value.is_integer()
+                                and pd.api.types.is_integer_dtype(snapshot.df[col].dtype)):
+                            value = int(value)
+                        old = current[col]
+                        if not (value == old or (value == "" and pd.isna(old))):
+                            changed[col] = value
+                    if not changed:
+                        return True
+                    entry["values"] = changed
+
+                _append_journal(entry)
+                snapshot = _catch_up(snapshot.df, _journal_base, source,
+                                     _journal_offset, _journal_seq, snapshot._derived)
+                _shared_version.write(snapshot.version)
+
+            logger.info("Journal %s row %s. Version: %s", op, row, snapshot.version)
+        except Exception as e:
+            logger.error("Error writing journal: %s", e)
+            return False
+
+    if _journal_seq >= JOURNAL_COMPACT_ENTRIES:
+        _start_compaction()
+    return True
+
+
+def update_row(row, values):
+    """Ubah satu baris (posisi 0-based) lewat journal"""
+    return _journal_change("edit", row, values)
+
+
+def delete_row(row):
+    """Hapus satu baris (posisi 0-based) lewat journal"""
+    return _journal_change("delete", row)
+
+
+def compact_journal():
+    """Padatkan snapshot + journal menjadi snapshot dasar baru"""
+    global _compacting
+    try:
+        with _lock:
+            source = _source_stamp()
+            with process_lock():
+                snapshot = _refresh(source)
+                if _journal_seq == 0 or snapshot.version is None:
+                    return
+                version = _write_snapshot(snapshot.df, source)
+                _truncate_journal()
+                _shared_version.write(version)
+            # Isi data sama -> struktur turunan (index, dll) tetap dipakai
+            _publish(snapshot.df, version, source, derived=snapshot._derived)
+            logger.info("Journal compacted. Version: %s", version)
+    except Exception as e:
+        logger.error("Error compacting journal: %s", e)
+    finally:
+        _compacting = False
+
+
+def _start_compaction():
+    global _compacting
+    if _compacting:
+        return
+    _compacting = True
+    threading.Thread(target=compact_journal, name="journal-compaction", daemon=True).start()
+
+
 def clear_cache():
     """Clear cache untuk memaksa reload"""
-    global _df_cache, _file_mtime
-    _df_cache = None
+    global _snapshot, _file_mtime, _snapshot_stat, _journal_base, _journal_offset, _journal_seq
+    _snapshot = None
     _file_mtime = None
-    print("Cache cleared")
+    _snapshot_stat = None
+    _journal_base = None
+    _journal_offset = 0
+    _journal_seq = 0
+    logger.info("Cache cleared")
 
 
 def get_data_info():
     """Debug function untuk melihat info data"""
-    df = load_data()
+    snapshot = get_snapshot()
+    df = snapshot.df
     info = {
         "file_exists": os.path.exists(DATA_FILE),
         "file_size": os.path.getsize(DATA_FILE) if os.path.exists(DATA_FILE) else 0,
+        "snapshot_exists": os.path.exists(SNAPSHOT_FILE),
+        "snapshot_size": os.path.getsize(SNAPSHOT_FILE) if os.path.exists(SNAPSHOT_FILE) else 0,
+        "version": snapshot.version,
+        "shared_version": _shared_version.read(),
+        "journal_entries": _journal_seq,
+        "cleaning": clean_stats(),
         "rows": len(df),
         "columns": df.columns.tolist(),
-        "sample": df.head(3).to_dict('records') if not df.empty else []
+        "sample": _sample_records(df.head(3)) if not df.empty else []
     }
-    return info
\ No newline at end of file
+    return info
+
+
+def _sample_records(df):
+    """Baris contoh untuk JSON (NaN menjadi "", seperti sel kosong di data asli)"""
+    df = df.astype(object)
+    return df.where(df.notna(), "").to_dict('records')
+
+
+# =====================
+# LAPORAN MEMORI
+# =====================
+def _process_memory():
+    """RSS proses ini dalam byte (Linux: /proc/self/status, selain itu puncak RSS)"""
+    fields = {"VmRSS": "rss", "RssAnon": "rss_anon", "RssFile": "rss_file", "VmHWM": "rss_peak"}
+    usage = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    usage[fields[key]] = int(value.split()[0]) * 1024
+    except OSError:
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Linux: KiB, macOS: byte
+            usage["rss_peak"] = peak if sys.platform == "darwin" else peak * 1024
+    return usage
+
+
+def _column_storage(dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return "category"
+    if isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow":
+        # Buffer Arrow dari snapshot mmap (dibagi antar worker sampai kolom diedit)
+        return "arrow"
+    return "numpy" if dtype != object else "object"
+
+
+def memory_report():
+    """Pemakaian memori frame aktif per kolom, struktur turunan, dan RSS proses"""
+    snapshot = get_snapshot()
+    df = snapshot.df
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        entry = {
+            "column": col,
+            "dtype": str(values.dtype),
+            "storage": _column_storage(values.dtype),
+            "bytes": int(values.memory_usage(index=False, deep=True)),
+            "nulls": int(values.isna().sum()),
+        }
+        if entry["storage"] == "category":
+            entry["categories"] = len(values.cat.categories)
+        columns.append(entry)
+
+    derived = {key: getattr(value, "nbytes", None) for key, value in list(snapshot._derived.items())}
+    return {
+        "version": snapshot.version,
+        "rows": len(df),
+        "frame_bytes": sum(entry["bytes"] for entry in columns),
+        "columns": columns,
+        "derived_bytes": derived,
+        "process": _process_memory(),
+    }
+
+
+def _snapshot_metrics():
+    """Nilai snapshot dan statistik cleaning untuk /metrics (dibaca saat scrape)"""
+    snapshot = _snapshot
+    cleaning = clean_stats()
+    return [
+        ("dasimm_snapshot_rows", "gauge", "Jumlah baris snapshot aktif di worker ini",
+         [({}, len(snapshot.df) if snapshot is not None else 0)]),
+        ("dasimm_journal_entries", "gauge", "Entri journal yang sudah diterapkan",
+         [({}, _journal_seq)]),
+        ("dasimm_clean_seconds_total", "counter", "Total waktu cleaning per tahap dan langkah",
+         [({"stage": stage, "step": step}, seconds)
+          for stage, entry in cleaning.items() for step, seconds in entry["steps"].items()]),
+        ("dasimm_clean_rows_total", "counter", "Baris yang dibersihkan per tahap",
+         [({"stage": stage}, entry["rows"]) for stage, entry in cleaning.items()]),
+    ]
+
+
+metrics.add_collector(_snapshot_metrics)
@@ -0,0 +1,214 @@
+# excel_export.py
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+from flask import Response
+from openpyxl.utils import get_column_letter
+
+from schema import DERIVED_COLUMNS, derive
+from metrics import timed_stream
+
+TEMPLATE_FILE = "Template Format Pemeriksaan UPLOAD.xlsx"
+SHEET_PATH = "xl/worksheets/sheet1.xml"
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Baris 1-6 template adalah header; data mulai baris 7
+START_ROW = 7
+CHUNK_ROWS = 2000
+
+NOMOR = "__nomor__"
+
+# Pemetaan kolom template -> (kolom data, jenis nilai); dipakai semua export
+TEMPLATE_COLUMNS = [
+    (1, NOMOR, "int"),
+    (4, "CLNT_ID", "text"),
+    (5, "CLNT_NAME", "text"),
+    (7, "CURR_LIC_NUM", "text"),
+    (8, "LINK_ID", "text"),
+    (9, "STN_NAME", "text"),
+    (10, "STASIUN_LAWAN", "text"),
+    (11, "SID_LONG", "text"),
+    (12, "SID_LAT", "text"),
+    (13, "FREQ", "text"),
+    (14, "FREQ_PAIR", "text"),
+    (15, "BWIDTH_MHZ", "number"),
+    (16, "EQ_MDL", "text"),
+    (17, "STN_NAME", "text"),
+    (18, "STASIUN_LAWAN", "text"),
+    (19, "LONG", "text"),
+    (20, "LAT", "text"),
+    (21, "FREQ", "text"),
+    (22, "FREQ_PAIR", "text"),
+    (23, "BWIDTH_MHZ", "number"),
+    (24, "EQ_MDL", "text"),
+    (27, "MULAI BEROPERASI", "text"),
+    (28, "KETERANGAN", "text"),
+    (29, "CITY", "text"),
+]
+
+# Validasi list per kolom, ditulis sekali sebagai range (mis. C7:C1000)
+TEMPLATE_VALIDATIONS = [
+    (3, '"Inspeksi melalui Open Shelter,Pemeriksaan melalui Remote Site"'),
+    (25, '"Ada,Tidak"'),
+    (26, '"Sesuai ISR,Tidak Sesuai Parameter Teknis,Tidak Berizin,Tidak Aktif"'),
+]
+
+# Karakter kontrol yang tidak sah di XML
+_ILLEGAL_XML = "[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+
+class _Sink:
+    """File-like tanpa seek untuk ZipFile; isinya dikuras per potongan"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class TemplateExport:
+    """Export format Pemeriksaan yang di-stream langsung ke zip xlsx.
+
+    Header (baris 1-6), style kolom, merge dan validasi milik template
+    dipertahankan; baris data ditulis per potongan sehingga memori tetap
+    konstan berapa pun jumlah barisnya.
+    """
+
+    def __init__(self, template_file=TEMPLATE_FILE):
+        with zipfile.ZipFile(template_file) as zf:
+            self.parts = [(info, zf.read(info.filename)) for info in zf.infolist()]
+        sheet = dict((info.filename, data) for info, data in self.parts)[SHEET_PATH].decode("utf-8")
+
+        start = sheet.index("<sheetData>") + len("<sheetData>")
+        end = sheet.index("</sheetData>")
+        self.head = re.sub(r'<dimension ref="[^"]*"/>', "{dimension}", sheet[:start])
+        self.header_rows = sheet[start:end]
+        self.tail = sheet[end:]
+
+        # Style default per kolom dari <cols>, dipakai untuk sel data
+        self.col_styles = {}
+        for m in re.finditer(r"<col ([^>]*)/>", self.head):
+            attrs = dict(re.findall(r'(\w+)="([^"]*)"', m.group(1)))
+            if "style" in attrs:
+                for c in range(int(attrs["min"]), min(int(attrs["max"]), 200) + 1):
+                    self.col_styles[c] = attrs["style"]
+
+    def _style(self, col):
+        style = self.col_styles.get(col)
+        return f' s="{style}"' if style else ""
+
+    def _validations(self, last_row):
+        rules = []
+        for col, formula in TEMPLATE_VALIDATIONS:
+            letter = get_column_letter(col)
+            rules.append(
+                f'<dataValidation type="list" allowBlank="1" showInputMessage="1" '
+                f'showErrorMessage="1" sqref="{letter}{START_ROW}:{letter}{last_row}">'
+                f'<formula1>{formula}</formula1></dataValidation>'
+            )
+        return "".join(rules)
+
+    def _tail(self, last_row):
+        if last_row < START_ROW:
+            return self.tail
+        rules = self._validations(last_row)
+        m = re.search(r'<dataValidations count="(\d+)">', self.tail)
+        if m:
+            count = int(m.group(1)) + len(TEMPLATE_VALIDATIONS)
+            tail = self.tail.replace(m.group(0), f'<dataValidations count="{count}">', 1)
+            return tail.replace("</dataValidations>", rules + "</dataValidations>", 1)
+        block = f'<dataValidations count="{len(TEMPLATE_VALIDATIONS)}">{rules}</dataValidations>'
+        pos = self.tail.find("<pageMargins")
+        pos = pos if pos >= 0 else self.tail.index("</worksheet>")
+        return self.tail[:pos] + block + self.tail[pos:]
+
+    def _column_cells(self, chunk, col, source, kind, refs, numbers):
+        """XML sel satu kolom untuk satu potongan baris (Series string)"""
+        prefix = f'<c r="{get_column_letter(col)}'
+        style = self._style(col)
+        if kind == "int":
+            return prefix + refs + f'"{style}><v>' + numbers + "</v></c>"
+
+        if kind == "number":
+            # Kolom turunan schema (mis. BWIDTH_MHZ = BWIDTH / 1000) atau kolom angka biasa
+            if source in DERIVED_COLUMNS:
+                numbers = derive(chunk, source)
+            elif source in chunk.columns:
+                numbers = pd.to_numeric(chunk[source], errors="coerce")
+            else:
+                numbers = pd.Series(np.nan, index=chunk.index)
+            numbers = numbers.reset_index(drop=True).astype(float)
+            ok = np.isfinite(numbers.to_numpy(dtype=float))
+            text = numbers.map(repr)
+            cells = prefix + refs + f'"{style}><v>' + text + "</v></c>"
+            return cells.where(ok, "")
+
+        if source in chunk.columns:
+            values = chunk[source].astype(object)
+            values = values.where(values.notna(), "").astype(str)
+        else:
+            values = pd.Series("", index=chunk.index)
+        values = values.reset_index(drop=True)
+
+        text = values.str.replace(_ILLEGAL_XML, "", regex=True)
+        text = text.str.replace("&", "&amp;", regex=False)
+        text = text.str.replace("<", "&lt;", regex=False).str.replace(">", "&gt;", regex=False)
+        space = pd.Series(np.where(text != text.str.strip(), ' xml:space="preserve"', ""))
+        cells = prefix + refs + f'"{style} t="inlineStr"><is><t' + space + ">" + text + "</t></is></c>"
+        return cells.where(text != "", "")
+
+    def stream(self, df, rows=None):
+        """Generator bytes file xlsx untuk baris `df` (opsional subset row-id)"""
+        rows = np.arange(len(df)) if rows is None else np.asarray(rows)
+        last_row = START_ROW + len(rows) - 1
+
+        sink = _Sink()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for info, data in self.parts:
+                if info.filename != SHEET_PATH:
+                    zf.writestr(info.filename, data)
+            yield sink.drain()
+
+            with zf.open(SHEET_PATH, "w", force_zip64=True) as sheet:
+                dimension = f'<dimension ref="A1:AC{max(last_row, 6)}"/>'
+                sheet.write(self.head.replace("{dimension}", dimension).encode("utf-8"))
+                sheet.write(self.header_rows.encode("utf-8"))
+
+                for offset in range(0, len(rows), CHUNK_ROWS):
+                    chunk = df.iloc[rows[offset:offset + CHUNK_ROWS]]
+                    nomor = np.arange(offset + 1, offset + len(chunk) + 1)
+                    numbers = pd.Series(nomor.astype(str))
+                    refs = pd.Series((nomor + START_ROW - 1).astype(str))
+
+                    xml = '<row r="' + refs + '" spans="1:29">'
+                    for col, source, kind in TEMPLATE_COLUMNS:
+                        xml = xml + self._column_cells(chunk, col, source, kind, refs, numbers)
+                    xml = xml + "</row>"
+                    sheet.write("".join(xml).encode("utf-8"))
+                    yield sink.drain()
+
+                sheet.write(self._tail(last_row).encode("utf-8"))
+        yield sink.drain()
+
+
+def export_response(df, filename, rows=None):
+    """Response Flask yang men-stream export template untuk `df`"""
+    export = TemplateExport()
+    n_rows = len(df) if rows is None else len(rows)
+    return Response(
+        timed_stream(export.stream(df, rows), n_rows, "xlsx"),
+        mimetype=XLSX_MIMETYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,113 @@
+# facets.py
+import numpy as np
+import pandas as pd
+
+from data_store import register_derived
+from schema import display_values
+
+# Kolom yang dihitung per nilai (jumlah link per kota / operator / model perangkat)
+FACET_COLUMNS = ["CITY", "CLNT_NAME", "EQ_MDL"]
+
+
+class _Facet:
+    """Satu kolom ter-dictionary-encode: label unik, kode per baris, jumlah per label"""
+
+    def __init__(self, labels, lookup, codes, counts):
+        self.labels = labels
+        self.lookup = lookup
+        self.codes = codes
+        self.counts = counts
+
+    @classmethod
+    def build(cls, values):
+        values = display_values(values)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Kolom kategori: kode sudah ada, NaN sudah diisi kategori ""
+            codes = values.cat.codes.to_numpy().astype(np.int32)
+            labels = [str(label) for label in values.cat.categories]
+        else:
+            codes, uniques = values.factorize()
+            codes = codes.astype(np.int32)
+            labels = [str(label) for label in uniques]
+        counts = np.bincount(codes, minlength=len(labels)).astype(np.int64)
+        return cls(labels, {label: i for i, label in enumerate(labels)}, codes, counts)
+
+    def replace(self, row, label):
+        """Facet baru dengan nilai baris `row` diganti `label`"""
+        labels, lookup, counts = self.labels, self.lookup, self.counts.copy()
+        code = lookup.get(label)
+        if code is None:
+            code = len(labels)
+            labels, lookup = labels + [label], {**lookup, label: code}
+            counts = np.append(counts, 0)
+        codes = self.codes.copy()
+        counts[codes[row]] -= 1
+        counts[code] += 1
+        codes[row] = code
+        return _Facet(labels, lookup, codes, counts)
+
+    def without(self, row):
+        """Facet baru tanpa baris `row` (baris sesudahnya bergeser naik)"""
+        counts = self.counts.copy()
+        counts[self.codes[row]] -= 1
+        return _Facet(self.labels, self.lookup, np.delete(self.codes, row), counts)
+
+
+class FacetIndex:
+    """Jumlah baris per nilai untuk FACET_COLUMNS, dibangun sekali per snapshot.
+
+    Jumlah tanpa filter sudah tersedia saat snapshot dipublikasikan; edit/hapus
+    satu baris lewat journal memperbaruinya (apply_entry) tanpa hitung ulang.
+    Jumlah untuk hasil filter = bincount kode baris yang lolos filter.
+    """
+
+    def __init__(self, df=None):
+        self.n_rows = 0 if df is None else len(df)
+        self.facets = {}
+        if df is not None:
+            for col in FACET_COLUMNS:
+                if col in df.columns:
+                    self.facets[col] = _Facet.build(df[col])
+
+    @property
+    def nbytes(self):
+        return sum(f.codes.nbytes + f.counts.nbytes for f in self.facets.values())
+
+    def apply_entry(self, old_df, new_df, entry):
+        """FacetIndex untuk `new_df` (hasil satu entri journal); yang lama tidak diubah"""
+        if self.n_rows != len(old_df):
+            return None
+        row = entry["row"]
+        updated = FacetIndex()
+        updated.n_rows = len(new_df)
+        for col, facet in self.facets.items():
+            if entry["op"] == "delete":
+                facet = facet.without(row)
+            elif col in entry.get("values", {}):
+                label = display_values(new_df[col].iloc[[row]]).iloc[0]
+                facet = facet.replace(row, str(label))
+            updated.facets[col] = facet
+        return updated
+
+    def counts(self, col, rows=None):
+        """Jumlah per label untuk semua baris atau hanya `rows`"""
+        facet = self.facets[col]
+        if rows is None:
+            return facet.counts
+        return np.bincount(facet.codes[rows], minlength=len(facet.labels))
+
+    def top(self, col, rows=None, limit=10):
+        """`limit` nilai terbanyak (seri: urutan kemunculan pertama), plus jumlah sisanya"""
+        facet = self.facets[col]
+        counts = self.counts(col, rows)
+        present = np.flatnonzero(counts)
+        order = present[np.argsort(-counts[present], kind="stable")]
+        return {
+            "values": [{"value": facet.labels[i], "count": int(counts[i])} for i in order[:limit]],
+            "distinct": len(present),
+            "other": int(counts[order[limit:]].sum()),
+        }
+
+
+# Jumlah tanpa filter dihitung saat snapshot dipublikasikan
+register_derived("facets", FacetIndex)
@@ -9,6 +9,7 @@ def check_and_fix():
     folders = [
         BASE_DIR,
         os.path.join(BASE_DIR, "uploads"),
+        os.path.join(BASE_DIR, "uploads", "jobs"),
         os.path.join(BASE_DIR, "static"),
         os.path.join(BASE_DIR, "templates")
     ]
@@ -16,7 +17,12 @@ def check_and_fix():
     # File yang perlu dicek
     files = [
         os.path.join(BASE_DIR, "data.xlsx"),
-        os.path.join(BASE_DIR, "data_pemeriksaan_tersimpan.xlsx")
+        os.path.join(BASE_DIR, "data_snapshot.arrow"),
+        os.path.join(BASE_DIR, "data_snapshot.version"),
+        os.path.join(BASE_DIR, "data_snapshot.lock"),
+        os.path.join(BASE_DIR, "data_journal.jsonl"),
+        os.path.join(BASE_DIR, "data_pemeriksaan_tersimpan.xlsx"),
+        os.path.join(BASE_DIR, "data_pemeriksaan.db")
     ]
     
     print("=== Checking Permissions ===")
@@ -0,0 +1,350 @@
+# freq_overlap.py
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_store import add_publish_hook
+from geo_index import KM_PER_DEG_LAT, POINTS, haversine_km
+from schema import derive
+
+# Batas pasangan link dalam satu laporan (tanpa batas jarak hasilnya bisa ratusan juta)
+OVERLAP_MAX_PAIRS = int(os.getenv("OVERLAP_MAX_PAIRS", "500000"))
+
+# Kandidat pasangan diproses per blok agar memori sementara tetap kecil
+BLOCK_PAIRS = 2_000_000
+
+# Pita frekuensi per link: center dari kolom ini, lebar BWIDTH (kHz -> MHz)
+BANDS = ("FREQ", "FREQ_PAIR")
+
+# Batas memori (MB) laporan berbatas jarak yang di-cache (LRU, semua max_km)
+OVERLAP_CACHE_MB = int(os.getenv("OVERLAP_CACHE_MB", "32"))
+
+
+def link_intervals(df):
+    """Interval pita (MHz) per link: array (n, 2) lo dan hi untuk FREQ dan FREQ_PAIR.
+
+    NaN jika frekuensi atau bandwidth kosong.
+    """
+    width = derive(df, "BWIDTH_MHZ").to_numpy(dtype=float, na_value=np.nan)
+    centers = np.column_stack([_numeric(df, col) for col in BANDS])
+    half = (width / 2)[:, None]
+    return centers - half, centers + half
+
+
+def _numeric(df, col):
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _ranges(starts, ends):
+    """Gabungkan rentang [start, end) menjadi satu array indeks"""
+    lengths = np.maximum(ends - starts, 0)
+    total = int(lengths.sum())
+    shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return shift + np.arange(total)
+
+
+def _blocks(counts):
+    """Potong urutan elemen menjadi blok dengan total kandidat ~BLOCK_PAIRS"""
+    if len(counts) == 0:
+        return
+    cum = np.cumsum(counts)
+    cuts = np.searchsorted(cum, np.arange(BLOCK_PAIRS, cum[-1], BLOCK_PAIRS), side="right")
+    edges = np.unique(np.concatenate(([0], cuts, [len(counts)])))
+    yield from zip(edges[:-1], edges[1:])
+
+
+class OverlapReport:
+    """Pasangan link dengan pita frekuensi yang beririsan (kandidat interferensi).
+
+    Interval tiap link adalah center +- BWIDTH/2 untuk FREQ dan FREQ_PAIR.
+    Kandidat pasangan dihasilkan tanpa perbandingan semua-ke-semua:
+    - sweep: interval diurutkan menurut batas bawah; interval i hanya
+      dibandingkan dengan interval sesudahnya yang mulai sebelum i berakhir.
+    - grid: jika `max_km` diisi, interval dikelompokkan ke grid berukuran
+      `max_km` dan di-sweep per sel; hanya interval di sel yang sama/bertetangga
+      dengan rentang frekuensi yang mungkin beririsan yang dibandingkan.
+    Jalur dipilih dari perkiraan jumlah kandidat; keduanya lalu menyaring
+    irisan frekuensi dan jarak secara persis, sehingga hasilnya sama.
+    Hasil diurutkan dari irisan terbesar, maksimal `max_pairs` pasangan; jika
+    `truncated`, pencarian dihentikan lebih awal dan hasilnya hanya sebagian.
+    """
+
+    def __init__(self, df, max_km=None, max_pairs=OVERLAP_MAX_PAIRS):
+        started = time.perf_counter()
+        self.max_km = max_km
+        self.max_pairs = max_pairs
+        self.n_rows = len(df)
+        self.lo, self.hi = link_intervals(df)
+        self.lon = self.lat = None
+        if max_km is not None:
+            # Jarak antar titik stasiun (SID_LONG/SID_LAT)
+            lon_col, lat_col = POINTS["station"]
+            self.lon, self.lat = _numeric(df, lon_col), _numeric(df, lat_col)
+
+        sweep = self._sweep_plan()
+        grid = self._grid_plan() if max_km is not None else None
+        if grid is not None and grid[0] < sweep[0]:
+            self.strategy, self.candidates = "grid", grid[0]
+            pairs = self._grid_pairs(*grid[1:])
+        else:
+            self.strategy, self.candidates = "sweep", sweep[0]
+            pairs = self._sweep_pairs(*sweep[1:])
+        self._collect(pairs)
+        self.seconds = round(time.perf_counter() - started, 3)
+
+    @property
+    def nbytes(self):
+        arrays = (self.a, self.b, self.band_a, self.band_b, self.overlap_mhz, self.distance_km)
+        return sum(x.nbytes for x in arrays)
+
+    def __len__(self):
+        return len(self.a)
+
+    # =====================
+    # KANDIDAT: SWEEP FREKUENSI
+    # =====================
+    def _sweep_plan(self):
+        lo, hi = self.lo.ravel(), self.hi.ravel()
+        valid = np.flatnonzero(np.isfinite(lo) & np.isfinite(hi))
+        order = valid[np.argsort(lo[valid], kind="stable")]
+        starts = lo[order]
+        # Interval j (sesudah i) beririsan dengan i jika mulai sebelum i berakhir
+        ends = np.searchsorted(starts, hi[order], side="left")
+        counts = np.maximum(ends - np.arange(len(order)) - 1, 0)
+        return int(counts.sum()), order, counts
+
+    def _sweep_pairs(self, order, counts):
+        for start, end in _blocks(counts):
+            i = np.repeat(np.arange(start, end), counts[start:end])
+            j = _ranges(np.arange(start, end) + 1, np.arange(start, end) + 1 + counts[start:end])
+            # Interval pipih (baris * 2 + pita) -> baris
+            yield order[i] // 2, order[j] // 2
+
+    # =====================
+    # KANDIDAT: GRID JARAK
+    # =====================
+    def _grid_plan(self):
+        lo, hi = self.lo.ravel(), self.hi.ravel()
+        lon, lat = np.repeat(self.lon, 2), np.repeat(self.lat, 2)
+        valid = np.flatnonzero(np.isfinite(lo) & np.isfinite(hi) & np.isfinite(lon) & np.isfinite(lat))
+        if len(valid) == 0 or not self.max_km > 0:
+            return 0, valid, None, None
+        cell_lat = self.max_km / KM_PER_DEG_LAT
+        max_lat = float(np.max(np.abs(lat[valid])))
+        cos_lat = math.cos(math.radians(min(max_lat + cell_lat, 89.0)))
+        cell_lon = min(cell_lat / cos_lat, 360.0)
+
+        cx = np.floor((lon[valid] + 180) / cell_lon).astype(np.int64)
+        cy = np.floor((lat[valid] + 90) / cell_lat).astype(np.int64)
+        width = int(np.ceil(360 / cell_lon)) + 3
+        keys = cy * width + cx
+        cells, rank = np.unique(keys, return_inverse=True)
+
+        # Kunci gabungan (sel, lo): dalam satu sel interval terurut menurut lo,
+        # sehingga interval sel lain yang mungkin beririsan adalah satu rentang
+        widest = float(np.max(hi[valid] - lo[valid]))
+        margin = 1e-3
+        base = float(np.min(lo[valid])) - widest - 1
+        span = float(np.max(hi[valid])) - base + 1
+        composite = rank * span + (lo[valid] - base)
+        order = np.argsort(composite, kind="stable")
+        items, composite = valid[order], composite[order]
+        rank, item_lo, item_hi = rank[order], lo[items] - base, hi[items] - base
+        keys = cells[rank]
+
+        # Sel sendiri: sweep biasa (hanya interval sesudahnya)
+        starts = [np.arange(len(items)) + 1]
+        ends = [np.searchsorted(composite, rank * span + item_hi + margin, side="right")]
+        # 4 sel tetangga "sesudahnya": interval dengan lo di (lo_i - lebar maks, hi_i)
+        for dy, dx in ((0, 1), (1, -1), (1, 0), (1, 1)):
+            target = keys + dy * width + dx
+            pos = np.searchsorted(cells, target).clip(max=len(cells) - 1)
+            found = cells[pos] == target
+            lower = np.searchsorted(composite, pos * span + item_lo - widest - margin, side="left")
+            upper = np.searchsorted(composite, pos * span + item_hi + margin, side="right")
+            starts.append(np.where(found, lower, 0))
+            ends.append(np.where(found, upper, 0))
+        starts, ends = np.column_stack(starts), np.column_stack(ends)
+        counts = np.maximum(ends - starts, 0)
+        return int(counts.sum()), items, starts, ends
+
+    def _grid_pairs(self, items, starts, ends):
+        if starts is None:
+            return
+        per_item = np.maximum(ends - starts, 0).sum(axis=1)
+        for start, end in _blocks(per_item):
+            s, e = starts[start:end].ravel(), ends[start:end].ravel()
+            i = np.repeat(np.repeat(np.arange(start, end), starts.shape[1]), np.maximum(e - s, 0))
+            j = _ranges(s, e)
+            # Interval pipih (baris * 2 + pita) -> baris
+            yield items[i] // 2, items[j] // 2
+
+    # =====================
+    # SARING & KUMPULKAN
+    # =====================
+    def _collect(self, pairs):
+        found = []
+        total = 0
+        self.truncated = False
+        for a, b in pairs:
+            a, b = np.minimum(a, b), np.maximum(a, b)
+            keep = a != b
+            a, b = a[keep], b[keep]
+            # Irisan terbesar dari 4 kombinasi pita (FREQ/FREQ_PAIR x FREQ/FREQ_PAIR)
+            overlap = np.stack([
+                np.minimum(self.hi[a, i], self.hi[b, j]) - np.maximum(self.lo[a, i], self.lo[b, j])
+                for i in range(2) for j in range(2)
+            ], axis=1)
+            overlap = np.where(np.isnan(overlap), -np.inf, overlap)
+            best = overlap.argmax(axis=1)
+            width = overlap[np.arange(len(a)), best]
+            keep = width > 0
+            a, b, best, width = a[keep], b[keep], best[keep], width[keep]
+            # Jarak (mahal) hanya untuk pasangan yang frekuensinya beririsan
+            if self.max_km is not None:
+                dist = haversine_km(self.lon[a], self.lat[a], self.lon[b], self.lat[b])
+                keep = dist <= self.max_km
+                a, b, best, width, dist = a[keep], b[keep], best[keep], width[keep], dist[keep]
+            if len(a) == 0:
+                continue
+            block = pd.DataFrame({
+                "a": a, "b": b, "combo": best.astype(np.int8), "overlap": width,
+            })
+            if self.max_km is not None:
+                block["distance"] = dist
+            # Satu baris per pasangan link (kombinasi pita bisa muncul di beberapa kandidat)
+            block = block.sort_values("overlap", ascending=False, kind="stable").drop_duplicates(["a", "b"])
+            found.append(block)
+            total += len(block)
+            if total > self.max_pairs * 2:
+                self.truncated = True
+                break
+
+        if found:
+            result = pd.concat(found, ignore_index=True)
+            result = result.sort_values("overlap", ascending=False, kind="stable").drop_duplicates(["a", "b"])
+            result = result.sort_values(["overlap", "a", "b"], ascending=[False, True, True], kind="stable")
+        else:
+            result = pd.DataFrame({"a": [], "b": [], "combo": [], "overlap": [], "distance": []})
+        if len(result) > self.max_pairs:
+            self.truncated = True
+            result = result.iloc[:self.max_pairs]
+
+        self.a = result["a"].to_numpy(dtype=np.int32)
+        self.b = result["b"].to_numpy(dtype=np.int32)
+        combo = result["combo"].to_numpy(dtype=np.int8)
+        self.band_a, self.band_b = combo // 2, combo % 2
+        self.overlap_mhz = result["overlap"].to_numpy(dtype=float)
+        if "distance" in result.columns:
+            self.distance_km = result["distance"].to_numpy(dtype=float)
+        else:
+            self.distance_km = np.full(len(result), np.nan)
+
+    # =====================
+    # HASIL
+    # =====================
+    def rows(self):
+        """Row-id link yang terlibat (urutan kemunculan pertama di laporan)"""
+        both = np.column_stack([self.a, self.b]).ravel()
+        _, first = np.unique(both, return_index=True)
+        return both[np.sort(first)].astype(np.int64)
+
+    def summary(self):
+        return {
+            "pairs": len(self),
+            "truncated": self.truncated,
+            "max_pairs": self.max_pairs,
+            "max_km": self.max_km,
+            "strategy": self.strategy,
+            "candidates": self.candidates,
+            "seconds": self.seconds,
+        }
+
+
+# =====================
+# PARAMETER & CACHE PER SNAPSHOT
+# =====================
+def parse_max_km(value):
+    """Batas jarak (km) dari parameter; kosong = tanpa batas jarak.
+
+    Dibulatkan ke 0.1 km agar nilai yang hampir sama memakai laporan cache yang sama.
+    ValueError jika bukan angka positif.
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        km = float(value)
+    except ValueError:
+        raise ValueError(f"Bukan angka: {value!r}")
+    if not (np.isfinite(km) and km > 0):
+        raise ValueError("max_km harus lebih dari 0 km")
+    return max(round(km, 1), 0.1)
+
+
+class ReportCache:
+    """LRU laporan berbatas jarak: (versi, max_km) -> OverlapReport.
+
+    Total `nbytes` laporan dibatasi `max_bytes` (yang paling lama tidak dipakai
+    dibuang), jadi banyak nilai max_km berbeda tidak menumpuk sampai versi baru.
+    Laporan dibangun di luar lock; laporan versi lama dibuang saat publikasi.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            report = self._entries.get(key)
+            if report is not None:
+                self._entries.move_to_end(key)
+                return report
+
+        report = build()
+        if report.nbytes > self.max_bytes:
+            return report
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = report
+            self._bytes += report.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return report
+
+    def invalidate(self, version=None):
+        """Buang semua laporan yang bukan milik `version`"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] != version]:
+                self._bytes -= self._entries.pop(key).nbytes
+
+
+report_cache = ReportCache(OVERLAP_CACHE_MB * 1024 * 1024)
+
+# Versi baru dipublikasikan -> laporan versi lama dibuang
+add_publish_hook(report_cache.invalidate)
+
+
+def get_report(snapshot, max_km=None):
+    """Laporan irisan frekuensi.
+
+    Tanpa batas jarak: satu laporan per snapshot (struktur turunan snapshot);
+    berbatas jarak: lewat `report_cache` yang dibatasi memori.
+    """
+    if max_km is None:
+        return snapshot.derived("freq_overlap:all", lambda df: OverlapReport(df))
+    return report_cache.get_or_build(
+        (snapshot.version, max_km), lambda: OverlapReport(snapshot.df, max_km)
+    )
@@ -0,0 +1,119 @@
+# geo_index.py
+import math
+
+import numpy as np
+import pandas as pd
+
+# Ukuran sel grid (derajat); 0.05° ~ 5.5 km di khatulistiwa
+GRID_DEG = 0.05
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+# Pasangan kolom koordinat: titik stasiun (SID_*) atau titik lawan (LONG/LAT)
+POINTS = {
+    "station": ("SID_LONG", "SID_LAT"),
+    "lawan": ("LONG", "LAT"),
+}
+
+
+def haversine_km(lon, lat, lon0, lat0):
+    """Jarak lingkaran besar (km) dari (lon0, lat0) ke array (lon, lat)
+
+    (lon0, lat0) boleh skalar atau array sepanjang (lon, lat) untuk jarak per pasangan.
+    """
+    lon, lat = np.radians(lon), np.radians(lat)
+    lon0, lat0 = np.radians(lon0), np.radians(lat0)
+    a = (np.sin((lat - lat0) / 2) ** 2
+         + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    """Index grid koordinat stasiun, dibangun sekali per snapshot.
+
+    Titik diurutkan menurut kunci sel (baris grid * lebar + kolom grid),
+    sehingga satu baris sel dalam bounding box adalah satu rentang kontigu
+    yang dicari dengan searchsorted. Kandidat lalu disaring persis
+    (bbox) atau dengan jarak haversine (radius). Baris dengan koordinat
+    kosong/tidak valid tidak diindex.
+    """
+
+    def __init__(self, df, point="station"):
+        lon_col, lat_col = POINTS[point]
+        n = len(df)
+        lon = _coordinates(df, lon_col, n)
+        lat = _coordinates(df, lat_col, n)
+        valid = (np.isfinite(lon) & np.isfinite(lat)
+                 & (lon >= -180) & (lon <= 180) & (lat >= -90) & (lat <= 90))
+        rows = np.flatnonzero(valid)
+
+        self.n_rows = n
+        self.width = int(360 / GRID_DEG) + 1
+        keys = self._cell_y(lat[rows]) * self.width + self._cell_x(lon[rows])
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.rows = rows[order].astype(np.int32)
+        # Koordinat per row-id (NaN jika tidak diindex)
+        self.lon = np.where(valid, lon, np.nan)
+        self.lat = np.where(valid, lat, np.nan)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.keys, self.rows, self.lon, self.lat))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _cell_x(self, lon):
+        return np.floor((np.asarray(lon) + 180) / GRID_DEG).astype(np.int64)
+
+    def _cell_y(self, lat):
+        return np.floor((np.asarray(lat) + 90) / GRID_DEG).astype(np.int64)
+
+    def _candidates(self, min_lon, min_lat, max_lon, max_lat):
+        """Posisi (di array terurut) titik dalam sel yang menyentuh bbox"""
+        x0, x1 = self._cell_x(max(min_lon, -180)), self._cell_x(min(max_lon, 180))
+        y0, y1 = self._cell_y(max(min_lat, -90)), self._cell_y(min(max_lat, 90))
+        if x0 > x1 or y0 > y1 or len(self.keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        cell_rows = np.arange(y0, y1 + 1, dtype=np.int64) * self.width
+        starts = np.searchsorted(self.keys, cell_rows + x0, side="left")
+        ends = np.searchsorted(self.keys, cell_rows + x1, side="right")
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        # Gabungkan rentang [start, end) per baris sel
+        shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return shift + np.arange(total)
+
+    def within_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """Row-id (terurut naik) dengan titik di dalam bounding box"""
+        rows = self.rows[self._candidates(min_lon, min_lat, max_lon, max_lat)]
+        lon, lat = self.lon[rows], self.lat[rows]
+        hit = (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+        return np.sort(rows[hit])
+
+    def within_radius(self, lon0, lat0, radius_km):
+        """Row-id dalam radius (km) dari (lon0, lat0), terurut dari yang terdekat"""
+        dlat = radius_km / KM_PER_DEG_LAT
+        cos_lat = math.cos(math.radians(min(abs(lat0) + dlat, 90.0)))
+        dlon = 180.0 if cos_lat < 1e-9 else min(radius_km / (KM_PER_DEG_LAT * cos_lat), 180.0)
+        rows = self.rows[self._candidates(lon0 - dlon, lat0 - dlat, lon0 + dlon, lat0 + dlat)]
+        dist = haversine_km(self.lon[rows], self.lat[rows], lon0, lat0)
+        hit = dist <= radius_km
+        rows, dist = rows[hit], dist[hit]
+        # Jarak sama -> urutan baris data
+        return rows[np.lexsort((rows, dist))]
+
+    def distances(self, rows, lon0, lat0):
+        """Jarak (km) baris `rows` dari (lon0, lat0); NaN jika koordinat kosong"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return haversine_km(self.lon[rows], self.lat[rows], lon0, lat0)
+
+
+def _coordinates(df, col, n):
+    if col not in df.columns:
+        return np.full(n, np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
@@ -0,0 +1,346 @@
+# ingest.py
+import datetime
+import io
+import logging
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+from openpyxl.worksheet._reader import WorkSheetParser
+
+from schema import take_stats, merge_stats
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 5000
+
+# Parse paralel: jumlah proses dan ukuran XML sheet minimum agar dipakai
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+PARALLEL_MIN_BYTES = int(os.getenv("INGEST_PARALLEL_MIN_BYTES", str(32 << 20)))
+_READ_SIZE = 1 << 22
+
+_SHEET_DATA = re.compile(rb"<((?:[\w.-]+:)?)sheetData\b[^>]*?(/?)>")
+_ROOT_TAG = re.compile(rb"<((?:[\w.-]+:)?worksheet)\b")
+_SHEET_DATA_END = re.compile(rb"</(?:[\w.-]+:)?sheetData>")
+_ROW_TAG = re.compile(rb"<(?:[\w.-]+:)?row\b([^>]*)>")
+_ROW_NUMBER = re.compile(rb"""\sr\s*=\s*["']([^"']*)["']""")
+
+# Nilai yang dibaca pandas.read_excel sebagai NaN (default na_values)
+NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+}
+
+
+def cell_text(value):
+    """Nilai sel openpyxl -> string, sama seperti read_excel(dtype=str) + fillna("")"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime.datetime, datetime.time)):
+        return str(value)
+    text = str(value)
+    return "" if text in NA_VALUES else text
+
+
+def row_text(values, width):
+    """Satu baris nilai sel -> (list string selebar header, True jika baris kosong)"""
+    row = [cell_text(v) for v in values[:width]]
+    row += [""] * (width - len(row))
+    return row, all(v is None or v == "" for v in values)
+
+
+def column_names(header):
+    """Nama kolom dari baris header (kosong -> "Unnamed: i", duplikat -> "X.1")"""
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else cell_text(value) or str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+class ExcelReader:
+    """Baca file upload per potongan baris tanpa memuat seluruh workbook.
+
+    .xlsx dibaca dengan openpyxl read-only (sheet pertama); header bisa
+    divalidasi sebelum baris data disentuh. File lain (.xls) jatuh ke
+    pandas.read_excel lalu tetap dipotong per CHUNK_ROWS.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._wb = None
+        self._frame = None
+        try:
+            self._wb = load_workbook(path, read_only=True, data_only=True)
+            self._sheet = self._wb.worksheets[0]
+            header = next(self._sheet.iter_rows(max_row=1, values_only=True), ())
+            self.columns = column_names(header)
+            # Lebar sheet menurut dimensi (bisa lebih lebar dari header)
+            self.sheet_columns = self._sheet.max_column
+        except Exception as e:
+            logger.warning("Streaming read unavailable (%s). Falling back to pandas.read_excel", e)
+            self.close()
+            self._frame = pd.read_excel(path, dtype=str).fillna("")
+            self.columns = self._frame.columns.tolist()
+            self.sheet_columns = len(self.columns)
+
+    def chunks(self, chunk_rows=CHUNK_ROWS, clean=None, workers=None):
+        """DataFrame string per potongan; baris kosong di akhir sheet diabaikan.
+
+        `clean` (mis. clean_dataframe) diterapkan per potongan; dengan
+        `workers` > 1 dan sheet besar, parse + clean berjalan paralel.
+        """
+        if self._frame is not None:
+            for start in range(0, len(self._frame), chunk_rows):
+                yield _frame(self._frame.iloc[start:start + chunk_rows], self.columns, clean)
+            return
+
+        if self.parallel(workers):
+            yield from self._parallel_chunks(chunk_rows, clean, workers or INGEST_WORKERS)
+            return
+
+        width = len(self.columns)
+        rows = []
+        blank = []
+        for values in self._sheet.iter_rows(min_row=2, values_only=True):
+            row, is_blank = row_text(values, width)
+            if is_blank:
+                # Baris kosong hanya ditulis jika masih ada data sesudahnya
+                blank.append(row)
+                continue
+            rows.extend(blank)
+            blank = []
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                yield _frame(rows, self.columns, clean)
+                rows = []
+        if rows:
+            yield _frame(rows, self.columns, clean)
+
+    # =====================
+    # PARSE PARALEL
+    # =====================
+    def _sheet_size(self):
+        """Ukuran XML sheet (tanpa kompresi) untuk memilih parse paralel"""
+        return self._wb._archive.getinfo(self._sheet._worksheet_path).file_size
+
+    def parallel(self, workers=None):
+        """True jika chunks() akan memakai parse paralel"""
+        workers = INGEST_WORKERS if workers is None else workers
+        return self._wb is not None and workers > 1 and self._sheet_size() >= PARALLEL_MIN_BYTES
+
+    def _parallel_chunks(self, chunk_rows, clean, workers):
+        """Parse + bersihkan rentang baris XML sheet di process pool.
+
+        Proses utama hanya memecah XML per `chunk_rows` baris; tiap rentang
+        di-parse dengan parser openpyxl yang sama (WorkSheetParser) di proses
+        lain, jadi nilai sel dan urutan baris sama persis dengan jalur
+        berurutan. Baris kosong di ujung rentang ditahan sampai terbukti
+        masih ada data sesudahnya.
+        """
+        sheet = self._sheet
+        src = self._wb._archive.open(sheet._worksheet_path)
+        head, tail, rest = _sheet_head(src)
+        if head is None:
+            src.close()
+            return
+        config = {
+            "head": head,
+            "tail": tail,
+            "shared_strings": list(self._wb.shared_strings),
+            "epoch": self._wb.epoch,
+            "date_formats": self._wb._date_formats,
+            "timedelta_formats": self._wb._timedelta_formats,
+            "max_row": sheet.max_row,
+            "max_col": sheet.max_column,
+            "columns": self.columns,
+            "clean": clean,
+        }
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        pool = ProcessPoolExecutor(workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(config,))
+        logger.info("Parallel ingest: %s workers, %s bytes of sheet XML", workers, self._sheet_size())
+        try:
+            pending = deque()
+            held = None
+            blocks = _row_blocks(src, rest, chunk_rows, sheet.max_row)
+            while True:
+                block = next(blocks, None)
+                if block is not None:
+                    pending.append(pool.submit(_parse_block, *block))
+                if not pending:
+                    break
+                if block is not None and len(pending) < workers * 2:
+                    continue
+
+                frame, trailing, stats = pending.popleft().result()
+                merge_stats(stats)
+                if frame.empty:
+                    continue
+                if trailing == len(frame):
+                    held = frame if held is None else pd.concat([held, frame], ignore_index=True)
+                    continue
+                if held is not None:
+                    yield held
+                    held = None
+                if trailing:
+                    held = frame.iloc[len(frame) - trailing:]
+                    frame = frame.iloc[:len(frame) - trailing]
+                yield frame
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            src.close()
+
+    def close(self):
+        if self._wb is not None:
+            self._wb.close()
+            self._wb = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _frame(rows, columns, clean=None):
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=columns, dtype=str)
+    return clean(frame) if clean is not None else frame
+
+
+# =====================
+# PEMECAH XML SHEET
+# =====================
+def _sheet_head(src):
+    """Baca XML sheet sampai tag <sheetData>.
+
+    Kembalikan (head, tail, sisa bytes); head = None jika sheet tanpa baris.
+    head + potongan <row> + tail membentuk dokumen XML yang valid.
+    """
+    buf = b""
+    while True:
+        match = _SHEET_DATA.search(buf)
+        if match:
+            break
+        data = src.read(_READ_SIZE)
+        if not data:
+            return None, None, b""
+        buf += data
+    if match.group(2):  # <sheetData/>
+        return None, None, b""
+    root = _ROOT_TAG.search(buf)
+    root_name = root.group(1).decode() if root else "worksheet"
+    head = buf[:match.end()]
+    tail = f"</{match.group(1).decode()}sheetData></{root_name}>".encode()
+    return head, tail, buf[match.end():]
+
+
+def _row_blocks(src, buf, rows_per_block, max_row):
+    """Potong isi <sheetData> menjadi blok berisi `rows_per_block` tag <row>.
+
+    Yield (bytes blok, row_counter, counter): posisi parser openpyxl dan
+    baris berikutnya yang diharapkan sebelum blok, agar tiap proses bisa
+    melanjutkan penomoran baris persis seperti pembacaan berurutan.
+    """
+    row_counter = 0  # WorkSheetParser.row_counter
+    counter = 2      # baris berikutnya untuk iter_rows(min_row=2)
+    block_start, block_state, rows = 0, (row_counter, counter), 0
+    scan = 0
+    while True:
+        end = _SHEET_DATA_END.search(buf, block_start)
+        limit = end.start() if end else len(buf)
+        stop = end is not None
+        for match in _ROW_TAG.finditer(buf, scan, limit):
+            before = (row_counter, counter)
+            number = _ROW_NUMBER.search(match.group(1))
+            index = int(float(number.group(1))) if number else row_counter + 1
+            if max_row is not None and index > max_row:
+                # iter_rows berhenti di baris pertama setelah dimensi sheet
+                limit, stop = match.start(), True
+                break
+            if rows == rows_per_block:
+                yield buf[block_start:match.start()], *block_state
+                block_start, block_state, rows = match.start(), before, 0
+            rows += 1
+            row_counter = index
+            if index >= counter:
+                counter = index + 1
+            scan = match.end()
+
+        if stop:
+            if rows:
+                yield buf[block_start:limit], *block_state
+            return
+
+        buf = buf[block_start:]
+        scan -= block_start
+        block_start = 0
+        data = src.read(_READ_SIZE)
+        if not data:
+            # XML terpotong: sisa blok tetap dikirim, parser yang melaporkan error
+            if rows:
+                yield buf, *block_state
+            return
+        buf += data
+
+
+# =====================
+# PROSES WORKER
+# =====================
+_worker = {}
+
+
+def _init_worker(config):
+    _worker.update(config)
+
+
+def _parse_block(block, row_counter, counter):
+    """Parse satu blok <row> di proses worker; kembalikan (DataFrame, baris kosong di akhir)"""
+    source = io.BytesIO(_worker["head"] + block + _worker["tail"])
+    parser = WorkSheetParser(source, _worker["shared_strings"], data_only=True,
+                             epoch=_worker["epoch"],
+                             date_formats=_worker["date_formats"],
+                             timedelta_formats=_worker["timedelta_formats"])
+    parser.row_counter = row_counter
+
+    # Sama dengan ReadOnlyWorksheet._cells_by_row(values_only=True)
+    max_row, max_col = _worker["max_row"], _worker["max_col"]
+    empty_row = (None,) * max_col if max_col is not None else []
+    width = len(_worker["columns"])
+    rows = []
+    trailing = 0
+    for idx, cells in parser.parse():
+        if max_row is not None and idx > max_row:
+            break
+        values_rows = []
+        for _ in range(counter, idx):
+            counter += 1
+            values_rows.append(empty_row)
+        if counter <= idx:
+            values_rows.append(ReadOnlyWorksheet._get_row(None, cells, 1, max_col, values_only=True))
+            counter += 1
+        for values in values_rows:
+            row, is_blank = row_text(values, width)
+            trailing = trailing + 1 if is_blank else 0
+            rows.append(row)
+
+    frame = _frame(rows, _worker["columns"], _worker["clean"])
+    return frame, trailing, take_stats()
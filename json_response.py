@@ -0,0 +1,54 @@
+# json_response.py
+import json
+import time
+
+import numpy as np
+from flask import Response
+
+from metrics import SERIALIZE_SECONDS, SERIALIZE_BYTES
+
+try:
+    import orjson
+except ImportError:  # fallback: json standar (lebih lambat, isi sama)
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Encode payload ke bytes JSON (orjson jika terpasang)"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(payload, status=200):
+    """Pengganti jsonify untuk response besar (tabel DataTables)"""
+    start = time.perf_counter()
+    body = dumps(payload)
+    SERIALIZE_SECONDS.observe(time.perf_counter() - start)
+    SERIALIZE_BYTES.inc(len(body))
+    return Response(body, status=status, mimetype="application/json")
+
+
+def columnar_requested(params):
+    """True jika klien meminta payload per kolom (layout=columns)"""
+    return str(params.get("layout", "")).lower() == "columns"
+
+
+def page_values(page, columns):
+    """Isi halaman sebagai list per kolom (tanpa iterrows / akses per sel)"""
+    return [page[col].tolist() for col in columns]
+
+
+def table_data(values, columns, columnar):
+    """`data` DataTables: baris (list per baris) atau per kolom ({kolom: list})"""
+    if columnar:
+        return dict(zip(columns, values))
+    return [list(row) for row in zip(*values)]
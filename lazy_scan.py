@@ -0,0 +1,47 @@
+# lazy_scan.py
+import os
+
+import numpy as np
+
+from query_cache import result_cache
+
+# Ukuran blok pertama evaluasi lazy (halaman pertama dulu, jumlah persis menyusul);
+# blok berikutnya dua kali lipat agar filter yang jarang cocok tetap cepat selesai
+LAZY_BLOCK_ROWS = int(os.getenv("LAZY_BLOCK_ROWS", "5000"))
+
+
+def lazy_requested(params):
+    """True jika klien meminta mode lazy (parameter lazy=1)"""
+    return str(params.get("lazy", "")).lower() in ("1", "true", "yes")
+
+
+def lazy_rows(key, n_rows, match_block, needed, block_rows=LAZY_BLOCK_ROWS):
+    """Row-id hasil filter untuk satu halaman tanpa menunggu filter penuh.
+
+    `match_block(start, end)` mengembalikan row-id cocok (naik) di blok baris
+    [start, end). Blok di-scan berurutan sampai `needed` (start + length)
+    baris ditemukan. Kembalikan (rows, total, exact):
+    - hasil penuh sudah di cache `key`, atau scan sampai akhir data:
+      rows = semua hasil, total persis, exact=True (hasil scan ikut di-cache);
+    - scan berhenti lebih awal: rows = hasil sejauh ini, total = perkiraan
+      (proporsi baris cocok x jumlah baris), exact=False. Jumlah persis
+      didapat dari request berikutnya tanpa lazy.
+    """
+    rows = result_cache.get(key)
+    if rows is not None:
+        return rows, len(rows), True
+
+    found, count, scanned = [], 0, 0
+    while scanned < n_rows and count < needed:
+        end = min(scanned + block_rows, n_rows)
+        block = np.asarray(match_block(scanned, end), dtype=np.int64)
+        found.append(block)
+        count += len(block)
+        scanned = end
+        block_rows *= 2
+    rows = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    if scanned >= n_rows:
+        return result_cache.put(key, rows), len(rows), True
+    estimate = max(len(rows) * n_rows // scanned, len(rows) + 1)
+    return rows, estimate, False
@@ -0,0 +1,184 @@
+# metrics.py
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Batas bucket histogram durasi (detik), mengikuti default client Prometheus
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Counter monoton per kombinasi label (nilai per proses worker)"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Histogram kumulatif (bucket + sum + count) per kombinasi label"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Catat durasi blok `with` (juga saat blok melempar exception)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                yield (f"{self.name}_bucket",
+                       _labels(self.labelnames, key, [("le", _number(bound))]), cumulative)
+            yield f"{self.name}_sum", _labels(self.labelnames, key), total
+            yield f"{self.name}_count", _labels(self.labelnames, key), count
+
+
+class Registry:
+    """Registry metrik in-process + collector yang dibaca saat scrape.
+
+    Collector adalah fungsi tanpa argumen yang mengembalikan list
+    (name, kind, help, [(labels dict, value), ...]); dipakai untuk nilai yang
+    sudah dihitung modul lain (statistik cache, cleaning, snapshot).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        """Semua metrik dalam format teks Prometheus (exposition 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                lines.append(f"# collector error: {_escape(e)}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_text = _labels(labels.keys(), labels.values())
+                    lines.append(f"{name}{label_text} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+add_collector = REGISTRY.add_collector
+render = REGISTRY.render
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# =====================
+# METRIK BERSAMA
+# =====================
+REQUEST_SECONDS = histogram(
+    "dasimm_http_request_duration_seconds", "Durasi request per endpoint",
+    ("endpoint", "method", "status"))
+FILTER_SECONDS = histogram(
+    "dasimm_filter_seconds", "Waktu filter/pencarian row-id per endpoint", ("endpoint",))
+SERIALIZE_SECONDS = histogram(
+    "dasimm_serialize_seconds", "Waktu encode response JSON")
+SERIALIZE_BYTES = counter(
+    "dasimm_serialize_bytes_total", "Byte response JSON yang di-encode")
+EXPORT_ROWS = counter(
+    "dasimm_export_rows_total", "Baris yang di-export", ("format",))
+EXPORT_SECONDS = histogram(
+    "dasimm_export_seconds", "Durasi stream export sampai selesai", ("format",),
+    buckets=DEFAULT_BUCKETS + (60.0, 120.0, 300.0))
+
+
+def timed_stream(chunks, rows, format):
+    """Bungkus generator export: catat durasi dan jumlah baris saat stream selesai"""
+    start = time.perf_counter()
+    for chunk in chunks:
+        yield chunk
+    EXPORT_SECONDS.observe(time.perf_counter() - start, format=format)
+    EXPORT_ROWS.inc(rows, format=format)
@@ -0,0 +1,36 @@
+# numeric_index.py
+import numpy as np
+import pandas as pd
+
+
+class NumericIndex:
+    """Nilai numeric satu kolom yang sudah terurut + row-id-nya, dibangun sekali per snapshot.
+
+    Filter rentang cukup dua binary search (searchsorted) lalu satu slice;
+    sel kosong/bukan angka tidak diindex sehingga tidak pernah lolos filter.
+    """
+
+    def __init__(self, df, col):
+        n = len(df)
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        else:
+            values = np.full(n, np.nan)
+        rows = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[rows], kind="stable")
+        self.n_rows = n
+        self.values = values[rows][order]
+        self.rows = rows[order].astype(np.int32)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.rows.nbytes
+
+    def __len__(self):
+        return len(self.rows)
+
+    def between(self, low=None, high=None):
+        """Row-id dengan low <= nilai <= high (batas None = terbuka), urut menurut nilai"""
+        start = 0 if low is None else np.searchsorted(self.values, low, side="left")
+        end = len(self.values) if high is None else np.searchsorted(self.values, high, side="right")
+        return self.rows[start:max(start, end)]
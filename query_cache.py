@@ -0,0 +1,122 @@
+# query_cache.py
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+from data_store import add_publish_hook
+
+# Batas memori cache hasil query (MB), bisa diatur lewat environment
+QUERY_CACHE_MB = int(os.getenv("QUERY_CACHE_MB", "64"))
+
+
+class QueryCache:
+    """LRU cache hasil query DataTables: key -> array row-id yang cocok.
+
+    Key selalu diawali versi snapshot, jadi hasil dari versi lama tidak
+    pernah terpakai; `invalidate` membuangnya saat versi baru dipublikasikan.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return rows
+            self.misses += 1
+
+        return self.put(key, compute())
+
+    def get(self, key):
+        """Hasil yang sudah ada di cache (None jika belum, dihitung sebagai miss), tanpa menghitung"""
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return rows
+
+    def put(self, key, rows):
+        """Simpan hasil yang dihitung di luar cache (setelah `get` yang miss)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        rows.flags.writeable = False
+        self._put(key, rows)
+        return rows
+
+    def _put(self, key, rows):
+        size = rows.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = rows
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def invalidate(self, version=None):
+        """Buang semua entri yang bukan milik `version`"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] != version]:
+                self._bytes -= self._entries.pop(key).nbytes
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+result_cache = QueryCache(QUERY_CACHE_MB * 1024 * 1024)
+
+# Versi baru dipublikasikan -> hasil query versi lama dibuang
+add_publish_hook(result_cache.invalidate)
+
+
+def _cache_metrics():
+    """Statistik result_cache untuk /metrics"""
+    stats = result_cache.stats()
+    counters = [
+        ("hits", "Lookup cache hasil query yang kena"),
+        ("misses", "Lookup cache hasil query yang dihitung ulang"),
+        ("evictions", "Entri dibuang karena batas memori"),
+        ("invalidations", "Entri dibuang karena versi snapshot baru"),
+    ]
+    families = [(f"dasimm_query_cache_{name}_total", "counter", help, [({}, stats[name])])
+                for name, help in counters]
+    families.append(("dasimm_query_cache_entries", "gauge", "Entri di cache hasil query",
+                     [({}, stats["entries"])]))
+    families.append(("dasimm_query_cache_bytes", "gauge", "Byte row-id di cache hasil query",
+                     [({}, stats["bytes"])]))
+    return families
+
+
+metrics.add_collector(_cache_metrics)
@@ -0,0 +1,207 @@
+# saved_store.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class SavedStore:
+    """Data pemeriksaan tersimpan dalam SQLite.
+
+    Setiap baris punya id tetap (INTEGER PRIMARY KEY), sehingga edit/hapus
+    tidak bergantung pada posisi dan tidak menulis ulang seluruh data.
+    Penulisan memakai transaksi BEGIN IMMEDIATE, jadi penyimpanan bersamaan
+    dari beberapa worker tidak saling menimpa. Cek duplikat memakai kolom
+    fingerprint (hash seluruh kolom yang sudah dibersihkan) yang ter-index.
+    """
+
+    def __init__(self, path, columns, legacy_file=None, clean=None):
+        self.path = path
+        self.columns = list(columns)
+        self.legacy_file = legacy_file
+        self.clean = clean or (lambda value: "" if value is None else str(value).strip())
+        self._local = threading.local()
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    # =====================
+    # KONEKSI
+    # =====================
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    self._init_schema(conn)
+                    self._ready = True
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _quoted(self):
+        return ", ".join(f'"{col}"' for col in self.columns)
+
+    def _init_schema(self, conn):
+        cols = ", ".join(f'"{col}" TEXT NOT NULL DEFAULT \'\'' for col in self.columns)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS inspections (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols})")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._migrate_fingerprints(conn)
+            self._import_legacy(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_fingerprints(self, conn):
+        """Kolom + index fingerprint untuk cek duplikat; isi untuk baris lama"""
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(inspections)")}
+        if "fingerprint" not in existing:
+            conn.execute("ALTER TABLE inspections ADD COLUMN fingerprint TEXT")
+        conn.execute("DROP INDEX IF EXISTS idx_inspections_link")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inspections_fingerprint ON inspections (fingerprint)")
+
+        missing = conn.execute(
+            f"SELECT id, {self._quoted()} FROM inspections WHERE fingerprint IS NULL"
+        ).fetchall()
+        if missing:
+            conn.executemany(
+                "UPDATE inspections SET fingerprint = ? WHERE id = ?",
+                [(self.fingerprint(dict(zip(self.columns, row[1:]))), row[0]) for row in missing],
+            )
+            logger.info("Fingerprinted %s saved rows", len(missing))
+
+    def _import_legacy(self, conn):
+        """Impor sekali dari file Excel lama (jika ada)"""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        if self.legacy_file and os.path.exists(self.legacy_file):
+            try:
+                df = pd.read_excel(self.legacy_file, dtype=str)
+                rows = [self._clean_row(r) for r in df.to_dict("records")]
+                self._insert_many(conn, rows)
+                logger.info("Imported %s saved rows from %s", len(rows), self.legacy_file)
+            except Exception as e:
+                logger.error("Error importing %s: %s", self.legacy_file, e)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+
+    # =====================
+    # HELPER
+    # =====================
+    def _clean_row(self, row):
+        return {col: self.clean(row.get(col, "")) for col in self.columns}
+
+    def fingerprint(self, row):
+        """Hash baris yang sudah dibersihkan (semua kolom, urutan tetap)"""
+        joined = "\x1f".join(row[col] for col in self.columns)
+        return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+    def _insert_many(self, conn, rows):
+        placeholders = ", ".join("?" for _ in self.columns)
+        conn.executemany(
+            f"INSERT INTO inspections ({self._quoted()}, fingerprint) VALUES ({placeholders}, ?)",
+            [[row[col] for col in self.columns] + [self.fingerprint(row)] for row in rows],
+        )
+
+    def _existing_fingerprints(self, conn, fingerprints, batch=500):
+        """Fingerprint yang sudah tersimpan (lookup index, per batch)"""
+        found = set()
+        fingerprints = list(fingerprints)
+        for i in range(0, len(fingerprints), batch):
+            part = fingerprints[i:i + batch]
+            marks = ", ".join("?" for _ in part)
+            found.update(row[0] for row in conn.execute(
+                f"SELECT DISTINCT fingerprint FROM inspections WHERE fingerprint IN ({marks})", part
+            ))
+        return found
+
+    def _row_dict(self, row):
+        return dict(zip(["id", *self.columns], row))
+
+    # =====================
+    # BACA
+    # =====================
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM inspections").fetchone()[0]
+
+    def rows(self):
+        """Semua baris terurut id: list (id, [nilai kolom])"""
+        cur = self._connect().execute(f"SELECT id, {self._quoted()} FROM inspections ORDER BY id")
+        return [(row[0], list(row[1:])) for row in cur]
+
+    def get(self, row_id):
+        row = self._connect().execute(
+            f"SELECT id, {self._quoted()} FROM inspections WHERE id = ?", (row_id,)
+        ).fetchone()
+        return self._row_dict(row) if row else None
+
+    def id_at(self, position):
+        """Id baris pada posisi tertentu (kompatibilitas klien lama berbasis index)"""
+        row = self._connect().execute(
+            "SELECT id FROM inspections ORDER BY id LIMIT 1 OFFSET ?", (int(position),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def to_dataframe(self):
+        df = pd.read_sql_query(f"SELECT {self._quoted()} FROM inspections ORDER BY id", self._connect())
+        return df.fillna("")
+
+    # =====================
+    # TULIS
+    # =====================
+    def add_unique(self, rows):
+        """Simpan baris yang belum ada (semua kolom sama = duplikat).
+
+        Kembalikan (jumlah baru, jumlah duplikat).
+        """
+        rows = [self._clean_row(r) for r in rows]
+        prints = [self.fingerprint(row) for row in rows]
+        with self._transaction() as conn:
+            existing = self._existing_fingerprints(conn, set(prints))
+            # Baris baru dalam satu batch tidak dicek satu sama lain (sama seperti sebelumnya)
+            new_rows = [row for row, fp in zip(rows, prints) if fp not in existing]
+            self._insert_many(conn, new_rows)
+        return len(new_rows), len(rows) - len(new_rows)
+
+    def update(self, row_id, values):
+        """Ganti semua kolom satu baris; kolom yang tidak dikirim menjadi kosong"""
+        row = {col: self.clean(values.get(col, "")) for col in self.columns}
+        assignments = ", ".join(f'"{col}" = ?' for col in self.columns)
+        with self._transaction() as conn:
+            cur = conn.execute(
+                f"UPDATE inspections SET {assignments}, fingerprint = ? WHERE id = ?",
+                [row[col] for col in self.columns] + [self.fingerprint(row), row_id],
+            )
+            if cur.rowcount == 0:
+                return None
+        return {"id": row_id, **row}
+
+    def delete(self, row_id):
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM inspections WHERE id = ?", (row_id,)).rowcount > 0
+
+    def clear(self):
+        """Hapus semua baris; kembalikan jumlah yang dihapus"""
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM inspections").rowcount
@@ -0,0 +1,210 @@
+# schema.py
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# =====================
+# SCHEMA DATA SIMS
+# =====================
+# (nama kolom, tipe, wajib ada di file upload)
+# "number": disimpan sebagai angka, sel kosong/tidak valid menjadi ""
+# "text": string tanpa spasi di tepi
+SIMS_COLUMNS = [
+    ("CLNT_ID", "text", True),
+    ("CLNT_NAME", "text", True),
+    ("CURR_LIC_NUM", "text", False),
+    ("LINK_ID", "text", True),
+    ("STN_NAME", "text", True),
+    ("STASIUN_LAWAN", "text", False),
+    ("SID_LONG", "number", False),
+    ("SID_LAT", "number", False),
+    ("FREQ", "number", False),
+    ("FREQ_PAIR", "number", False),
+    ("BWIDTH", "number", False),
+    ("EQ_MDL", "text", False),
+    ("LONG", "number", False),
+    ("LAT", "number", False),
+    ("CITY", "text", False),
+    ("MULAI BEROPERASI", "text", False),
+    ("KETERANGAN", "text", False),
+]
+
+# Kolom turunan (tidak disimpan): nama -> (kolom sumber, fungsi atas nilai numeric)
+DERIVED_COLUMNS = {
+    "BWIDTH_MHZ": ("BWIDTH", lambda values: values / 1000),
+}
+
+# Kolom di luar schema (kolom tambahan dari upload) ditebak dari namanya
+NUMERIC_HINTS = ['freq', 'bwidth', 'long', 'lat']
+
+# Nilai teks yang dianggap kosong saat ditampilkan/diexport
+NULL_TEXT = ["nan", "None", "null"]
+
+COLUMN_TYPES = {name: kind for name, kind, _ in SIMS_COLUMNS}
+REQUIRED_COLUMNS = [name for name, _, required in SIMS_COLUMNS if required]
+
+
+def column_type(col):
+    """Tipe kolom menurut schema ("number"/"text")"""
+    kind = COLUMN_TYPES.get(col)
+    if kind is None:
+        col_lower = col.lower()
+        kind = "number" if any(numeric in col_lower for numeric in NUMERIC_HINTS) else "text"
+    return kind
+
+
+def is_number(col):
+    return column_type(col) == "number"
+
+
+def derive(df, name):
+    """Nilai kolom turunan (Series float, NaN untuk sel kosong)"""
+    source, func = DERIVED_COLUMNS[name]
+    if source not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    return func(pd.to_numeric(df[source], errors="coerce"))
+
+
+# =====================
+# STATISTIK WAKTU CLEANING
+# =====================
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(stage, rows, steps):
+    with _stats_lock:
+        entry = _stats.setdefault(stage, {"calls": 0, "rows": 0, "seconds": 0.0, "steps": {}})
+        entry["calls"] += 1
+        entry["rows"] += rows
+        for step, seconds in steps.items():
+            entry["seconds"] += seconds
+            entry["steps"][step] = entry["steps"].get(step, 0.0) + seconds
+
+
+def take_stats():
+    """Ambil lalu kosongkan statistik proses ini (dipakai worker parse paralel)"""
+    with _stats_lock:
+        stats = {stage: {**entry, "steps": dict(entry["steps"])} for stage, entry in _stats.items()}
+        _stats.clear()
+    return stats
+
+
+def merge_stats(stats):
+    """Gabungkan statistik dari proses lain"""
+    for stage, entry in stats.items():
+        with _stats_lock:
+            own = _stats.setdefault(stage, {"calls": 0, "rows": 0, "seconds": 0.0, "steps": {}})
+            own["calls"] += entry["calls"]
+            own["rows"] += entry["rows"]
+            own["seconds"] += entry["seconds"]
+            for step, seconds in entry["steps"].items():
+                own["steps"][step] = own["steps"].get(step, 0.0) + seconds
+
+
+def clean_stats():
+    """Total waktu cleaning per tahap (load/save/upload/pemeriksaan) dan per langkah"""
+    with _stats_lock:
+        return {
+            stage: {**entry, "seconds": round(entry["seconds"], 4),
+                    "steps": {k: round(v, 4) for k, v in entry["steps"].items()}}
+            for stage, entry in _stats.items()
+        }
+
+
+# =====================
+# CLEANING (VECTORIZED)
+# =====================
+def clean_frame(df, stage="load"):
+    """Bersihkan DataFrame mentah menurut schema.
+
+    Kolom number: to_numeric, nilai tidak valid/kosong menjadi "".
+    Kolom text: astype(str) lalu strip (operasi string per kolom, bukan per sel).
+    Kolom "no" ditambahkan jika belum ada. Waktu tiap langkah dicatat per `stage`.
+    """
+    if df.empty:
+        return df
+
+    steps = {}
+    start = time.perf_counter()
+    # Frame snapshot (mis. mode append): category dijadikan teks, Int64 dijadikan float
+    typed = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            typed[col] = str
+        elif isinstance(df[col].dtype, pd.Int64Dtype):
+            typed[col] = "float64"
+    if typed:
+        df = df.astype(typed)
+    df = df.fillna("")
+    steps["fill"] = time.perf_counter() - start
+
+    numeric = text = 0.0
+    for col in df.columns:
+        start = time.perf_counter()
+        if is_number(col):
+            try:
+                numbers = pd.to_numeric(df[col], errors="coerce")
+                if numbers.isna().all():
+                    # Tidak ada angka sama sekali -> kolom teks kosong
+                    df[col] = pd.Series("", index=df.index, dtype=str)
+                else:
+                    df[col] = numbers.fillna("")
+                numeric += time.perf_counter() - start
+                continue
+            except (TypeError, ValueError):
+                pass
+        df[col] = df[col].astype(str).str.strip()
+        text += time.perf_counter() - start
+    steps["numeric"] = numeric
+    steps["text"] = text
+
+    start = time.perf_counter()
+    df = df.reset_index(drop=True)
+    if "no" not in df.columns and "No" not in df.columns:
+        df.insert(0, "no", range(1, len(df) + 1))
+    steps["index"] = time.perf_counter() - start
+
+    _record(stage, len(df), steps)
+    return df
+
+
+# =====================
+# NILAI TAMPILAN
+# =====================
+def display_values(values):
+    """Nilai kolom seperti yang ditampilkan: angka sebagai str(), NaN menjadi "".
+
+    Kolom kategori tetap kategori, sehingga operasi .str cukup dihitung per kategori.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        if values.hasnans:
+            if "" not in values.cat.categories:
+                values = values.cat.add_categories([""])
+            values = values.fillna("")
+        return values
+    return values.astype(str).fillna("")
+
+
+def display_frame(df, columns=None):
+    """Frame teks untuk baris yang ditampilkan (per halaman, bukan per snapshot)"""
+    columns = df.columns if columns is None else columns
+    return pd.DataFrame({col: display_values(df[col]).astype(str) for col in columns}, index=df.index)
+
+
+def display_text(values):
+    """Nilai kolom sebagai teks tampilan: kosong untuk NaN/"nan"/"None"/"null", tanpa spasi tepi"""
+    values = values.astype(str).fillna("")
+    return values.where(~values.isin(NULL_TEXT), "").str.strip()
+
+
+def prepare_display(df, columns, stage="pemeriksaan"):
+    """Frame baru dengan `columns` sebagai teks tampilan (kolom yang tidak ada diisi "")"""
+    start = time.perf_counter()
+    df = df.copy(deep=False)
+    for col in columns:
+        df[col] = display_text(df[col]) if col in df.columns else ""
+    _record(stage, len(df), {"text": time.perf_counter() - start})
+    return df
@@ -0,0 +1,232 @@
+# search_index.py
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Panjang n-gram (byte UTF-8) untuk index substring
+NGRAM = 3
+
+
+def _sorted_unique(keys):
+    """np.unique untuk array int besar (sort + buang duplikat berurutan)"""
+    keys = np.sort(keys)
+    if len(keys) == 0:
+        return keys
+    keep = np.empty(len(keys), dtype=bool)
+    keep[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+
+def _lower_cells(values):
+    """Nilai kolom sebagai string Arrow lowercase (NaN menjadi null)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Lowercase cukup per kategori, lalu dipetakan lewat kode
+        lowered = _lower_cells(values.cat.categories.to_series())
+        return lowered.take(pa.array(values.cat.codes.to_numpy(), mask=values.cat.codes.to_numpy() < 0))
+    return pc.utf8_lower(pa.array(values.astype(str), type=pa.large_string(), from_pandas=True))
+
+
+def _gather(offsets, postings, ids):
+    """Gabungkan posting list milik `ids` (CSR) menjadi satu array"""
+    if len(ids) == 0:
+        return postings[:0]
+    starts = offsets[ids]
+    lengths = offsets[ids + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return postings[:0]
+    # Posisi tiap elemen = start list-nya + urutan di dalam list
+    shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return postings[shift + np.arange(total)]
+
+
+class SearchIndex:
+    """Inverted index untuk pencarian global, dibangun sekali per snapshot.
+
+    Setiap nilai sel (lowercase) yang unik dipetakan ke daftar baris yang
+    memuatnya. Pencarian angka memakai lookup nilai persis; pencarian teks
+    memakai index n-gram atas nilai unik lalu diverifikasi dengan substring.
+    Nilai unik disimpan sebagai satu array string Arrow (bukan objek Python),
+    sel kosong/NaN tidak diindex.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        n = self.n_rows
+
+        cells = [_lower_cells(df[col]) for col in df.columns]
+        if not cells or n == 0:
+            self.values = pa.array([], type=pa.large_string())
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.rows = np.array([], dtype=np.int32)
+            self._build_ngrams()
+            return
+
+        encoded = pa.chunked_array(cells, type=pa.large_string()).dictionary_encode()
+        codes = np.concatenate([
+            pc.fill_null(chunk.indices, -1).to_numpy().astype(np.int64) for chunk in encoded.chunks
+        ])
+        rows = np.tile(np.arange(n, dtype=np.int64), len(cells))
+        keep = codes >= 0
+
+        # Pasangan (nilai, baris) unik, terurut per nilai lalu per baris
+        pairs = _sorted_unique(codes[keep] * n + rows[keep])
+        value_of_pair = pairs // n
+
+        self.values = encoded.chunks[0].dictionary
+        self.offsets = np.searchsorted(value_of_pair, np.arange(len(self.values) + 1))
+        self.rows = (pairs % n).astype(np.int32)
+        self._build_ngrams()
+
+    @property
+    def nbytes(self):
+        arrays = (self.offsets, self.rows, self.gram_keys, self.gram_offsets, self.gram_values)
+        return self.values.nbytes + sum(a.nbytes for a in arrays)
+
+    def _build_ngrams(self):
+        """Index n-gram: kode n-gram -> id nilai unik (CSR)"""
+        # Byte UTF-8 semua nilai unik langsung dari buffer Arrow (tanpa objek Python)
+        corpus = np.zeros(0, dtype=np.uint8)
+        if len(self.values):
+            _, offsets_buf, data_buf = self.values.buffers()
+            value_offsets = np.frombuffer(offsets_buf, dtype=np.int64)
+            value_offsets = value_offsets[self.values.offset:self.values.offset + len(self.values) + 1]
+            lengths = np.diff(value_offsets)
+            if data_buf is not None:
+                corpus = np.frombuffer(data_buf, dtype=np.uint8)[value_offsets[0]:value_offsets[-1]]
+
+        if len(corpus) < NGRAM:
+            self.gram_keys = np.array([], dtype=np.uint32)
+            self.gram_offsets = np.zeros(1, dtype=np.int64)
+            self.gram_values = np.array([], dtype=np.int32)
+            return
+
+        # Byte NUL di dalam nilai diperlakukan sebagai spasi
+        corpus = np.where(corpus == 0, 32, corpus).astype(np.uint32)
+        value_of_pos = np.repeat(np.arange(len(self.values), dtype=np.int32), lengths)
+        count = len(corpus) - NGRAM + 1
+        grams = np.zeros(count, dtype=np.uint32)
+        for i in range(NGRAM):
+            grams = (grams << 8) | corpus[i:count + i]
+
+        # n-gram tidak boleh melewati batas antar nilai
+        positions = np.flatnonzero(value_of_pos[:count] == value_of_pos[NGRAM - 1:])
+        value_of_pos = value_of_pos[positions]
+
+        keyed = _sorted_unique(grams[positions].astype(np.int64) * len(self.values) + value_of_pos)
+        gram_of_key = keyed // len(self.values)
+        self.gram_keys, first = np.unique(gram_of_key, return_index=True)
+        self.gram_offsets = np.append(first, len(keyed))
+        self.gram_values = (keyed % len(self.values)).astype(np.int32)
+
+    def _gram_candidates(self, token):
+        """Id nilai yang memuat semua n-gram dari token (None = tidak bisa dipersempit)"""
+        raw = token.encode("utf-8")
+        if len(raw) < NGRAM:
+            return None
+        candidates = None
+        grams = {int.from_bytes(raw[i:i + NGRAM], "big") for i in range(len(raw) - NGRAM + 1)}
+        for gram in grams:
+            pos = np.searchsorted(self.gram_keys, gram)
+            if pos >= len(self.gram_keys) or self.gram_keys[pos] != gram:
+                return np.array([], dtype=np.int32)
+            ids = self.gram_values[self.gram_offsets[pos]:self.gram_offsets[pos + 1]]
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                break
+        return candidates
+
+    def values_containing(self, token):
+        """Id nilai unik yang memuat token (substring, token sudah lowercase)"""
+        candidates = self._gram_candidates(token)
+        if candidates is None:
+            candidates = np.arange(len(self.values))
+        if len(candidates) == 0:
+            return candidates
+        candidates = np.asarray(candidates)
+        hits = pc.match_substring(self.values.take(pa.array(candidates)), token)
+        return candidates[hits.to_numpy(zero_copy_only=False)]
+
+    def values_containing_any(self, tokens):
+        """Id nilai unik yang memuat salah satu token (token sudah lowercase)
+
+        Satu token memakai index n-gram; banyak token (mis. daftar LINK_ID)
+        dicocokkan sekaligus dengan satu regex atas nilai unik.
+        """
+        if len(tokens) == 1:
+            return self.values_containing(tokens[0])
+        pattern = "|".join(re.escape(token) for token in tokens)
+        hits = pc.match_substring_regex(self.values, pattern)
+        return np.flatnonzero(hits.to_numpy(zero_copy_only=False))
+
+    def rows_for_values(self, value_ids):
+        return _gather(self.offsets, self.rows, np.asarray(value_ids, dtype=np.int64))
+
+    def rows_equal(self, token):
+        """Baris dengan sel yang sama persis dengan token"""
+        vid = pc.index(self.values, token).as_py()
+        if vid < 0:
+            return self.rows[:0]
+        return self.rows[self.offsets[vid]:self.offsets[vid + 1]]
+
+    def match(self, search_value):
+        """Mask baris untuk pencarian global.
+
+        Keyword angka: sel sama persis dengan salah satu angka.
+        Keyword teks: sel memuat salah satu teks.
+        Kedua kelompok digabung dengan AND.
+        """
+        keywords = search_value.lower().split()
+        angka = [k for k in keywords if k.isdigit()]
+        teks = [k for k in keywords if not k.isdigit()]
+
+        mask = np.ones(self.n_rows, dtype=bool)
+
+        if angka:
+            angka_mask = np.zeros(self.n_rows, dtype=bool)
+            for a in angka:
+                angka_mask[self.rows_equal(a)] = True
+            mask &= angka_mask
+
+        if teks:
+            teks_mask = np.zeros(self.n_rows, dtype=bool)
+            for t in teks:
+                teks_mask[self.rows_for_values(self.values_containing(t))] = True
+            mask &= teks_mask
+
+        return mask
+
+
+def match_frame(df, search_value):
+    """Mask baris `df` untuk pencarian global tanpa index (semantik = SearchIndex.match).
+
+    Dipakai untuk scan per blok baris (mode lazy) sebelum index siap.
+    """
+    keywords = search_value.lower().split()
+    angka = [k for k in keywords if k.isdigit()]
+    teks = [k for k in keywords if not k.isdigit()]
+    cells = [_lower_cells(df[col]) for col in df.columns]
+
+    mask = np.ones(len(df), dtype=bool)
+
+    if angka:
+        angka_mask = np.zeros(len(df), dtype=bool)
+        value_set = pa.array(angka, type=pa.large_string())
+        for column in cells:
+            hits = pc.fill_null(pc.is_in(column, value_set=value_set), False)
+            angka_mask |= hits.to_numpy(zero_copy_only=False)
+        mask &= angka_mask
+
+    if teks:
+        teks_mask = np.zeros(len(df), dtype=bool)
+        pattern = "|".join(re.escape(t) for t in teks)
+        for column in cells:
+            hits = pc.fill_null(pc.match_substring_regex(column, pattern), False)
+            teks_mask |= hits.to_numpy(zero_copy_only=False)
+        mask &= teks_mask
+
+    return mask
@@ -0,0 +1,102 @@
+# sort_index.py
+import threading
+
+import numpy as np
+import pandas as pd
+
+from schema import is_number
+
+
+def is_numeric_column(df, col):
+    """Kolom yang diurutkan sebagai angka: kolom number di schema + nomor urut"""
+    if col.lower() == "no" or is_number(col):
+        return True
+    return pd.api.types.is_numeric_dtype(df[col])
+
+
+def parse_order(params, columns):
+    """Ambil (kolom, descending) dari parameter DataTables order[0][...].
+
+    `columns` memetakan index kolom DataTables ke nama kolom data
+    (None untuk kolom yang tidak bisa diurutkan, mis. aksi/checkbox).
+    """
+    raw = params.get("order[0][column]", "")
+    try:
+        idx = int(raw)
+    except (TypeError, ValueError):
+        return None
+    if idx < 0 or idx >= len(columns) or columns[idx] is None:
+        return None
+    descending = str(params.get("order[0][dir]", "asc")).lower() == "desc"
+    return (columns[idx], descending)
+
+
+class SortIndex:
+    """Permutasi terurut (stable) per kolom, dihitung sekali per snapshot.
+
+    Setiap kolom direduksi menjadi kunci integer padat (rank nilai);
+    null/kosong pada kolom numeric selalu di akhir. Mengurutkan hasil
+    filter cukup memakai kunci ini, tanpa sort_values per request.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._keys = {}
+        self._perms = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        arrays = [key for pair in list(self._keys.values()) for key in pair] + list(self._perms.values())
+        return sum(a.nbytes for a in arrays)
+
+    def _build_keys(self, col):
+        values = self.df[col]
+        if is_numeric_column(self.df, col):
+            values = pd.to_numeric(values.replace("", None), errors="coerce")
+            codes, _ = pd.factorize(values, sort=True)
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            # Rank cukup dihitung per kategori lalu dipetakan lewat kode
+            ranks, _ = pd.factorize(values.cat.categories.astype(str).str.lower(), sort=True)
+            # Kode -1 (NaN) menunjuk ke elemen terakhir = -1
+            codes = np.append(ranks, -1)[values.cat.codes.to_numpy()]
+        else:
+            codes, _ = pd.factorize(values.astype(str).str.lower(), sort=True)
+        top = codes.max() + 1 if len(codes) else 0
+        null = codes < 0
+        asc = np.where(null, top, codes).astype(np.int32)
+        desc = np.where(null, top, top - 1 - codes).astype(np.int32)
+        return asc, desc
+
+    def keys(self, col, descending=False):
+        pair = self._keys.get(col)
+        if pair is None:
+            with self._lock:
+                pair = self._keys.get(col)
+                if pair is None:
+                    pair = self._build_keys(col)
+                    self._keys[col] = pair
+        return pair[1] if descending else pair[0]
+
+    def permutation(self, col, descending=False):
+        """Urutan seluruh baris menurut kolom"""
+        perm = self._perms.get((col, descending))
+        if perm is None:
+            perm = np.argsort(self.keys(col, descending), kind="stable")
+            perm.flags.writeable = False
+            self._perms[(col, descending)] = perm
+        return perm
+
+    def order_rows(self, rows, col, descending=False):
+        """Urutkan row-id hasil filter (terurut naik) menurut kolom"""
+        n = len(self.df)
+        if rows is None or len(rows) == n:
+            return self.permutation(col, descending)
+        if len(rows) * 16 >= n:
+            # Hasil besar: irisan dengan permutasi global, O(n)
+            perm = self.permutation(col, descending)
+            selected = np.zeros(n, dtype=bool)
+            selected[rows] = True
+            return perm[selected[perm]]
+        # Hasil kecil: urutkan kunci milik baris terpilih saja, O(k log k)
+        return rows[np.argsort(self.keys(col, descending)[rows], kind="stable")]
@@ -0,0 +1,67 @@
+# text_export.py
+import zlib
+
+import numpy as np
+from flask import Response
+
+from metrics import timed_stream
+
+CHUNK_ROWS = 5000
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def iter_chunks(df, rows=None, chunk_rows=CHUNK_ROWS):
+    """Potongan DataFrame untuk row-id terpilih (None = semua baris)"""
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows)
+    for offset in range(0, len(rows), chunk_rows):
+        yield df.iloc[rows[offset:offset + chunk_rows]]
+
+
+def csv_stream(df, rows=None):
+    """CSV per potongan; header hanya di potongan pertama"""
+    yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+    for chunk in iter_chunks(df, rows):
+        yield chunk.to_csv(index=False, header=False).encode("utf-8")
+
+
+def ndjson_stream(df, rows=None):
+    """Satu objek JSON per baris; sel numeric kosong (NaN) ditulis "" seperti di data asli"""
+    for chunk in iter_chunks(df, rows):
+        chunk = chunk.astype(object)
+        chunk = chunk.where(chunk.notna(), "")
+        yield chunk.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8")
+
+
+def gzip_stream(chunks, level=6):
+    """Kompres stream bytes menjadi gzip secara on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(df, basename, fmt="csv", rows=None, compress=False):
+    """Response Flask yang men-stream baris `df` sebagai CSV/NDJSON (opsional gzip)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Format export tidak dikenal: {fmt}")
+    mimetype, ext = FORMATS[fmt]
+
+    stream = csv_stream(df, rows) if fmt == "csv" else ndjson_stream(df, rows)
+    stream = timed_stream(stream, len(df) if rows is None else len(rows), fmt)
+    filename = f"{basename}.{ext}"
+    if compress:
+        stream = gzip_stream(stream)
+        mimetype = "application/gzip"
+        filename += ".gz"
+
+    return Response(
+        stream,
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,11 +1,14 @@
 # upload.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-import pandas as pd
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 import os
-from data_store import load_data, save_data, clear_cache
-import traceback
+from data_store import data_available
+from ingest import ExcelReader
+from upload_jobs import UploadJobs, QueueFull
+from schema import REQUIRED_COLUMNS
+import logging
 
 upload_bp = Blueprint("upload", __name__)
+logger = logging.getLogger(__name__)
 
 # =====================
 # PATH AMAN (SERVER)
@@ -16,17 +19,27 @@ DATA_FILE = os.path.join(BASE_DIR, "data.xlsx")
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def validate_excel_columns(df):
-    """Validasi kolom minimal yang harus ada"""
-    required_cols = ['CLNT_ID', 'CLNT_NAME', 'LINK_ID', 'STN_NAME']
-    
+def validate_excel_columns(columns):
+    """Validasi kolom minimal yang harus ada (cukup dari baris header)"""
     missing_cols = []
-    for col in required_cols:
-        if col not in df.columns:
+    for col in REQUIRED_COLUMNS:
+        if col not in columns:
             missing_cols.append(col)
     
     return missing_cols
 
+upload_jobs = UploadJobs(UPLOAD_FOLDER, DATA_FILE)
+
+def _wants_json():
+    return request.headers.get("X-Requested-With") == "XMLHttpRequest" or request.accept_mimetypes.best == "application/json"
+
+def _reject(message, status=400):
+    """Tolak upload: JSON untuk fetch, flash + redirect untuk form biasa"""
+    if _wants_json():
+        return jsonify({"success": False, "message": message}), status
+    flash(message, "danger")
+    return redirect(request.url)
+
 # =====================
 # UPLOAD EXCEL
 # =====================
@@ -43,113 +56,89 @@ def upload_excel():
 
         # ❌ FILE KOSONG
         if not file or file.filename == "":
-            flash("File belum dipilih", "danger")
-            return redirect(request.url)
+            return _reject("File belum dipilih")
 
         # ❌ FORMAT SALAH
         if not file.filename.lower().endswith((".xlsx", ".xls")):
-            flash("File harus berformat .xlsx atau .xls", "danger")
-            return redirect(request.url)
+            return _reject("File harus berformat .xlsx atau .xls")
+
+        # ❌ MODE TIDAK VALID
+        if mode not in ("append", "reset") or (mode == "append" and not data_available()):
+            return _reject("❌ Mode upload tidak valid")
 
+        job_id = upload_jobs.new_id()
+        filename = os.path.basename(file.filename)
+        save_path = os.path.join(UPLOAD_FOLDER, f"{job_id[:8]}_{filename}")
         try:
-            print(f"Processing upload: {file.filename}, mode: {mode}")
+            logger.info("Processing upload: %s, mode: %s", filename, mode)
             
             # =====================
             # SIMPAN FILE KE SERVER
             # =====================
-            save_path = os.path.join(UPLOAD_FOLDER, file.filename)
             file.save(save_path)
-            print(f"File saved to: {save_path}")
+            logger.info("File saved to: %s", save_path)
             
             # =====================
-            # BACA EXCEL
+            # BACA HEADER EXCEL
             # =====================
-            try:
-                df_new = pd.read_excel(save_path, dtype=str, engine="openpyxl")
-            except:
-                df_new = pd.read_excel(save_path, dtype=str)
-            
-            print(f"Read Excel - Shape: {df_new.shape}, Columns: {df_new.columns.tolist()}")
+            # Header divalidasi langsung; baris data dibaca job di background
+            with ExcelReader(save_path) as reader:
+                columns = reader.columns
+            logger.debug("Read Excel header - Columns: %s", columns)
             
             # Validasi kolom
-            missing_cols = validate_excel_columns(df_new)
+            missing_cols = validate_excel_columns(columns)
             if missing_cols:
-                flash(f"Kolom penting tidak ditemukan: {', '.join(missing_cols)}", "danger")
                 os.remove(save_path)
-                return redirect(request.url)
-            
-            # Clean data
-            df_new = df_new.fillna("")
-            
-            # Hapus kolom no jika ada
-            for c in ["no", "No", "NO"]:
-                if c in df_new.columns:
-                    df_new = df_new.drop(columns=[c])
-            
-            print(f"Cleaned data - Shape: {df_new.shape}")
-            
-            # =====================
-            # MODE TAMBAH DATA
-            # =====================
-            if mode == "append" and os.path.exists(DATA_FILE):
-                print("Mode: Append to existing data")
-                df_old = load_data()
-                
-                # Hapus kolom no dari old data
-                for c in ["no", "No", "NO"]:
-                    if c in df_old.columns:
-                        df_old = df_old.drop(columns=[c])
-                
-                # Gabungkan data
-                df_final = pd.concat([df_old, df_new], ignore_index=True)
-                print(f"Combined data - Old: {len(df_old)}, New: {len(df_new)}, Final: {len(df_final)}")
-                
-                flash(f"✅ Data berhasil ditambah. Total: {len(df_final)} baris", "success")
+                return _reject(f"Kolom penting tidak ditemukan: {', '.join(missing_cols)}")
 
             # =====================
-            # MODE UPLOAD ULANG
+            # MASUKKAN KE ANTRIAN
             # =====================
-            elif mode == "reset":
-                print("Mode: Reset all data")
-                # hapus file data lama
-                if os.path.exists(DATA_FILE):
-                    os.remove(DATA_FILE)
-
-                # hapus semua file di folder uploads
-                for f in os.listdir(UPLOAD_FOLDER):
-                    file_path = os.path.join(UPLOAD_FOLDER, f)
-                    if os.path.isfile(file_path):
-                        os.remove(file_path)
-                
-                df_final = df_new
-                print(f"New data - Rows: {len(df_final)}")
-                flash(f"✅ Data berhasil disimpan (Upload Ulang). Total: {len(df_final)} baris", "success")
-
-            # ❌ MODE TIDAK VALID
-            else:
-                flash("❌ Mode upload tidak valid", "danger")
-                os.remove(save_path)
-                return redirect(request.url)
+            upload_jobs.submit(job_id, save_path, filename, mode)
+            logger.info("Upload job queued: %s", job_id)
 
-            # =====================
-            # SIMPAN DATA
-            # =====================
-            if save_data(df_final):
-                clear_cache()
-                print("Data saved successfully")
-            else:
-                flash("❌ Gagal menyimpan data", "danger")
-                return redirect(request.url)
+        except QueueFull:
+            os.remove(save_path)
+            return _reject("❌ Antrian upload penuh, coba lagi nanti", 429)
 
         except Exception as e:
-            print(f"Upload error: {str(e)}")
-            traceback.print_exc()
-            flash(f"❌ Gagal upload: {str(e)}", "danger")
+            logger.exception("Upload error: %s", e)
             if os.path.exists(save_path):
                 os.remove(save_path)
-            return redirect(request.url)
+            return _reject(f"❌ Gagal upload: {str(e)}")
 
-        return redirect(url_for("upload.upload_excel"))
+        if _wants_json():
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "status_url": url_for("upload.job_status", job_id=job_id),
+            }), 202
+        return redirect(url_for("upload.upload_excel", job=job_id))
+
+    # GET: Tampilkan halaman upload (dengan progres job jika ada)
+    job = upload_jobs.status(request.args.get("job"))
+    return render_template("upload.html", job=job)
+
+# =====================
+# STATUS & BATAL JOB
+# =====================
+@upload_bp.route("/upload/jobs/<job_id>")
+def job_status(job_id):
+    if session.get("role") != "admin":
+        return jsonify({"success": False, "message": "Akses ditolak"}), 403
+
+    state = upload_jobs.status(job_id)
+    if state is None:
+        return jsonify({"success": False, "message": "Job tidak ditemukan"}), 404
+    return jsonify({"success": True, **state})
+
+@upload_bp.route("/upload/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    if session.get("role") != "admin":
+        return jsonify({"success": False, "message": "Akses ditolak"}), 403
 
-    # GET: Tampilkan halaman upload
-    return render_template("upload.html")
\ No newline at end of file
+    state = upload_jobs.cancel(job_id)
+    if state is None:
+        return jsonify({"success": False, "message": "Job tidak ditemukan"}), 404
+    return jsonify({"success": True, **state})
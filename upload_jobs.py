@@ -0,0 +1,276 @@
+# upload_jobs.py
+import json
+import os
+import re
+import threading
+import time
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from data_store import get_snapshot, data_available, clean_dataframe, SnapshotWriter, LOAD_SECONDS
+from ingest import ExcelReader, CHUNK_ROWS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: antrian antar proses tidak tersedia
+    fcntl = None
+
+# Jumlah job yang diproses bersamaan per worker gunicorn dan batas antrian
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "1"))
+UPLOAD_MAX_PENDING = int(os.getenv("UPLOAD_MAX_PENDING", "4"))
+
+# Status job selesai disimpan sehari agar hasilnya masih bisa dilihat
+JOB_KEEP_SECONDS = 24 * 3600
+
+ACTIVE_PHASES = ("queued", "reading", "writing", "publishing")
+FINAL_PHASES = ("done", "failed", "cancelled")
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class UploadJobs:
+    """Antrian upload Excel yang diproses di background.
+
+    Status job disimpan sebagai file JSON di `<folder>/jobs`, sehingga worker
+    gunicorn mana pun bisa menjawab polling status dan menerima pembatalan
+    (file penanda `.cancel`). Job dijalankan satu per satu lintas proses
+    (lock fcntl); reader tetap memakai snapshot lama sampai job commit.
+    """
+
+    def __init__(self, folder, data_file, workers=UPLOAD_WORKERS, max_pending=UPLOAD_MAX_PENDING):
+        self.folder = folder
+        self.data_file = data_file
+        self.jobs_dir = os.path.join(folder, "jobs")
+        self.lock_file = os.path.join(self.jobs_dir, "jobs.lock")
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    # =====================
+    # STATUS JOB
+    # =====================
+    def _path(self, job_id, ext="json"):
+        return os.path.join(self.jobs_dir, f"{job_id}.{ext}")
+
+    def _write_state(self, job_id, state):
+        tmp = self._path(job_id, f"json.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self._path(job_id))
+
+    def _update(self, job_id, **fields):
+        state = self.status(job_id) or {}
+        state.pop("cancel_requested", None)
+        state.update(fields, updated=time.time())
+        self._write_state(job_id, state)
+        return state
+
+    def status(self, job_id):
+        """Status job (dict) atau None jika id tidak dikenal"""
+        if not _JOB_ID.fullmatch(job_id or ""):
+            return None
+        try:
+            with open(self._path(job_id), encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        state["cancel_requested"] = self._cancelled(job_id)
+        return state
+
+    def cancel(self, job_id):
+        """Tandai job untuk dibatalkan; diperiksa job di antara potongan"""
+        state = self.status(job_id)
+        if state is None or state["phase"] in FINAL_PHASES:
+            return state
+        open(self._path(job_id, "cancel"), "w").close()
+        return self.status(job_id)
+
+    def _cancelled(self, job_id):
+        return os.path.exists(self._path(job_id, "cancel"))
+
+    def _check_cancel(self, job_id):
+        if self._cancelled(job_id):
+            raise JobCancelled()
+
+    def _active_files(self):
+        """File upload milik job yang belum selesai (jangan dihapus mode reset)"""
+        files = set()
+        for name in os.listdir(self.jobs_dir):
+            if name.endswith(".json"):
+                state = self.status(name[:-5])
+                if state and state["phase"] in ACTIVE_PHASES:
+                    files.add(state["file"])
+        return files
+
+    @contextmanager
+    def _job_lock(self):
+        """Satu job aktif lintas proses (append/reset tidak boleh saling menimpa)"""
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    # =====================
+    # ANTRIAN
+    # =====================
+    def new_id(self):
+        return uuid.uuid4().hex
+
+    def prune(self, max_age=JOB_KEEP_SECONDS):
+        """Hapus status job yang sudah selesai lebih dari `max_age` detik"""
+        now = time.time()
+        for name in os.listdir(self.jobs_dir):
+            if name.endswith(".json"):
+                state = self.status(name[:-5])
+                if state and state["phase"] in FINAL_PHASES and now - state["updated"] > max_age:
+                    os.remove(os.path.join(self.jobs_dir, name))
+
+    def submit(self, job_id, save_path, filename, mode):
+        """Masukkan job ke antrian; QueueFull jika antrian penuh"""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull()
+        self.prune()
+        self._write_state(job_id, {
+            "id": job_id,
+            "filename": filename,
+            "file": save_path,
+            "mode": mode,
+            "phase": "queued",
+            "rows_parsed": 0,
+            "rows_written": 0,
+            "total_rows": None,
+            "message": None,
+            "created": time.time(),
+            "updated": time.time(),
+        })
+        try:
+            self._pool.submit(self._run, job_id, save_path, mode)
+        except Exception:
+            self._slots.release()
+            raise
+        return job_id
+
+    def _run(self, job_id, save_path, mode):
+        try:
+            with self._job_lock():
+                self._check_cancel(job_id)
+                self._update(job_id, phase="reading", started=time.time())
+                with LOAD_SECONDS.time(kind="upload"):
+                    self._ingest(job_id, save_path, mode)
+        except JobCancelled:
+            logger.info("Upload job %s cancelled", job_id)
+            self._update(job_id, phase="cancelled", message="Upload dibatalkan", finished=time.time())
+            if os.path.exists(save_path):
+                os.remove(save_path)
+        except Exception as e:
+            logger.exception("Upload job %s error: %s", job_id, e)
+            self._update(job_id, phase="failed", message=f"Gagal upload: {str(e)}", finished=time.time())
+            if os.path.exists(save_path):
+                os.remove(save_path)
+        finally:
+            if os.path.exists(self._path(job_id, "cancel")):
+                os.remove(self._path(job_id, "cancel"))
+            self._slots.release()
+
+    # =====================
+    # PROSES UPLOAD
+    # =====================
+    def _remove_old_uploads(self, save_path):
+        """Hapus data.xlsx lama dan file upload lain setelah upload ulang berhasil
+        (kecuali milik job yang masih antri)"""
+        keep = self._active_files() - {save_path}
+        paths = [self.data_file] + [os.path.join(self.folder, f) for f in os.listdir(self.folder)]
+        for file_path in paths:
+            if os.path.isfile(file_path) and file_path not in keep:
+                try:
+                    os.remove(file_path)
+                except OSError as e:
+                    logger.warning("Gagal menghapus %s: %s", file_path, e)
+
+    def _ingest(self, job_id, save_path, mode):
+        reader = ExcelReader(save_path)
+        writer = None
+        try:
+            # Kolom no dibuat ulang saat data disimpan
+            new_cols = [c for c in reader.columns if c not in ["no", "No", "NO"]]
+
+            # =====================
+            # MODE TAMBAH DATA
+            # =====================
+            if mode == "append":
+                logger.info("Mode: Append to existing data")
+                if not data_available():
+                    raise ValueError("Data lama tidak tersedia untuk ditambah")
+                # Versi snapshot dicatat: edit selama upload diterapkan ulang saat commit
+                snapshot = get_snapshot()
+                df_old = snapshot.df
+
+                # Kolom data lama dulu, lalu kolom baru (seperti pd.concat)
+                old_cols = [c for c in df_old.columns if c not in ["no", "No", "NO"]]
+                columns = old_cols + [c for c in new_cols if c not in old_cols]
+                writer = SnapshotWriter(columns, base=snapshot.version)
+
+            # =====================
+            # MODE UPLOAD ULANG
+            # =====================
+            else:
+                logger.info("Mode: Reset all data")
+                # data.xlsx lama baru dihapus saat commit; file upload lain setelah commit berhasil
+                df_old = None
+                writer = SnapshotWriter(new_cols, replace_source=True)
+
+            # =====================
+            # SIMPAN DATA (PER POTONGAN)
+            # =====================
+            # Snapshot baru ditulis ke file sementara; reader tetap melayani
+            # versi lama sampai commit selesai
+            parsed = 0
+            self._update(job_id, phase="writing")
+            if df_old is not None:
+                for start in range(0, len(df_old), CHUNK_ROWS):
+                    self._check_cancel(job_id)
+                    writer.write(df_old.iloc[start:start + CHUNK_ROWS])
+                    self._update(job_id, rows_written=writer.rows)
+            # Parse + clean per potongan (paralel untuk sheet besar)
+            for chunk in reader.chunks(clean=partial(clean_dataframe, stage="upload")):
+                self._check_cancel(job_id)
+                parsed += len(chunk)
+                writer.write(chunk, cleaned=True)
+                self._update(job_id, rows_parsed=parsed, rows_written=writer.rows)
+            self._check_cancel(job_id)
+            self._update(job_id, phase="publishing")
+            writer.commit()
+        except BaseException:
+            # Snapshot aktif dan file data lama tidak berubah; file sementara dibuang
+            if writer is not None:
+                writer.abort()
+            raise
+        finally:
+            reader.close()
+        logger.info("Data saved successfully - New: %s, Total: %s", parsed, writer.rows)
+
+        if df_old is not None:
+            message = f"✅ Data berhasil ditambah. Total: {writer.rows} baris"
+        else:
+            self._remove_old_uploads(save_path)
+            message = f"✅ Data berhasil disimpan (Upload Ulang). Total: {writer.rows} baris"
+        self._update(job_id, phase="done", total_rows=writer.rows, message=message, finished=time.time())